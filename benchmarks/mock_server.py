@@ -0,0 +1,261 @@
+"""Local stand-in for the OpenRouter and Gemini image APIs.
+
+Usage: python benchmarks/mock_server.py [--port 8765] [--latency S] [--jitter S]
+                                        [--error-rate P] [--error-status CODE]
+
+Serves OpenRouter chat completions (POST /api/v1/chat/completions) and
+Gemini generateContent (POST /v1beta/models/<model>:generateContent, plus
+Files API uploads), answering with a synthetic PNG about the size of a real
+one at the requested 1K/2K/4K resolution. Each request waits latency
+seconds (plus up to jitter) before answering; a fraction error_rate gets
+error_status instead, with Retry-After: 0 on 429s and 503s so client
+retries don't slow a benchmark down. Like the real APIs, responses are
+gzip-compressed for clients accepting it, and gzip request bodies (chunked
+or not) are accepted. Point nanobanana at it with:
+
+  NANOBANANA_OPENROUTER_URL=http://127.0.0.1:8765/api/v1/chat/completions
+  NANOBANANA_GEMINI_BASE_URL=http://127.0.0.1:8765
+"""
+
+import argparse
+import base64
+import contextlib
+import gzip
+import json
+import random
+import threading
+import time
+from collections.abc import Iterator
+from functools import cache, lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Typical PNG sizes of generated images; the content is incompressible noise
+IMAGE_BYTES = {"1K": 1_400_000, "2K": 5_500_000, "4K": 20_000_000}
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@cache
+def synthetic_image(size: str) -> bytes:
+    """Return deterministic image bytes for an image size (1K, 2K, 4K)."""
+    n = IMAGE_BYTES.get(size, IMAGE_BYTES["1K"])
+    return _PNG_SIGNATURE + random.Random(size).randbytes(n - len(_PNG_SIGNATURE))
+
+
+@cache
+def _image_b64(size: str) -> str:
+    return base64.b64encode(synthetic_image(size)).decode()
+
+
+@lru_cache(maxsize=8)
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=1)
+
+
+def _find(value, key: str):
+    """Return the first value stored under key anywhere in a JSON document."""
+    if isinstance(value, dict):
+        if key in value:
+            return value[key]
+        value = list(value.values())
+    if isinstance(value, list):
+        for item in value:
+            found = _find(item, key)
+            if found is not None:
+                return found
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MockServer"
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def setup(self) -> None:
+        super().setup()
+        # One handler per TCP connection; keep-alive requests share it
+        self.server.count("connections")
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            body = b"".join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            self.server.count("gzip_requests")
+            body = gzip.decompress(body)
+        return body
+
+    def _send(self, status: int, body: bytes, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = _gzip(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, body: dict, headers: dict | None = None) -> None:
+        self._send(status, json.dumps(body).encode(), headers)
+
+    def _fail(self) -> bool:
+        """Inject an error response per the server's error_rate."""
+        server = self.server
+        if not server.error_rate or server.random.random() >= server.error_rate:
+            return False
+        status = server.error_status
+        server.count("errors")
+        headers = {"Retry-After": "0"} if status in (429, 503) else {}
+        self._json(status, {"error": {
+            "code": status, "message": "injected error", "status": "UNAVAILABLE",
+        }}, headers)
+        return True
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        server = self.server
+        host = f"http://{self.headers['Host']}"
+        path = self.path.split("?", 1)[0]
+
+        if path.startswith("/upload/v1beta/files"):
+            self._json(200, {}, {"X-Goog-Upload-URL": f"{host}/upload-session"})
+            return
+        if path == "/upload-session":
+            name = f"files/f{server.count('uploads')}"
+            self._json(200, {"file": {
+                "name": name,
+                "uri": f"{host}/v1beta/{name}",
+                "mimeType": "image/jpeg",
+                "sizeBytes": str(len(body)),
+                "expirationTime": time.strftime(
+                    "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 48 * 3600)
+                ),
+            }}, {"X-Goog-Upload-Status": "final"})
+            return
+
+        openrouter = path.endswith("/chat/completions")
+        if not openrouter and not path.endswith(":generateContent"):
+            self._json(404, {"error": {"code": 404, "message": path, "status": "NOT_FOUND"}})
+            return
+        server.count("requests")
+        server.wait()
+        if self._fail():
+            return
+        try:
+            size = _find(json.loads(body), "imageSize") or "1K"
+        except ValueError:
+            size = "1K"
+        if openrouter:
+            data_url = f"data:image/png;base64,{_image_b64(size)}"
+            self._json(200, {
+                "id": "gen-mock",
+                "choices": [{"index": 0, "message": {
+                    "role": "assistant", "content": "",
+                    "images": [{"type": "image_url", "image_url": {"url": data_url}}],
+                }}],
+            })
+        else:
+            self._json(200, {"candidates": [{"content": {"role": "model", "parts": [{
+                "inlineData": {"mimeType": "image/png", "data": _image_b64(size)},
+            }]}}]})
+
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded stand-in server; see the module docstring."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0,
+    ) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def env(self) -> dict[str, str]:
+        """Environment variables pointing both nanobanana backends here."""
+        return {
+            "NANOBANANA_OPENROUTER_URL": f"{self.url}/api/v1/chat/completions",
+            "NANOBANANA_GEMINI_BASE_URL": self.url,
+        }
+
+    def count(self, name: str) -> int:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            return self.counts[name]
+
+    def wait(self) -> None:
+        delay = self.latency
+        if self.jitter:
+            with self._lock:
+                delay += self.random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+@contextlib.contextmanager
+def serve(**kwargs) -> Iterator[MockServer]:
+    """Run a MockServer on a background thread for the duration of the block."""
+    server = MockServer(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds, up to")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failed requests")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = MockServer(
+        args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, error_status=args.error_status,
+    )
+    for name, value in server.env().items():
+        print(f"export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare peak RSS of buffered vs streamed OpenRouter request bodies.
+
+Usage: python benchmarks/request_body.py [--inputs N] [--mb SIZE]
+
+Each variant runs in a fresh interpreter with N synthetic input images of
+SIZE MB and serializes the full request body, reporting peak RSS and time.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+_SRC = str(Path(__file__).resolve().parent.parent / "src")
+
+_BUFFERED = """
+import base64, json, sys
+parts = []
+for path in sys.argv[1:]:
+    data = open(path, "rb").read()
+    url = "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+    parts.append({"type": "image_url", "image_url": {"url": url}})
+parts.append({"type": "text", "text": "prompt"})
+body = json.dumps({"model": "m", "messages": [{"role": "user", "content": parts}]}).encode()
+total = len(body)
+"""
+
+_STREAMED = """
+import sys
+from nanobanana.openrouter import _RequestBody
+body = _RequestBody("m", "prompt", sys.argv[1:], "1:1", "1K")
+total = sum(len(chunk) for chunk in body)
+"""
+
+_REPORT = """
+import resource, time
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+scale = 1 if sys.platform == "darwin" else 1024  # bytes vs KiB
+print(total, rss * scale, time.perf_counter() - _start)
+"""
+
+
+def _run(body: str, inputs: list[str]) -> tuple[int, int, float]:
+    code = "import sys, time\n_start = time.perf_counter()\ntotal = 0\n" + body + _REPORT
+    result = subprocess.run(
+        [sys.executable, "-c", code, *inputs],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": _SRC},
+    )
+    total, rss, elapsed = result.stdout.split()
+    return int(total), int(rss), float(elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inputs", type=int, default=3)
+    parser.add_argument("--mb", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = []
+        for i in range(args.inputs):
+            path = Path(tmp) / f"ref{i}.jpg"
+            path.write_bytes(os.urandom(args.mb * 1024 * 1024))
+            inputs.append(str(path))
+
+        baseline = _run("", [])
+        print(f"{args.inputs} inputs x {args.mb} MB (interpreter baseline "
+              f"{baseline[1] / 2**20:.0f} MB RSS)")
+        for name, body in (("buffered", _BUFFERED), ("streamed", _STREAMED)):
+            total, rss, elapsed = _run(body, inputs)
+            print(f"  {name:9} body {total / 2**20:6.1f} MB  "
+                  f"peak RSS {rss / 2**20:6.1f} MB  {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Offline benchmark suite for nanobanana's own overhead.
+
+Usage: python benchmarks/suite.py [--quick] [--only NAME] [--save] [--check]
+                                  [--baseline PATH] [--tolerance FRACTION]
+
+Runs everything against benchmarks/mock_server.py, so no API key or network
+is needed and the numbers exclude real generation time:
+
+  startup      wall time of `import nanobanana.cli` and `nanobanana version`
+  cli          end-to-end `nanobanana "prompt"` latency per backend, with an
+               instant server, i.e. pure client overhead
+  throughput   library images/s per backend at several concurrency levels,
+               with a fixed server latency
+  memory       peak RSS of one 4K generation per backend
+
+Results are compared with the stored baseline (benchmarks/baseline.json).
+--save replaces it; --check exits 1 when a metric is worse than the
+baseline by more than the tolerance (default 30%). Baselines are machine
+specific: save one on the machine that runs --check.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_server import serve  # noqa: E402
+
+_ROOT = Path(__file__).resolve().parent.parent
+_SRC = str(_ROOT / "src")
+sys.path.insert(0, _SRC)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+BACKENDS = ("openrouter", "gemini")
+CONCURRENCY_LEVELS = (1, 4, 16)
+# Server latency for throughput runs; ideal images/s is concurrency / this
+THROUGHPUT_LATENCY = 0.2
+
+_MEMORY_CODE = """
+import resource, sys
+backend, out = sys.argv[1:]
+kwargs = dict(prompt="benchmark", input_images=[], aspect_ratio="1:1", image_size="4K")
+if backend == "openrouter":
+    from nanobanana import openrouter
+    openrouter.generate_image_to_file(
+        api_key="k", model="m", output_for_mime=lambda mime: out, **kwargs,
+    )
+else:
+    from nanobanana import gemini
+    data, _ = gemini.generate_image(api_key="k", uploads=None, **kwargs)
+    open(out, "wb").write(data)
+try:
+    # Unlike ru_maxrss, not inherited from the (large) benchmark process on Linux
+    status = open("/proc/self/status").read()
+    print(int(status.split("VmHWM:")[1].split()[0]) * 1024)
+except (OSError, IndexError):
+    scale = 1 if sys.platform == "darwin" else 1024  # bytes vs KiB
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale)
+"""
+
+
+def _env(tmp: str, backend: str, server) -> dict[str, str]:
+    env = {
+        name: value for name, value in os.environ.items()
+        if name not in ("GEMINI_API_KEY", "OPENROUTER_API_KEY")
+        and not name.startswith("NANOBANANA_")
+    }
+    env.update(server.env() if server else {})
+    env.update({
+        "PYTHONPATH": _SRC,
+        "XDG_CONFIG_HOME": str(Path(tmp) / "config"),
+        "XDG_CACHE_HOME": str(Path(tmp) / "cache"),
+        "NANOBANANA_NO_DAEMON": "1",
+        "GEMINI_API_KEY" if backend == "gemini" else "OPENROUTER_API_KEY": "benchmark",
+    })
+    return env
+
+
+def _wall(cmd: list[str], env: dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def bench_startup(tmp: str, runs: int) -> dict[str, dict]:
+    env = _env(tmp, "gemini", None)
+    results = {}
+    for name, cmd in (
+        ("startup.import_cli", [sys.executable, "-c", "import nanobanana.cli"]),
+        ("startup.version", [sys.executable, "-m", "nanobanana", "version"]),
+    ):
+        # Minimum: start-up noise only ever adds time
+        results[name] = {"value": min(_wall(cmd, env) for _ in range(runs)) * 1000, "unit": "ms"}
+    return results
+
+
+def bench_cli(tmp: str, runs: int) -> dict[str, dict]:
+    results = {}
+    with serve() as server:
+        for backend in BACKENDS:
+            env = _env(tmp, backend, server)
+            out = str(Path(tmp) / f"cli-{backend}.png")
+            cmd = [sys.executable, "-m", "nanobanana", "-no-cache", "-o", out, "benchmark"]
+            _wall(cmd, env)  # warm the OS file cache
+            samples = [_wall(cmd, env) for _ in range(runs)]
+            results[f"cli.{backend}"] = {"value": statistics.median(samples) * 1000, "unit": "ms"}
+    return results
+
+
+async def _throughput(backend: str, concurrency: int, jobs: int, tmp: str) -> float:
+    from nanobanana import gemini, openrouter
+
+    semaphore = asyncio.Semaphore(concurrency)
+    kwargs = dict(prompt="benchmark", input_images=[], aspect_ratio="1:1", image_size="1K")
+    if backend == "openrouter":
+        client = openrouter.create_async_client(max_connections=concurrency)
+    else:
+        client = gemini.create_client("benchmark")
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            if backend == "openrouter":
+                await openrouter.agenerate_image_to_file(
+                    client, api_key="benchmark", model="m",
+                    output_for_mime=lambda mime: str(Path(tmp) / f"t{i}.png"), **kwargs,
+                )
+            else:
+                await gemini.agenerate_image(client, uploads=None, api_key="benchmark", **kwargs)
+
+    try:
+        await one(-1)  # connect and import outside the measurement
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(jobs)))
+        return jobs / (time.perf_counter() - start)
+    finally:
+        await (client.aclose() if backend == "openrouter" else client.aio.aclose())
+
+
+def bench_throughput(tmp: str, runs: int) -> dict[str, dict]:
+    results = {}
+    with serve(latency=THROUGHPUT_LATENCY) as server:
+        os.environ.update(server.env())
+        for backend in BACKENDS:
+            for concurrency in CONCURRENCY_LEVELS:
+                jobs = concurrency * max(2, runs)
+                rate = asyncio.run(_throughput(backend, concurrency, jobs, tmp))
+                results[f"throughput.{backend}.c{concurrency}"] = {
+                    "value": rate, "unit": "images/s", "higher_is_better": True,
+                }
+    return results
+
+
+def bench_memory(tmp: str, runs: int) -> dict[str, dict]:
+    results = {}
+    with serve() as server:
+        for backend in BACKENDS:
+            env = _env(tmp, backend, server)
+            out = str(Path(tmp) / f"mem-{backend}.png")
+            result = subprocess.run(
+                [sys.executable, "-c", _MEMORY_CODE, backend, out],
+                env=env, check=True, capture_output=True, text=True,
+            )
+            peak = int(result.stdout.split()[-1])
+            results[f"memory.{backend}.4k"] = {"value": peak / 2**20, "unit": "MB"}
+    return results
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "cli": bench_cli,
+    "throughput": bench_throughput,
+    "memory": bench_memory,
+}
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Print results against the baseline; return the names that regressed."""
+    regressed = []
+    for name, metric in results.items():
+        value = metric["value"]
+        line = f"  {name:32} {value:10.1f} {metric['unit']}"
+        base = baseline.get(name)
+        if base and base["value"]:
+            change = (value - base["value"]) / base["value"]
+            worse = -change if metric.get("higher_is_better") else change
+            line += f"  ({change:+.0%} vs {base['value']:.1f})"
+            if worse > tolerance:
+                line += "  REGRESSION"
+                regressed.append(name)
+        print(line)
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), default=[])
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+
+    runs = 3 if args.quick else 10
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.only or BENCHMARKS:
+            print(f"{name}...", file=sys.stderr)
+            results.update(BENCHMARKS[name](tmp, runs))
+
+    try:
+        stored = json.loads(args.baseline.read_text())
+    except (OSError, ValueError):
+        stored = {}
+    regressed = compare(results, stored.get("metrics", {}), args.tolerance)
+
+    if args.save:
+        metrics = {**stored.get("metrics", {}), **results} if args.only else results
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "metrics": {name: {**m, "value": round(m["value"], 2)} for name, m in metrics.items()},
+        }, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+    elif regressed and args.check:
+        print(f"{len(regressed)} metric(s) regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
-from importlib.metadata import version, PackageNotFoundError
+def __getattr__(name: str) -> str:
+    # Resolved lazily: importlib.metadata dominates CLI start-up time
+    if name == "__version__":
+        from importlib.metadata import version, PackageNotFoundError
 
-try:
-    __version__ = version("nanobanana")
-except PackageNotFoundError:
-    __version__ = "dev"
+        try:
+            value = version("nanobanana")
+        except PackageNotFoundError:
+            value = "dev"
+        globals()["__version__"] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,388 @@
+"""Supported Python API for generating images from services and scripts.
+
+    from nanobanana import api
+
+    result = await api.agenerate("a cute cat", size="2K", inputs=[photo_bytes])
+    result.save("cat")  # cat.png, or cat.jpg if the API returned JPEG
+
+generate() is the blocking equivalent. Both take the same options as the
+command line and resolve the backend and key the same way (environment,
+then config file) unless api_key is passed.
+
+Connections are pooled: each event loop keeps one client per (backend,
+API key), shared by every call, with at most MAX_CONCURRENCY requests in
+flight; further calls wait their turn instead of failing on a pool
+timeout, so thousands of concurrent agenerate() calls are fine. Blocking
+calls run on one background event loop and share its pool. Call aclose()
+(or close() for the blocking pool) on shutdown.
+
+Failures raise GenerationError, which carries the HTTP status and whether
+retrying later may help.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections.abc import Sequence
+from dataclasses import dataclass, field, replace
+from functools import cache
+from pathlib import Path
+
+from nanobanana import timings
+from nanobanana.config import (
+    GEMINI_MODEL,
+    OPENROUTER_DEFAULT_MODEL,
+    APIConfig,
+    FileConfig,
+    invalidate_cached_key,
+    is_auth_error,
+    load_config,
+    resolve_aspect_size,
+    resolve_config,
+)
+from nanobanana.mime import extension_from_mime, mime_from_bytes
+
+# Requests in flight per event loop; more calls queue for a slot
+MAX_CONCURRENCY = 64
+
+BACKENDS = ("gemini", "openrouter")
+
+
+class GenerationError(RuntimeError):
+    """A generation failed.
+
+    status_code is the HTTP status if the API answered with an error, and
+    retryable tells whether the same call may succeed later (rate limits,
+    server errors, dropped connections).
+    """
+
+    def __init__(self, message: str, *, status_code: int | None = None, retryable: bool = False) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+@dataclass
+class GenerationResult:
+    """A generated image and how it was made."""
+
+    data: bytes
+    mime_type: str
+    backend: str
+    model: str
+    aspect: str
+    size: str
+    # -timings report: total_ms, phases_ms and bytes
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def extension(self) -> str:
+        return extension_from_mime(self.mime_type)
+
+    def save(self, path: str | os.PathLike) -> str:
+        """Write the image to path, with the extension matching its MIME type.
+
+        Returns the path written.
+        """
+        output = str(Path(path).with_suffix(self.extension))
+        Path(output).write_bytes(self.data)
+        return output
+
+
+class _Pool:
+    """Clients for one event loop, keyed by (backend, api_key)."""
+
+    def __init__(self) -> None:
+        self.clients: dict[tuple[str, str], object] = {}
+        self.slots = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    def client(self, api_config: APIConfig):
+        key = ("openrouter" if api_config.use_openrouter else "gemini", api_config.api_key)
+        client = self.clients.get(key)
+        if client is None:
+            if api_config.use_openrouter:
+                from nanobanana.openrouter import create_async_client
+                client = create_async_client(_file_config(), max_connections=MAX_CONCURRENCY)
+            else:
+                from nanobanana.gemini import create_client
+                client = create_client(api_config.api_key)
+            self.clients[key] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients, self.clients = self.clients, {}
+        for (backend, _), client in clients.items():
+            await (client.aclose() if backend == "openrouter" else client.aio.aclose())
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Pool]" = weakref.WeakKeyDictionary()
+
+# Resolved from the environment and config file once per (backend, model)
+_configs: dict[tuple[str, str], APIConfig] = {}
+_configs_lock = threading.Lock()
+
+_limiters: dict[tuple[bool, str], object] = {}
+_uploads = None
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+@cache
+def _file_config() -> FileConfig | None:
+    return load_config()
+
+
+def _pool() -> _Pool:
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = _Pool()
+    return pool
+
+
+def _api_config(backend: str, api_key: str, model: str) -> APIConfig:
+    """Return the APIConfig for a call. Raises RuntimeError on bad settings."""
+    if backend and backend not in BACKENDS:
+        raise RuntimeError(f"invalid backend: {backend} (valid: {', '.join(BACKENDS)})")
+    use_openrouter = backend == "openrouter" or (not backend and bool(model))
+    if backend == "gemini" and model:
+        raise RuntimeError("model is only valid with the openrouter backend")
+    if api_key:
+        if use_openrouter:
+            return APIConfig(use_openrouter=True, api_key=api_key, model=model or OPENROUTER_DEFAULT_MODEL)
+        return APIConfig(api_key=api_key)
+
+    key = (backend, model)
+    with _configs_lock:
+        config = _configs.get(key)
+        if config is None:
+            file_config = _file_config()
+            env = os.environ
+            model_flag = model
+            if backend == "gemini":
+                # Neither an OpenRouter key nor api/model settings may pick OpenRouter
+                env = {k: v for k, v in os.environ.items() if k != "OPENROUTER_API_KEY"}
+                if file_config is not None:
+                    file_config = replace(file_config, api="gemini", model="")
+            elif backend == "openrouter" and not model_flag:
+                model_flag = (file_config.model if file_config else "") or OPENROUTER_DEFAULT_MODEL
+            _, _, config = resolve_config(
+                aspect_flag="",
+                size_flag="",
+                model_flag=model_flag,
+                file_config=file_config,
+                env=env,
+            )
+            _configs[key] = config
+    return config
+
+
+def _forget(api_config: APIConfig) -> None:
+    """Drop a rejected key so the next call resolves it afresh."""
+    with _configs_lock:
+        for key, config in list(_configs.items()):
+            if config.api_key == api_config.api_key:
+                del _configs[key]
+    invalidate_cached_key(api_config.api_key)
+
+
+def _limiter(api_config: APIConfig):
+    """Shares rate_limit_rpm / max_inflight with every other nanobanana process."""
+    key = (api_config.use_openrouter, api_config.api_key)
+    if key not in _limiters:
+        from nanobanana.ratelimit import open_rate_limiter
+        _limiters[key] = open_rate_limiter(_file_config(), api_config)
+    return _limiters[key]
+
+
+def _upload_cache():
+    global _uploads
+    if _uploads is None:
+        from nanobanana.gemini import open_upload_cache
+        _uploads = open_upload_cache(_file_config())
+    return _uploads
+
+
+def _write_inputs(inputs: Sequence[str | os.PathLike | bytes], tmp_dir: list[str], uploads=None) -> list[str]:
+    """Return input paths, writing bytes inputs to a temporary directory.
+
+    Bytes inputs are hashed from memory for uploads, not read back.
+    """
+    paths: list[str] = []
+    for i, value in enumerate(inputs):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if not tmp_dir:
+                tmp_dir.append(tempfile.mkdtemp(prefix="nanobanana-"))
+            mime_type = mime_from_bytes(bytes(value[:16]))
+            suffix = ".gif" if mime_type == "image/gif" else extension_from_mime(mime_type)
+            path = os.path.join(tmp_dir[0], f"input-{i}{suffix}")
+            with open(path, "wb") as f:
+                f.write(value)
+            if uploads is not None:
+                uploads.remember(path, value)
+            paths.append(path)
+        else:
+            paths.append(os.fspath(value))
+    return paths
+
+
+def _render(prompt: str, command: str, template: str, aspect: str, size: str) -> tuple[str, str, str]:
+    """Apply a command or slide template. Returns (prompt, aspect, size)."""
+    from nanobanana.cli import render_prompt
+    from nanobanana.slide_templates import get_slide_template
+    from nanobanana.templates import get_command
+
+    cmd = get_command(command or ("slide" if template else "generate"))
+    if cmd is None:
+        raise RuntimeError(f"unknown command: {command}")
+    slide_template = None
+    if template:
+        if cmd.name != "slide":
+            raise RuntimeError("template is only valid with the slide command")
+        slide_template = get_slide_template(template)
+        if slide_template is None:
+            raise RuntimeError(f"unknown slide template: {template}")
+    aspect, size = resolve_aspect_size(
+        aspect_flag=aspect or cmd.default_aspect,
+        size_flag=size or cmd.default_size,
+        file_config=_file_config(),
+    )
+    if not command and not template:
+        return prompt, aspect, size
+    return render_prompt(cmd, slide_template, prompt, aspect, size), aspect, size
+
+
+async def agenerate(
+    prompt: str,
+    *,
+    inputs: Sequence[str | os.PathLike | bytes] = (),
+    aspect: str = "",
+    size: str = "",
+    command: str = "",
+    template: str = "",
+    backend: str = "",
+    model: str = "",
+    api_key: str = "",
+) -> GenerationResult:
+    """Generate one image.
+
+    inputs are reference images as paths or encoded image bytes. command and
+    template select a prompt template as on the command line (command
+    "slide", template "funnel"); their default aspect and size apply unless
+    given. backend is "gemini" or "openrouter"; with neither backend nor
+    api_key, the backend and key are resolved from the environment and
+    config file as for the CLI. Rate limits and transient failures are
+    retried. Raises GenerationError on failure.
+    """
+    if not prompt.strip():
+        raise GenerationError("no prompt provided")
+    pool = _pool()
+    tmp_dir: list[str] = []
+    with timings.collect() as report:
+        try:
+            with timings.phase("resolve"):
+                prompt, aspect, size = _render(prompt, command, template, aspect, size)
+                api_config = await asyncio.to_thread(_api_config, backend, api_key, model)
+            used_model = api_config.model if api_config.use_openrouter else GEMINI_MODEL
+            used_backend = "openrouter" if api_config.use_openrouter else "gemini"
+            timings.annotate(backend=used_backend, model=used_model, size=size)
+            async with pool.slots:
+                uploads = None if api_config.use_openrouter else _upload_cache()
+                paths = await asyncio.to_thread(_write_inputs, inputs, tmp_dir, uploads)
+                image_data, mime_type = await _request(pool, api_config, prompt, paths, aspect, size)
+        except (RuntimeError, OSError) as e:
+            report.fail(e)
+            if is_auth_error(e) and not api_key:
+                _forget(api_config)
+            raise GenerationError(
+                str(e),
+                status_code=getattr(e, "status_code", None),
+                retryable=getattr(e, "retryable", False),
+            ) from e
+        finally:
+            if tmp_dir:
+                await asyncio.to_thread(shutil.rmtree, tmp_dir[0], True)
+    return GenerationResult(
+        data=image_data,
+        mime_type=mime_type,
+        backend=used_backend,
+        model=used_model,
+        aspect=aspect,
+        size=size,
+        timings=report.report(),
+    )
+
+
+async def _request(
+    pool: _Pool,
+    api_config: APIConfig,
+    prompt: str,
+    input_images: list[str],
+    aspect: str,
+    size: str,
+) -> tuple[bytes, str]:
+    from nanobanana.retry import RetryPolicy
+
+    retry = RetryPolicy(limiter=_limiter(api_config))
+    client = pool.client(api_config)
+    if api_config.use_openrouter:
+        from nanobanana.openrouter import agenerate_image
+        return await agenerate_image(
+            client,
+            api_key=api_config.api_key,
+            model=api_config.model,
+            prompt=prompt,
+            input_images=input_images,
+            aspect_ratio=aspect,
+            image_size=size,
+            retry=retry,
+        )
+    from nanobanana.gemini import agenerate_image
+    return await agenerate_image(
+        client,
+        prompt=prompt,
+        input_images=input_images,
+        aspect_ratio=aspect,
+        image_size=size,
+        uploads=_upload_cache(),
+        api_key=api_config.api_key,
+        retry=retry,
+    )
+
+
+async def aclose() -> None:
+    """Close the pooled clients of the running event loop."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.aclose()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="nanobanana-api", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def generate(prompt: str, **kwargs) -> GenerationResult:
+    """Blocking variant of agenerate, safe to call from many threads.
+
+    Calls share one background event loop and its connection pool.
+    Raises GenerationError on failure.
+    """
+    future = asyncio.run_coroutine_threadsafe(agenerate(prompt, **kwargs), _background_loop())
+    return future.result()
+
+
+def close() -> None:
+    """Close the clients pooled by generate()."""
+    with _loop_lock:
+        loop = _loop
+    if loop is not None:
+        asyncio.run_coroutine_threadsafe(aclose(), loop).result()
@@ -0,0 +1,752 @@
+"""Concurrent batch generation from a JSONL or CSV manifest."""
+
+import asyncio
+import csv
+import json
+import os
+import signal
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nanobanana import timings
+from nanobanana.build import BuildLog
+from nanobanana.cache import ResultCache, key_for, open_cache
+from nanobanana.cli import render_prompt, resolve_output_path, write_output
+from nanobanana.config import (
+    GEMINI_MODEL,
+    APIConfig,
+    FileConfig,
+    invalidate_cached_key,
+    is_auth_error,
+    load_config,
+    resolve_aspect_size,
+    resolve_config,
+    telemetry_targets,
+)
+from nanobanana.jobstore import JobStore
+from nanobanana.ratelimit import open_rate_limiter
+from nanobanana.retry import APIError, RetryPolicy
+from nanobanana.slide_templates import get_slide_template
+from nanobanana.templates import get_command
+
+if TYPE_CHECKING:
+    from nanobanana.transcode import OutputFormat
+
+# Manifest fields accepted per job (JSONL keys / CSV header columns)
+MANIFEST_FIELDS = ("command", "template", "prompt", "inputs", "aspect", "size", "output")
+
+
+@dataclass
+class BatchJob:
+    """One generation job from a manifest, fully resolved before any request."""
+
+    line: int
+    prompt: str
+    inputs: list[str] = field(default_factory=list)
+    aspect: str = ""
+    size: str = ""
+    output: str = ""
+    label: str = ""
+    # Command or slide template the prompt was rendered with
+    template: str = ""
+    # Inputs as named, before being swapped for downscaled copies
+    sources: list[str] = field(default_factory=list)
+    command: str = "generate"
+
+
+class BatchInterrupted(RuntimeError):
+    """Ctrl-C stopped a run before every job was generated."""
+
+    def __init__(self, not_run: int, failures: int) -> None:
+        super().__init__(f"interrupted with {not_run} jobs not run")
+        self.not_run = not_run
+        self.failures = failures
+
+
+class _NotRun(Exception):
+    """A job skipped because the run is being interrupted."""
+
+
+class _InputNotGenerated(RuntimeError):
+    """A job failed because a job producing one of its inputs failed."""
+
+
+def _rerun_may_help(e: BaseException) -> bool:
+    """False for failures a rerun would repeat as is.
+
+    Those are requests the API rejected as invalid and local file errors
+    (unreadable inputs, unwritable outputs). Jobs missing an input follow
+    the job producing it.
+    """
+    if isinstance(e, _InputNotGenerated):
+        return False
+    if isinstance(e, OSError) or isinstance(e.__cause__, OSError):
+        return False
+    status = getattr(e, "status_code", None)
+    if status is not None and 400 <= status < 500:
+        return getattr(e, "retryable", False) or is_auth_error(e)
+    return True
+
+
+def _ignore_sigint() -> None:
+    # Workers finish their image; the parent decides what to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _parse_inputs(value: object) -> list[str]:
+    """Accept inputs as a JSON list or a ';'-separated string (CSV)."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [p.strip() for p in value.split(";") if p.strip()]
+    if isinstance(value, list) and all(isinstance(p, str) for p in value):
+        return value
+    raise RuntimeError("inputs must be a list of paths or a ';'-separated string")
+
+
+def _read_manifest_rows(path: Path) -> list[tuple[int, dict]]:
+    """Read raw manifest rows as (line_number, row) pairs."""
+    try:
+        text = path.read_text()
+    except OSError as e:
+        raise RuntimeError(f"failed to read manifest: {e}") from e
+
+    rows: list[tuple[int, dict]] = []
+    if path.suffix.lower() == ".csv":
+        reader = csv.DictReader(text.splitlines())
+        unknown = set(reader.fieldnames or []) - set(MANIFEST_FIELDS)
+        if unknown:
+            raise RuntimeError(f"unknown manifest columns: {', '.join(sorted(unknown))}")
+        # Header is line 1, so data rows start at line 2
+        for idx, row in enumerate(reader, start=2):
+            rows.append((idx, {k: v for k, v in row.items() if v}))
+        return rows
+
+    for idx, raw in enumerate(text.splitlines(), start=1):
+        raw = raw.strip()
+        if not raw or raw.startswith("#"):
+            continue
+        try:
+            row = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"manifest line {idx}: invalid JSON: {e}") from e
+        if not isinstance(row, dict):
+            raise RuntimeError(f"manifest line {idx}: expected a JSON object")
+        unknown = set(row) - set(MANIFEST_FIELDS)
+        if unknown:
+            raise RuntimeError(
+                f"manifest line {idx}: unknown fields: {', '.join(sorted(unknown))}"
+            )
+        rows.append((idx, row))
+    return rows
+
+
+def _check_output_dir(directory: Path, checked: set[Path]) -> None:
+    """Raise RuntimeError unless directory exists and is writable."""
+    if directory in checked:
+        return
+    if not directory.is_dir():
+        raise RuntimeError(f"output directory {directory} does not exist")
+    if not os.access(directory, os.W_OK | os.X_OK):
+        raise RuntimeError(f"output directory {directory} is not writable")
+    checked.add(directory)
+
+
+def jobs_from_rows(
+    rows: list[tuple[int, dict]],
+    base_dir: Path,
+    stem: str,
+    file_config: FileConfig | None = None,
+    source: str = "manifest",
+) -> list[BatchJob]:
+    """Validate (line_number, row) pairs with MANIFEST_FIELDS keys into jobs.
+
+    Relative input and output paths are resolved against base_dir; rows
+    without an output are named <stem>_001, <stem>_002, ... Each output's
+    directory must exist and be writable, so an image is never paid for
+    only to fail on writing it.
+    Raises RuntimeError naming the source line of the first invalid row.
+    """
+    jobs: list[BatchJob] = []
+    seen_outputs: dict[str, int] = {}
+    checked_dirs: set[Path] = set()
+
+    for line, row in rows:
+        try:
+            command_name = row.get("command", "") or "generate"
+            command = get_command(command_name)
+            if command is None:
+                raise RuntimeError(f"unknown command: {command_name}")
+
+            slide_template = None
+            template_name = row.get("template", "")
+            if template_name:
+                if command_name != "slide":
+                    raise RuntimeError("template is only valid with the slide command")
+                slide_template = get_slide_template(template_name)
+                if slide_template is None:
+                    raise RuntimeError(f"unknown slide template: {template_name}")
+
+            user_prompt = row.get("prompt", "")
+            if not isinstance(user_prompt, str) or not user_prompt.strip():
+                raise RuntimeError("no prompt provided")
+
+            aspect, size = resolve_aspect_size(
+                aspect_flag=row.get("aspect", "") or command.default_aspect,
+                size_flag=row.get("size", "") or command.default_size,
+                file_config=file_config,
+            )
+
+            inputs = [str(base_dir / p) for p in _parse_inputs(row.get("inputs"))]
+
+            output = row.get("output", "")
+            if output:
+                output = str(base_dir / output)
+            else:
+                output = str(base_dir / f"{stem}_{len(jobs) + 1:03d}")
+            _check_output_dir(Path(output).parent, checked_dirs)
+        except (RuntimeError, OSError) as e:
+            raise RuntimeError(f"{source} line {line}: {e}") from e
+
+        key = str(Path(output).with_suffix(""))
+        if key in seen_outputs:
+            raise RuntimeError(
+                f"{source} line {line}: output {output} already used on line {seen_outputs[key]}"
+            )
+        seen_outputs[key] = line
+
+        label = f"slide ({slide_template.name})" if slide_template else command.name
+        jobs.append(BatchJob(
+            line=line,
+            prompt=render_prompt(command, slide_template, user_prompt, aspect, size),
+            inputs=inputs,
+            aspect=aspect,
+            size=size,
+            output=output,
+            label=label,
+            template=(slide_template or command).template,
+            command=command.name,
+        ))
+
+    _check_dependencies(jobs, source)
+    return jobs
+
+
+def load_manifest(path: str, file_config: FileConfig | None = None) -> list[BatchJob]:
+    """Load and validate a batch manifest.
+
+    Every job is validated (command, slide subtemplate, aspect, size, duplicate
+    outputs) before anything is sent, so a typo on line 180 does not surface
+    after 179 paid generations. Relative input and output paths are resolved
+    against the manifest's directory.
+    Raises RuntimeError on validation errors.
+    """
+    manifest_path = Path(path)
+    jobs = jobs_from_rows(
+        _read_manifest_rows(manifest_path), manifest_path.parent, manifest_path.stem, file_config,
+    )
+    if not jobs:
+        raise RuntimeError(f"manifest contains no jobs: {path}")
+    return jobs
+
+
+def _stem(path: str) -> str:
+    return str(Path(path).with_suffix(""))
+
+
+def _dependencies(jobs: list[BatchJob]) -> list[list[int]]:
+    """For each job, the indexes of jobs whose output it takes as an input.
+
+    Outputs are matched without their extension, since the API picks it:
+    -i template.png waits for the job writing template.png or template.jpg.
+    """
+    producers = {_stem(job.output): i for i, job in enumerate(jobs)}
+    deps: list[list[int]] = []
+    for i, job in enumerate(jobs):
+        found: list[int] = []
+        for path in job.inputs:
+            producer = producers.get(_stem(path))
+            # A job editing its own previous output reads the existing file
+            if producer is not None and producer != i and producer not in found:
+                found.append(producer)
+        deps.append(found)
+    return deps
+
+
+def _check_dependencies(jobs: list[BatchJob], source: str) -> None:
+    """Raises RuntimeError if jobs wait on each other's outputs in a cycle."""
+    deps = _dependencies(jobs)
+    state = [0] * len(jobs)  # 0 unvisited, 1 on the current path, 2 done
+
+    def visit(i: int) -> None:
+        state[i] = 1
+        for d in deps[i]:
+            if state[d] == 1:
+                raise RuntimeError(
+                    f"{source} line {jobs[i].line}: input cycle with line {jobs[d].line}"
+                )
+            if state[d] == 0:
+                visit(d)
+        state[i] = 2
+
+    for i in range(len(jobs)):
+        if state[i] == 0:
+            visit(i)
+
+
+def _retry_note(retries: int) -> str:
+    if not retries:
+        return ""
+    return f", {retries} {'retry' if retries == 1 else 'retries'}"
+
+
+async def _run_jobs(
+    jobs: list[BatchJob],
+    api_config: APIConfig,
+    concurrency: int,
+    cache: ResultCache | None = None,
+    refresh: bool = False,
+    file_config: FileConfig | None = None,
+    build: BuildLog | None = None,
+    output_format: "OutputFormat | None" = None,
+    store: JobStore | None = None,
+    resumed: dict[int, str] | None = None,
+    errors: list[BaseException] | None = None,
+) -> int:
+    """Run jobs with at most `concurrency` requests in flight.
+
+    Jobs the build log finds up to date are skipped, and cache hits skip the
+    request. Each result is written as soon as its job finishes, then
+    transcoded on a process pool if output_format is set; configured
+    thumbnails are made on the same pool while later jobs run. A job whose
+    input is another job's output starts once that output exists. Jobs in
+    resumed (index -> output path) are done already. Every state change is
+    recorded in store, and each failure appended to errors. With telemetry
+    configured, every job that is generated (or served from the cache) is
+    exported as a generation of its own.
+
+    The first Ctrl-C starts no further jobs but lets those in flight
+    finish; a second one cancels them. Either way BatchInterrupted is
+    raised once everything is cleaned up. Returns failure count.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    deps = _dependencies(jobs)
+    # Output path of each job once finished, None if it failed
+    finished = [asyncio.get_running_loop().create_future() for _ in jobs]
+    # Shared with any other nanobanana process using the same key
+    limiter = open_rate_limiter(file_config, api_config)
+    resumed = resumed or {}
+    total = len(jobs)
+    done = len(resumed)
+    failures = 0
+    interrupted = False
+    tasks: list[asyncio.Task] = []
+    targets = telemetry_targets(file_config)
+    # Jobs that generated nothing: done already, up to date or not run
+    skipped: set[int] = set()
+
+    from nanobanana.derivatives import derivative_options, make_derivatives, sidecar_path
+    previews = derivative_options(file_config)
+    # Thumbnails are made while later jobs run; the summary waits for them
+    preview_tasks: list[asyncio.Future] = []
+
+    image_pool = None
+    if output_format or previews:
+        from concurrent.futures import ProcessPoolExecutor
+
+        from nanobanana.transcode import transcode_file
+        # Encoding a 4K image takes seconds; keep it off the event loop
+        image_pool = ProcessPoolExecutor(initializer=_ignore_sigint)
+
+    def make_previews(output_path: str) -> None:
+        preview_tasks.append(asyncio.get_running_loop().run_in_executor(
+            image_pool, make_derivatives, output_path, previews.sizes, previews.placeholder,
+        ))
+
+    if api_config.use_openrouter:
+        from nanobanana.openrouter import agenerate_image_to_file as gen_openrouter
+        from nanobanana.openrouter import create_async_client
+        # Keep-alive connections (or one HTTP/2 connection) serve every job
+        http_client = create_async_client(file_config, max_connections=concurrency)
+
+        async def generate(job: BatchJob, retry: RetryPolicy) -> tuple[str, str]:
+            # Stream-decode to disk so parallel 4K jobs don't each hold the image
+            return await gen_openrouter(
+                http_client,
+                api_key=api_config.api_key,
+                model=api_config.model,
+                prompt=job.prompt,
+                input_images=job.inputs,
+                aspect_ratio=job.aspect,
+                image_size=job.size,
+                output_for_mime=lambda mime: resolve_output_path(job.output, mime)[0],
+                retry=retry,
+            )
+
+        async def close() -> None:
+            await http_client.aclose()
+    else:
+        from nanobanana.gemini import agenerate_image as gen_gemini
+        from nanobanana.gemini import create_client, open_upload_cache
+        gemini_client = create_client(api_config.api_key)
+        # A reference image shared by many jobs is uploaded once
+        uploads = open_upload_cache(file_config)
+
+        async def generate(job: BatchJob, retry: RetryPolicy) -> tuple[str, str]:
+            image_data, mime_type = await gen_gemini(
+                gemini_client,
+                prompt=job.prompt,
+                input_images=job.inputs,
+                aspect_ratio=job.aspect,
+                image_size=job.size,
+                uploads=uploads,
+                api_key=api_config.api_key,
+                retry=retry,
+            )
+            output_path, _ = resolve_output_path(job.output, mime_type)
+            await asyncio.to_thread(write_output, output_path, image_data)
+            return output_path, mime_type
+
+        async def close() -> None:
+            await gemini_client.aio.aclose()
+
+    async def run_one(index: int, job: BatchJob, report: timings.Timings | None = None) -> str | None:
+        nonlocal done, failures
+        if index in resumed:
+            skipped.add(index)
+            return resumed[index]
+        cached = None
+        retries = 0
+
+        def count_retry(attempt: int, error: APIError, delay: float) -> None:
+            nonlocal retries
+            retries = attempt
+
+        try:
+            for d in deps[index]:
+                with timings.phase("queue"):
+                    produced = await finished[d]
+                if produced is None:
+                    if interrupted:
+                        raise _NotRun
+                    raise _InputNotGenerated(f"input from line {jobs[d].line} was not generated")
+                # The producer may have written another extension than named
+                job.inputs, job.sources = (
+                    [produced if _stem(p) == _stem(jobs[d].output) else p for p in paths]
+                    for paths in (job.inputs, job.sources)
+                )
+            start = time.monotonic()
+            if build:
+                record = await asyncio.to_thread(
+                    build.fingerprint,
+                    api_config,
+                    prompt=job.prompt,
+                    template=job.template,
+                    input_images=job.sources or job.inputs,
+                    aspect=job.aspect,
+                    size=job.size,
+                )
+                if output_format:
+                    record["format"] = f"{output_format.format} {output_format.quality}"
+                current = "" if refresh else build.current(job.output, record)
+                if current:
+                    skipped.add(index)
+                    if previews and not Path(sidecar_path(current)).exists():
+                        make_previews(current)
+                    if store:
+                        store.finish(job, current)
+                    done += 1
+                    print(f"[{done}/{total}] {current} ({job.label}, up to date)", flush=True)
+                    return current
+            if cache:
+                key = await asyncio.to_thread(
+                    key_for,
+                    api_config,
+                    prompt=job.prompt,
+                    input_images=job.inputs,
+                    aspect=job.aspect,
+                    size=job.size,
+                )
+                if not refresh:
+                    cached = await asyncio.to_thread(cache.get, key)
+            if cached:
+                image_data, mime_type = cached
+                output_path, _ = resolve_output_path(job.output, mime_type)
+                await asyncio.to_thread(write_output, output_path, image_data)
+                timings.annotate(cache="hit")
+            else:
+                queued = time.monotonic()
+                async with semaphore:
+                    if report:
+                        now = time.monotonic()
+                        report.record("queue", queued, now, now - queued)
+                    if interrupted:
+                        raise _NotRun
+                    if store:
+                        store.begin(job)
+                    output_path, mime_type = await generate(
+                        job, RetryPolicy(on_retry=count_retry, limiter=limiter),
+                    )
+                if cache:
+                    await asyncio.to_thread(cache.put_file, key, output_path, mime_type)
+            if output_format:
+                output_path = await asyncio.get_running_loop().run_in_executor(
+                    image_pool,
+                    transcode_file,
+                    output_path,
+                    output_format.format,
+                    output_format.quality,
+                    output_format.keep_original,
+                )
+            if build:
+                build.record(output_path, record)
+            if previews:
+                make_previews(output_path)
+            if store:
+                store.finish(job, output_path)
+        except _NotRun:
+            skipped.add(index)
+            return None
+        except asyncio.CancelledError:
+            if store:
+                store.release(job)
+            raise
+        except (RuntimeError, OSError) as e:
+            if is_auth_error(e):
+                invalidate_cached_key(api_config.api_key)
+            if store:
+                store.fail(job, str(e))
+            if errors is not None:
+                errors.append(e)
+            if report:
+                report.fail(e)
+            done += 1
+            failures += 1
+            print(f"[{done}/{total}] FAILED line {job.line} ({job.label}{_retry_note(retries)}): {e}",
+                  file=sys.stderr, flush=True)
+            return None
+        done += 1
+        elapsed = time.monotonic() - start
+        source = "cached" if cached else f"{elapsed:.1f}s"
+        print(f"[{done}/{total}] {output_path} ({job.label}, {source}{_retry_note(retries)})",
+              flush=True)
+        return output_path
+
+    async def run_traced(index: int, job: BatchJob) -> str | None:
+        """run_one with its phases collected, exported as one generation."""
+        with timings.collect() as report:
+            timings.annotate(
+                backend="openrouter" if api_config.use_openrouter else "gemini",
+                model=api_config.model or GEMINI_MODEL,
+                command=job.command,
+                size=job.size,
+                aspect=job.aspect,
+            )
+            output_path = await run_one(index, job, report)
+        if index not in skipped:
+            from nanobanana.telemetry import export
+            await asyncio.to_thread(export, report, targets)
+        return output_path
+
+    async def run(index: int, job: BatchJob) -> None:
+        output_path = None
+        try:
+            output_path = await (run_traced if targets else run_one)(index, job)
+        finally:
+            finished[index].set_result(output_path)
+
+    def interrupt() -> None:
+        nonlocal interrupted
+        if interrupted:
+            print("Cancelling in-flight jobs", file=sys.stderr, flush=True)
+            for task in tasks:
+                task.cancel()
+            return
+        interrupted = True
+        print("\nInterrupted: finishing jobs in flight, starting no more (Ctrl-C again to cancel them)",
+              file=sys.stderr, flush=True)
+
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, interrupt)
+        handling_sigint = True
+    except (NotImplementedError, RuntimeError, ValueError):
+        # No signal handlers on Windows or off the main thread: Ctrl-C cancels
+        handling_sigint = False
+
+    try:
+        tasks = [asyncio.create_task(run(i, job)) for i, job in enumerate(jobs)]
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+                raise result
+        for result in await asyncio.gather(*preview_tasks, return_exceptions=True):
+            if isinstance(result, RuntimeError):
+                # The image itself was saved
+                print(f"Warning: {result}", file=sys.stderr, flush=True)
+            elif isinstance(result, BaseException):
+                raise result
+    finally:
+        if handling_sigint:
+            loop.remove_signal_handler(signal.SIGINT)
+        await close()
+        if image_pool:
+            image_pool.shutdown(cancel_futures=True)
+        if build:
+            build.save()
+    if interrupted:
+        # done counts every job that finished, failed or was done already
+        raise BatchInterrupted(total - done, failures)
+    return failures
+
+
+def _prepare_inputs(jobs: list[BatchJob], file_config: FileConfig | None) -> None:
+    """Swap each job's inputs for downscaled copies, sharing one worker pool.
+
+    Inputs shared by many jobs (a template, a logo) are prepared once per size.
+    Inputs generated by another job don't exist yet and are left alone.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from nanobanana.preprocess import PreparedInputs, format_savings, prepare_inputs
+
+    generated = {_stem(job.output) for job in jobs}
+    by_size: dict[str, list[str]] = {}
+    for job in jobs:
+        paths = by_size.setdefault(job.size, [])
+        paths.extend(p for p in job.inputs if p not in paths and _stem(p) not in generated)
+    if not any(by_size.values()):
+        return
+
+    replacements: dict[tuple[str, str], str] = {}
+    total = PreparedInputs(paths=[])
+    # Workers only start if some input actually needs processing
+    with ProcessPoolExecutor() as pool:
+        for size, paths in by_size.items():
+            prepared = prepare_inputs(paths, size, file_config, executor=pool)
+            replacements.update(((size, p), q) for p, q in zip(paths, prepared.paths))
+            total.original_bytes += prepared.original_bytes
+            total.prepared_bytes += prepared.prepared_bytes
+
+    for job in jobs:
+        job.sources = job.inputs
+        job.inputs = [replacements.get((job.size, p), p) for p in job.inputs]
+    if total.saved_bytes > 0:
+        print(f"Inputs: {format_savings(total)}")
+
+
+def run_jobs(
+    jobs: list[BatchJob],
+    source: str,
+    api_config: APIConfig,
+    file_config: FileConfig | None,
+    *,
+    concurrency: int = 4,
+    use_cache: bool = True,
+    refresh: bool = False,
+    raw_inputs: bool = False,
+    kind: str = "Batch",
+    output_format: "OutputFormat | None" = None,
+    resume: bool = False,
+) -> None:
+    """Run validated jobs, printing progress and a summary.
+
+    Outputs still up to date in the build log next to source are skipped
+    unless refresh is set. Job states are recorded in the job store next to
+    source; with resume, jobs it records as done are not run again.
+    Raises RuntimeError if any job fails or the run is interrupted.
+    """
+    backend = f"OpenRouter ({api_config.model})" if api_config.use_openrouter else "Gemini"
+    print(f"Running {len(jobs)} jobs from {source} (concurrency {concurrency}, {backend})")
+    if not raw_inputs:
+        _prepare_inputs(jobs, file_config)
+
+    try:
+        store = JobStore(source, api_config, output_format)
+    except RuntimeError:
+        if resume:
+            raise
+        store = None  # a read-only directory still gets its images
+    try:
+        resumed = store.start(jobs, resume) if store else {}
+        if resume:
+            print(f"Resuming: {len(resumed)} of {len(jobs)} jobs already done")
+
+        start = time.monotonic()
+        cache = open_cache(file_config) if use_cache else None
+        build = BuildLog(Path(source).parent)
+        errors: list[BaseException] = []
+        try:
+            failures = asyncio.run(_run_jobs(
+                jobs, api_config, concurrency, cache, refresh, file_config, build, output_format,
+                store, resumed, errors,
+            ))
+        except (KeyboardInterrupt, BatchInterrupted) as e:
+            if isinstance(e, BatchInterrupted):
+                not_run = e.not_run
+                elapsed = time.monotonic() - start
+                succeeded = len(jobs) - e.failures - not_run
+                print(f"\n{kind} interrupted after {elapsed:.1f}s: {succeeded} succeeded, "
+                      f"{e.failures} failed, {not_run} not run")
+            else:
+                # Without signal handlers (Windows) Ctrl-C cancels the run outright
+                counts = store.counts() if store else {}
+                not_run = len(jobs) - counts.get("done", 0) - counts.get("failed", 0)
+            raise RuntimeError(
+                f"interrupted with {not_run} of {len(jobs)} jobs not run; "
+                f"continue with: nanobanana {kind.lower()} -resume {source}"
+            ) from None
+    finally:
+        if store:
+            store.close()
+    elapsed = time.monotonic() - start
+
+    succeeded = f"{len(jobs) - failures} succeeded"
+    notes = []
+    if resumed:
+        notes.append(f"{len(resumed)} resumed")
+    if build.skipped:
+        notes.append(f"{len(build.skipped)} up to date")
+    if notes:
+        succeeded += f" ({', '.join(notes)})"
+    print(f"\n{kind} finished in {elapsed:.1f}s: {succeeded}, {failures} failed")
+    if failures:
+        message = f"{failures} of {len(jobs)} jobs failed"
+        if any(_rerun_may_help(e) for e in errors):
+            message += "; rerun them with -resume"
+        raise RuntimeError(message)
+
+
+def run_batch(
+    manifest: str,
+    *,
+    concurrency: int = 4,
+    model_flag: str = "",
+    use_cache: bool = True,
+    refresh: bool = False,
+    raw_inputs: bool = False,
+    output_format: "OutputFormat | None" = None,
+    resume: bool = False,
+) -> None:
+    """Generate every job in a manifest concurrently.
+
+    Raises RuntimeError on invalid manifests or if any job fails.
+    """
+    if concurrency < 1:
+        raise RuntimeError(f"invalid concurrency: {concurrency} (must be >= 1)")
+
+    file_config = load_config()
+    _, _, api_config = resolve_config(
+        aspect_flag="",
+        size_flag="",
+        model_flag=model_flag,
+        file_config=file_config,
+    )
+    jobs = load_manifest(manifest, file_config)
+    run_jobs(
+        jobs, manifest, api_config, file_config,
+        concurrency=concurrency, use_cache=use_cache, refresh=refresh, raw_inputs=raw_inputs,
+        output_format=output_format, resume=resume,
+    )
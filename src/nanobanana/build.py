@@ -0,0 +1,119 @@
+"""Make-style incremental rebuilds for batch manifests and decks.
+
+A build log, .nanobanana-build.json next to the manifest or deck, records
+for each output what it was generated from: hashes of the rendered prompt,
+of the command or slide template, and of every input file, plus aspect,
+size, backend and model. A rerun skips each job whose record still matches
+and whose output still exists, so editing one slide regenerates only that
+slide (and slides using it as an input, whose input hash then changes).
+-refresh regenerates everything.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from nanobanana.config import GEMINI_MODEL, APIConfig
+
+BUILD_FILENAME = ".nanobanana-build.json"
+
+_VERSION = 1
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """Return the sha256 of a file. Raises RuntimeError if it can't be read."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError as e:
+        raise RuntimeError(f"failed to read image {path}: {e}") from e
+
+
+class BuildLog:
+    """Records of the outputs generated under one directory."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.path = root / BUILD_FILENAME
+        # Output stems (relative to root) found up to date in this run
+        self.skipped: list[str] = []
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            data = {}
+        if not isinstance(data, dict) or data.get("version") != _VERSION:
+            data = {}
+        self.outputs: dict[str, dict] = data.get("outputs", {})
+        self._dirty = False
+
+    def _key(self, output: str) -> str:
+        return os.path.relpath(Path(output).with_suffix(""), self.root)
+
+    def fingerprint(
+        self,
+        api_config: APIConfig,
+        *,
+        prompt: str,
+        template: str,
+        input_images: list[str],
+        aspect: str,
+        size: str,
+    ) -> dict:
+        """Describe what an output is generated from. Hashes the inputs."""
+        if api_config.use_openrouter:
+            backend, model = "openrouter", api_config.model
+        else:
+            backend, model = "gemini", GEMINI_MODEL
+        return {
+            "prompt": _text_hash(prompt),
+            "template": _text_hash(template) if template else "",
+            "inputs": [file_hash(p) for p in input_images],
+            "aspect": aspect,
+            "size": size,
+            "backend": backend,
+            "model": model,
+        }
+
+    def current(self, output: str, fingerprint: dict) -> str:
+        """Return the existing output path if it is up to date, else ""."""
+        key = self._key(output)
+        entry = self.outputs.get(key)
+        if not entry or {k: v for k, v in entry.items() if k != "output"} != fingerprint:
+            return ""
+        path = self.root / entry.get("output", "")
+        if not path.is_file():
+            return ""
+        self.skipped.append(key)
+        return str(path)
+
+    def record(self, output_path: str, fingerprint: dict) -> None:
+        """Remember what the freshly written output_path was generated from."""
+        self.outputs[self._key(output_path)] = {
+            "output": os.path.relpath(output_path, self.root),
+            **fingerprint,
+        }
+        self._dirty = True
+
+    def save(self) -> None:
+        """Write the log if anything changed. Failures are ignored."""
+        if not self._dirty:
+            return
+        data = json.dumps({"version": _VERSION, "outputs": self.outputs}, indent=1, sort_keys=True)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".nanobanana-build.", suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data + "\n")
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
@@ -0,0 +1,248 @@
+"""Content-addressed on-disk cache for generated images."""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+from nanobanana.config import GEMINI_MODEL, APIConfig, FileConfig
+from nanobanana.locking import locked_file
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+
+_KEY_VERSION = "1"
+
+
+def get_cache_dir() -> Path:
+    """Return the platform-appropriate cache directory.
+
+    Windows: %LOCALAPPDATA%/nanobanana
+    Others:  $XDG_CACHE_HOME/nanobanana (default: ~/.cache/)
+    """
+    if sys.platform == "win32":
+        cache_home = os.environ.get("LOCALAPPDATA", str(Path.home()))
+    else:
+        cache_home = os.environ.get("XDG_CACHE_HOME")
+        if not cache_home:
+            cache_home = str(Path.home() / ".cache")
+    return Path(cache_home) / "nanobanana"
+
+
+def cache_key(
+    *,
+    backend: str,
+    model: str,
+    prompt: str,
+    input_images: list[str],
+    aspect: str,
+    size: str,
+) -> str:
+    """Return a hex digest identifying one generation request.
+
+    Input images are hashed by content, so renaming a file still hits.
+    Raises RuntimeError if an input image cannot be read.
+    """
+    h = hashlib.sha256()
+    for value in (_KEY_VERSION, backend, model, prompt, aspect, size):
+        h.update(value.encode())
+        h.update(b"\0")
+    for img_path in input_images:
+        try:
+            with open(img_path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").digest()
+        except OSError as e:
+            raise RuntimeError(f"failed to read image {img_path}: {e}") from e
+        h.update(digest)
+    return h.hexdigest()
+
+
+def key_for(
+    api_config: APIConfig,
+    *,
+    prompt: str,
+    input_images: list[str],
+    aspect: str,
+    size: str,
+) -> str:
+    """Return cache_key() for a request sent with api_config."""
+    if api_config.use_openrouter:
+        backend, model = "openrouter", api_config.model
+    else:
+        backend, model = "gemini", GEMINI_MODEL
+    return cache_key(
+        backend=backend,
+        model=model,
+        prompt=prompt,
+        input_images=input_images,
+        aspect=aspect,
+        size=size,
+    )
+
+
+class ResultCache:
+    """Image cache keyed by cache_key(), evicting least recently used entries.
+
+    Each entry is one file: the MIME type on the first line, then the image
+    bytes. A hit bumps the file's mtime, so eviction removes the oldest
+    mtimes first until the cache fits in max_bytes.
+    """
+
+    def __init__(self, root: Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.root = root if root is not None else get_cache_dir() / "results"
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.img"
+
+    def _stats_path(self) -> Path:
+        return self.root / "stats.json"
+
+    def _read_stats(self) -> dict:
+        try:
+            return json.loads(self._stats_path().read_text())
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def _bump_stats(self, **deltas: int) -> None:
+        """Best-effort counter update; never raises.
+
+        Held under a lock on a separate file, since stats.json itself is
+        replaced, so concurrent processes don't lose each other's counts.
+        """
+        tmp = ""
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with locked_file(self.root / "stats.lock"):
+                stats = self._read_stats()
+                for name, delta in deltas.items():
+                    stats[name] = stats.get(name, 0) + delta
+                fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(stats, f)
+                os.replace(tmp, self._stats_path())
+        except OSError:
+            if tmp:
+                Path(tmp).unlink(missing_ok=True)
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        """Return (image_data, mime_type) for key, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            self._bump_stats(misses=1)
+            return None
+
+        mime_type, sep, image_data = raw.partition(b"\n")
+        if not sep or not image_data:
+            # Truncated entry — treat as a miss and drop it
+            path.unlink(missing_ok=True)
+            self._bump_stats(misses=1)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._bump_stats(hits=1, bytes_served=len(image_data))
+        return image_data, mime_type.decode()
+
+    def put(self, key: str, image_data: bytes, mime_type: str) -> None:
+        """Store an entry atomically, then evict down to max_bytes. Never raises."""
+        self._store(key, mime_type, lambda f: f.write(image_data))
+
+    def put_file(self, key: str, image_path: str, mime_type: str) -> None:
+        """Store an already written image without loading it whole. Never raises."""
+        def copy(f) -> None:
+            with open(image_path, "rb") as src:
+                shutil.copyfileobj(src, f)
+        self._store(key, mime_type, copy)
+
+    def _store(self, key: str, mime_type: str, write_body: Callable) -> None:
+        path = self._entry_path(key)
+        tmp = ""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(mime_type.encode() + b"\n")
+                write_body(f)
+            os.replace(tmp, path)
+        except OSError:
+            if tmp:
+                Path(tmp).unlink(missing_ok=True)
+            return
+        self._bump_stats(stores=1)
+        self.evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.glob("*/*.img"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """Remove least recently used entries until under max_bytes. Returns count removed."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            self._bump_stats(evictions=removed)
+        return removed
+
+    def stats(self) -> dict:
+        """Return hit/miss counters plus current entry count and size."""
+        entries = self._entries()
+        stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_served": 0}
+        stats.update(self._read_stats())
+        stats["entries"] = len(entries)
+        stats["bytes"] = sum(size for _, size, _ in entries)
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def clear(self) -> int:
+        """Delete all entries and reset counters. Returns count removed."""
+        entries = self._entries()
+        for _, _, path in entries:
+            path.unlink(missing_ok=True)
+        self._stats_path().unlink(missing_ok=True)
+        return len(entries)
+
+
+def open_cache(file_config: FileConfig | None) -> ResultCache | None:
+    """Return the result cache configured by file_config, or None if disabled."""
+    if file_config is not None and not file_config.cache:
+        return None
+    max_bytes = DEFAULT_MAX_BYTES
+    if file_config is not None and file_config.cache_max_mb:
+        max_bytes = file_config.cache_max_mb * 1024 * 1024
+    return ResultCache(max_bytes=max_bytes)
+
+
+def format_stats(stats: dict) -> str:
+    """Format cache statistics for display."""
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "n/a"
+    lines = [
+        f"Entries:   {stats['entries']}",
+        f"Size:      {stats['bytes'] / 1024 / 1024:.1f} MB of {stats['max_bytes'] / 1024 / 1024:.0f} MB",
+        f"Hits:      {stats['hits']}",
+        f"Misses:    {stats['misses']}",
+        f"Hit rate:  {hit_rate}",
+        f"Evictions: {stats['evictions']}",
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,108 @@
+"""Several alternative images for one request, generated concurrently (-n).
+
+All N requests are in flight at once, sharing one connection pool and one
+encoding of the inputs (see openrouter.agenerate_candidates_to_files and
+gemini.agenerate_candidates). Neither API reliably returns more than one
+image per request for this model, so candidates are separate requests.
+Outputs are numbered: -o logo.png gives logo-1.png, logo-2.png, ...
+"""
+
+import asyncio
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nanobanana.config import APIConfig, FileConfig
+from nanobanana.mime import extension_from_mime
+
+if TYPE_CHECKING:
+    from nanobanana.gemini import UploadCache
+    from nanobanana.retry import RetryPolicy
+
+MAX_CANDIDATES = 8
+
+
+def check_candidates(n: int) -> None:
+    """Raises RuntimeError unless 1 <= n <= MAX_CANDIDATES."""
+    if not 1 <= n <= MAX_CANDIDATES:
+        raise RuntimeError(f"invalid -n: {n} (valid: 1-{MAX_CANDIDATES})")
+
+
+def candidate_path(output: str, index: int, mime_type: str) -> str:
+    """Numbered path for candidate index (0-based), extension matching mime_type."""
+    stem = str(Path(output).with_suffix(""))
+    return f"{stem}-{index + 1}{extension_from_mime(mime_type)}"
+
+
+async def agenerate_candidates(
+    api_config: APIConfig,
+    n: int,
+    *,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    output_for_mime: Callable[[int, str], str],
+    retry: "RetryPolicy | None" = None,
+    uploads: "UploadCache | None" = None,
+    file_config: FileConfig | None = None,
+) -> list[tuple[str, str] | BaseException]:
+    """Generate n candidates, written to output_for_mime(index, mime_type).
+
+    Returns (output_path, mime_type) or the exception, per candidate.
+    """
+    if api_config.use_openrouter:
+        from nanobanana.openrouter import agenerate_candidates_to_files, create_async_client
+        async with create_async_client(file_config, max_connections=n) as client:
+            return await agenerate_candidates_to_files(
+                client,
+                n,
+                api_key=api_config.api_key,
+                model=api_config.model,
+                prompt=prompt,
+                input_images=input_images,
+                aspect_ratio=aspect_ratio,
+                image_size=image_size,
+                output_for_mime=output_for_mime,
+                retry=retry,
+            )
+
+    from nanobanana.cli import write_output
+    from nanobanana.gemini import agenerate_candidates as gemini_candidates
+    from nanobanana.gemini import create_client
+
+    client = create_client(api_config.api_key)
+    try:
+        images = await gemini_candidates(
+            client,
+            n,
+            prompt=prompt,
+            input_images=input_images,
+            aspect_ratio=aspect_ratio,
+            image_size=image_size,
+            uploads=uploads,
+            api_key=api_config.api_key,
+            retry=retry,
+        )
+    finally:
+        await client.aio.aclose()
+
+    results: list[tuple[str, str] | BaseException] = []
+    for index, image in enumerate(images):
+        if isinstance(image, BaseException):
+            results.append(image)
+            continue
+        image_data, mime_type = image
+        path = output_for_mime(index, mime_type)
+        try:
+            await asyncio.to_thread(write_output, path, image_data)
+        except RuntimeError as e:
+            results.append(e)
+            continue
+        results.append((path, mime_type))
+    return results
+
+
+def generate_candidates(api_config: APIConfig, n: int, **kwargs) -> list[tuple[str, str] | BaseException]:
+    """Blocking wrapper around agenerate_candidates for the CLI."""
+    return asyncio.run(agenerate_candidates(api_config, n, **kwargs))
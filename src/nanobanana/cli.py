@@ -1,27 +1,49 @@
 """CLI entry point for nanobanana."""
 
 import argparse
+import os
 import subprocess
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
 
-from nanobanana import __version__
-from nanobanana.config import load_config, resolve_config
+import nanobanana
+from nanobanana import timings
+from nanobanana.config import (
+    GEMINI_MODEL,
+    APIConfig,
+    FileConfig,
+    invalidate_cached_key,
+    is_auth_error,
+    load_config,
+    resolve_config,
+    telemetry_targets,
+)
 from nanobanana.mime import extension_from_mime
-from nanobanana.slide_templates import SLIDE_TEMPLATES, format_slide_help, get_slide_template
+from nanobanana.slide_templates import (
+    SLIDE_TEMPLATES,
+    SlideTemplate,
+    format_slide_help,
+    get_slide_template,
+)
 from nanobanana.templates import (
     COMMANDS,
+    Command,
     format_command_help,
     format_help_overview,
     get_command,
 )
 
 # All known subcommand names plus pseudo-commands
-_KNOWN_COMMANDS = frozenset(COMMANDS) | {"help", "version", "install-skill", "setup"}
+_KNOWN_COMMANDS = frozenset(COMMANDS) | {
+    "help", "version", "install-skill", "setup", "batch", "deck", "cache", "daemon",
+}
 
 # Flags that consume the next argument as their value
-_VALUE_FLAGS = frozenset({"-i", "-o", "-aspect", "-size", "-model"})
+_VALUE_FLAGS = frozenset({
+    "-i", "-o", "-aspect", "-size", "-model", "-concurrency", "-n", "-format", "-quality",
+})
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -43,6 +65,26 @@ def build_parser() -> argparse.ArgumentParser:
                         help="Open image after saving")
     parser.add_argument("-version", action="store_true", dest="show_version",
                         help="Show version")
+    parser.add_argument("-n", type=int, default=1, dest="candidates",
+                        help="Generate N alternative images concurrently")
+    parser.add_argument("-concurrency", type=int, default=4, dest="concurrency",
+                        help="Parallel jobs for batch and deck")
+    parser.add_argument("-no-cache", action="store_true", dest="no_cache",
+                        help="Bypass the result cache")
+    parser.add_argument("-refresh", action="store_true", dest="refresh",
+                        help="Regenerate and overwrite cached results")
+    parser.add_argument("-raw-inputs", action="store_true", dest="raw_inputs",
+                        help="Upload input images without downscaling")
+    parser.add_argument("-resume", action="store_true", dest="resume",
+                        help="Continue an interrupted batch or deck")
+    parser.add_argument("-format", default="", dest="format",
+                        help="Transcode output to webp, avif or jpeg")
+    parser.add_argument("-quality", type=int, default=0, dest="quality",
+                        help="Quality for -format (1-100)")
+    parser.add_argument("-keep-original", action="store_true", dest="keep_original",
+                        help="Keep the original image next to the -format one")
+    parser.add_argument("-timings", action="store_true", dest="timings",
+                        help="Print a JSON per-phase timing report to stderr")
     parser.add_argument("prompt", nargs="*", help="Generation prompt")
     return parser
 
@@ -75,6 +117,106 @@ def print_usage() -> None:
     sys.stderr.write(format_help_overview())
 
 
+def render_prompt(
+    command: Command | None,
+    slide_template: SlideTemplate | None,
+    user_prompt: str,
+    aspect: str,
+    size: str,
+) -> str:
+    """Wrap the user prompt in the slide subtemplate or command template."""
+    if slide_template:
+        return slide_template.template.format(user_prompt=user_prompt, size=size)
+    if command:
+        return command.apply(user_prompt, aspect=aspect, size=size)
+    return user_prompt
+
+
+def default_output_stem() -> str:
+    """Return a timestamped output name no file in the working directory uses.
+
+    Runs within the same second get image_<timestamp>_2, _3, ...
+    """
+    stem = datetime.now().strftime("image_%Y%m%d_%H%M%S")
+    name, n = stem, 1
+    # Also covers numbered candidates (name-1.png, ...)
+    while any(Path().glob(f"{name}.*")) or any(Path().glob(f"{name}-*")):
+        n += 1
+        name = f"{stem}_{n}"
+    return name
+
+
+def resolve_output_path(output: str, mime_type: str) -> tuple[str, bool]:
+    """Return (output_path, adjusted) with the extension matching mime_type.
+
+    An empty output yields a timestamped default name. adjusted is True when
+    the user-supplied extension was replaced.
+    """
+    correct_ext = extension_from_mime(mime_type)
+
+    if not output:
+        return default_output_stem() + correct_ext, False
+
+    current_ext = Path(output).suffix.lower()
+    if current_ext != correct_ext:
+        return str(Path(output).with_suffix("")) + correct_ext, True
+    return output, False
+
+
+def _retry_policy(file_config, api_config):
+    """Return the default retry policy, reporting each retry on stderr.
+
+    Attempts wait for the shared rate limiter when one is configured.
+    """
+    from nanobanana.ratelimit import open_rate_limiter
+    from nanobanana.retry import RetryPolicy
+
+    def report(attempt, error, delay) -> None:
+        print(f"  Retry:  {policy.describe(attempt, error, delay)}", file=sys.stderr, flush=True)
+
+    policy = RetryPolicy(on_retry=report, limiter=open_rate_limiter(file_config, api_config))
+    return policy
+
+
+def _output_format(args: argparse.Namespace):
+    """Return the validated -format request, or None. Raises RuntimeError."""
+    if not args.format:
+        if args.quality or args.keep_original:
+            raise RuntimeError("-quality and -keep-original require -format")
+        return None
+    from nanobanana.transcode import check_output_format
+    return check_output_format(args.format, args.quality, args.keep_original)
+
+
+def _derivative_options(file_config: FileConfig | None):
+    """Return the configured thumbnails/placeholder, or None. Raises RuntimeError."""
+    if not file_config or not (file_config.thumbnails or file_config.placeholder):
+        return None
+    from nanobanana.derivatives import derivative_options
+    return derivative_options(file_config)
+
+
+def _make_previews(paths: list[str], options) -> None:
+    """Write thumbnails and sidecars. Failures are warnings: the images are saved."""
+    from nanobanana.derivatives import make_all
+
+    with timings.phase("previews"):
+        results = make_all(paths, options)
+    for result in results:
+        if isinstance(result, RuntimeError):
+            print(f"Warning: {result}", file=sys.stderr)
+        else:
+            print(f"Previews: {result}")
+
+
+def write_output(output_path: str, image_data: bytes) -> None:
+    """Write image bytes to disk. Raises RuntimeError on failure."""
+    try:
+        Path(output_path).write_bytes(image_data)
+    except OSError as e:
+        raise RuntimeError(f"failed to write output file: {e}") from e
+
+
 def run(argv: list[str] | None = None) -> None:
     """Main CLI logic. Raises RuntimeError on errors."""
     if argv is None:
@@ -105,7 +247,7 @@ def run(argv: list[str] | None = None) -> None:
 
     # Handle pseudo-commands
     if command_name == "version" or args.show_version:
-        print(f"nanobanana {__version__}")
+        print(f"nanobanana {nanobanana.__version__}")
         return
 
     if command_name == "help" or args.show_help:
@@ -123,10 +265,89 @@ def run(argv: list[str] | None = None) -> None:
         print_usage()
         return
 
+    if command_name == "cache":
+        from nanobanana.cache import ResultCache, format_stats, open_cache
+        cache = open_cache(load_config()) or ResultCache()
+        action = args.prompt[0] if args.prompt else "stats"
+        if action == "stats":
+            print(format_stats(cache.stats()))
+        elif action == "clear":
+            removed = cache.clear()
+            print(f"Removed {removed} cached images from {cache.root}")
+        else:
+            raise RuntimeError(f"unknown cache action: {action} (use stats or clear)")
+        return
+
+    if command_name == "daemon":
+        from nanobanana.daemon import run_daemon_command
+        run_daemon_command(args.prompt[0] if args.prompt else "")
+        return
+
+    if command_name == "batch":
+        if not args.prompt:
+            raise RuntimeError("no manifest provided (usage: nanobanana batch jobs.jsonl)")
+        from nanobanana.batch import run_batch
+        run_batch(
+            args.prompt[0],
+            concurrency=args.concurrency,
+            model_flag=args.model,
+            use_cache=not args.no_cache,
+            refresh=args.refresh,
+            raw_inputs=args.raw_inputs,
+            output_format=_output_format(args),
+            resume=args.resume,
+        )
+        return
+
+    if command_name == "deck":
+        if not args.prompt:
+            raise RuntimeError("no deck provided (usage: nanobanana deck presentation.md)")
+        from nanobanana.deck import run_deck
+        run_deck(
+            args.prompt[0],
+            concurrency=args.concurrency,
+            model_flag=args.model,
+            use_cache=not args.no_cache,
+            refresh=args.refresh,
+            raw_inputs=args.raw_inputs,
+            output_format=_output_format(args),
+            resume=args.resume,
+        )
+        return
+
     if not args.prompt:
         print_usage()
         raise RuntimeError("no prompt provided")
 
+    started = time.monotonic()
+    file_config = load_config()
+    config_loaded = time.monotonic()
+
+    # -timings, or the env var for wrappers that can't change the command line
+    report_to = "1" if args.timings else os.environ.get(timings.ENV_VAR, "")
+    # Telemetry is only imported when configured
+    targets = telemetry_targets(file_config)
+    if not report_to and not targets:
+        _generate(args, command_name, file_config)
+        return
+    with timings.collect(started) as report:
+        report.record("config", started, config_loaded, config_loaded - started)
+        try:
+            _generate(args, command_name, file_config)
+        except BaseException as e:
+            report.fail(e)
+            raise
+        finally:
+            report.finish()
+            if report_to:
+                timings.emit(report, report_to)
+            if targets:
+                from nanobanana.telemetry import export
+                export(report, targets)
+
+
+def _generate(args: argparse.Namespace, command_name: str, file_config: FileConfig | None) -> None:
+    """Generate one image as requested by args. Raises RuntimeError on errors."""
     # Check for slide subtemplate: "slide funnel 'prompt'" -> subtemplate=funnel
     slide_template = None
     if command_name == "slide" and args.prompt:
@@ -152,17 +373,36 @@ def run(argv: list[str] | None = None) -> None:
         effective_aspect_flag = args.aspect
         effective_size_flag = args.size
 
-    # Load config file
-    file_config = load_config()
+    if args.candidates != 1:
+        from nanobanana.candidates import check_candidates
+        check_candidates(args.candidates)
+    output_format = _output_format(args)
+    previews = _derivative_options(file_config)
+
+    # Forward config resolution and generation to a warm daemon if one is running
+    # (candidates run in-process: the daemon serves one request at a time)
+    daemon = None
+    if args.candidates == 1 and not os.environ.get("NANOBANANA_NO_DAEMON"):
+        with timings.phase("daemon"):
+            from nanobanana.daemon import connect
+            daemon = connect()
 
     # Resolve configuration
     try:
-        aspect, size, api_config = resolve_config(
-            aspect_flag=effective_aspect_flag,
-            size_flag=effective_size_flag,
-            model_flag=args.model,
-            file_config=file_config,
-        )
+        with timings.phase("resolve"):
+            if daemon:
+                aspect, size, api_config = daemon.resolve(
+                    aspect_flag=effective_aspect_flag,
+                    size_flag=effective_size_flag,
+                    model_flag=args.model,
+                )
+            else:
+                aspect, size, api_config = resolve_config(
+                    aspect_flag=effective_aspect_flag,
+                    size_flag=effective_size_flag,
+                    model_flag=args.model,
+                    file_config=file_config,
+                )
     except RuntimeError as e:
         # If no config and no env vars, offer setup wizard
         if file_config is None and "API_KEY" in str(e):
@@ -180,13 +420,41 @@ def run(argv: list[str] | None = None) -> None:
                 ) from e
         raise
 
+    # The other backend serves the same model; bring it in when slow or failing
+    alternate = None
+    hedge_percentile, failover = 0, False
+    if file_config is not None and (file_config.hedge_percentile or file_config.failover):
+        from nanobanana.hedge import hedge_options
+        hedge_percentile, failover = hedge_options(file_config)
+    if (hedge_percentile or failover) and args.candidates == 1:
+        from nanobanana.config import resolve_alternate
+        with timings.phase("resolve"):
+            alternate = resolve_alternate(api_config, file_config)
+        if alternate and daemon:
+            # Hedging runs in-process; the daemon serves one backend per request
+            daemon.close()
+            daemon = None
+
+    timings.annotate(
+        backend="openrouter" if api_config.use_openrouter else "gemini",
+        model=api_config.model or GEMINI_MODEL,
+        command=command.name if command else "generate",
+        size=size,
+        aspect=aspect,
+    )
+
     # Apply template to wrap the user prompt
-    if slide_template:
-        prompt = slide_template.template.format(user_prompt=user_prompt, size=size)
-    elif command:
-        prompt = command.apply(user_prompt, aspect=aspect, size=size)
-    else:
-        prompt = user_prompt
+    with timings.phase("prompt"):
+        prompt = render_prompt(command, slide_template, user_prompt, aspect, size)
+
+    # Downscale oversized inputs for the target size before upload
+    input_images = args.input_images
+    prepared = None
+    if input_images and not args.raw_inputs:
+        from nanobanana.preprocess import prepare_inputs
+        with timings.phase("preprocess"):
+            prepared = prepare_inputs(input_images, size, file_config)
+        input_images = prepared.paths
 
     print("Generating image...")
     if slide_template:
@@ -196,67 +464,239 @@ def run(argv: list[str] | None = None) -> None:
     print(f"  Prompt: {user_prompt}")
     if args.input_images:
         print(f"  Inputs: {', '.join(args.input_images)}")
+    if prepared and prepared.saved_bytes > 0:
+        from nanobanana.preprocess import format_savings
+        print(f"  Upload: {format_savings(prepared)}")
     print(f"  Aspect: {aspect}")
     print(f"  Size:   {size}")
     if api_config.use_openrouter:
         print(f"  API:    OpenRouter ({api_config.model})")
     else:
         print("  API:    Gemini")
+    if alternate:
+        from nanobanana.hedge import backend_name
+        mode = "hedge" if hedge_percentile else "failover"
+        print(f"  Backup: {backend_name(alternate)} ({mode})")
+
+    if args.candidates > 1:
+        print(f"  Count:  {args.candidates}")
+        _generate_candidates(
+            args, file_config, api_config, prompt, input_images, aspect, size, output_format, previews,
+        )
+        return
+
+    # Serve identical requests from the result cache
+    cache = None
+    cached = None
+    with timings.phase("cache"):
+        if not args.no_cache:
+            from nanobanana.cache import key_for, open_cache
+            cache = open_cache(file_config)
+        if cache:
+            key = key_for(
+                api_config,
+                prompt=prompt,
+                input_images=input_images,
+                aspect=aspect,
+                size=size,
+            )
+            if not args.refresh:
+                cached = cache.get(key)
 
     # Generate image
-    if api_config.use_openrouter:
-        from nanobanana.openrouter import generate_image as gen_openrouter
-        image_data, mime_type = gen_openrouter(
-            api_key=api_config.api_key,
-            model=api_config.model,
-            prompt=prompt,
-            input_images=args.input_images,
-            aspect_ratio=aspect,
-            image_size=size,
-        )
-    else:
-        from nanobanana.gemini import generate_image as gen_gemini
-        image_data, mime_type = gen_gemini(
-            api_key=api_config.api_key,
+    output_path = ""
+    # Finer phases (connect, send, wait, ...) are recorded by the backends
+    with timings.phase("backend"):
+        if cached:
+            image_data, mime_type = cached
+            print("  Cache:  hit")
+            timings.annotate(cache="hit")
+        elif alternate:
+            from nanobanana.gemini import open_upload_cache
+            from nanobanana.hedge import backend_name, generate_hedged
+            output_path, mime_type, served_by = generate_hedged(
+                api_config,
+                alternate,
+                prompt=prompt,
+                input_images=input_images,
+                aspect_ratio=aspect,
+                image_size=size,
+                output_for_mime=lambda mime: resolve_output_path(args.output, mime)[0],
+                hedge_percentile=hedge_percentile,
+                failover=failover,
+                retry_for=lambda config: _retry_policy(file_config, config),
+                uploads=open_upload_cache(file_config),
+                file_config=file_config,
+                on_switch=lambda message: print(f"  Backup: {message}", file=sys.stderr, flush=True),
+            )
+            if served_by is alternate:
+                print(f"  Served: {backend_name(alternate)}")
+                timings.annotate(served_by=backend_name(alternate).lower())
+        elif daemon:
+            try:
+                image_data, mime_type = daemon.generate(
+                    api_config,
+                    prompt=prompt,
+                    input_images=input_images,
+                    aspect=aspect,
+                    size=size,
+                )
+            finally:
+                daemon.close()
+        elif api_config.use_openrouter:
+            # Stream-decode straight to disk; the image never sits in memory whole
+            from nanobanana.openrouter import create_client, generate_image_to_file
+            with create_client(file_config) as client:
+                output_path, mime_type = generate_image_to_file(
+                    api_key=api_config.api_key,
+                    model=api_config.model,
+                    prompt=prompt,
+                    input_images=input_images,
+                    aspect_ratio=aspect,
+                    image_size=size,
+                    output_for_mime=lambda mime: resolve_output_path(args.output, mime)[0],
+                    client=client,
+                    retry=_retry_policy(file_config, api_config),
+                )
+        else:
+            from nanobanana.gemini import generate_image as gen_gemini
+            from nanobanana.gemini import open_upload_cache
+            image_data, mime_type = gen_gemini(
+                api_key=api_config.api_key,
+                prompt=prompt,
+                input_images=input_images,
+                aspect_ratio=aspect,
+                image_size=size,
+                uploads=open_upload_cache(file_config),
+                retry=_retry_policy(file_config, api_config),
+            )
+
+    if not output_path:
+        output_path, _ = resolve_output_path(args.output, mime_type)
+        with timings.phase("write"):
+            write_output(output_path, image_data)
+    if args.output and output_path != args.output and not output_format:
+        print(f"\nInfo: API returned {mime_type} format, adjusted output to: {output_path}")
+
+    if cache and not cached:
+        with timings.phase("cache"):
+            cache.put_file(key, output_path, mime_type)
+
+    original_path = output_path
+    if output_format:
+        from nanobanana.transcode import format_transcode, transcode_file
+        original_bytes = os.path.getsize(original_path)
+        with timings.phase("transcode"):
+            output_path = transcode_file(
+                original_path, output_format.format, output_format.quality, output_format.keep_original,
+            )
+        if output_path != original_path:
+            size_change = format_transcode(original_bytes, os.path.getsize(output_path), output_format.format)
+            print(f"  Format: {size_change}")
+
+    print(f"\nImage saved to: {output_path}")
+    if output_path != original_path and output_format.keep_original:
+        print(f"Original kept: {original_path}")
+
+    # Open image if requested
+    if args.open_image:
+        _open_image(output_path)
+
+    if previews:
+        _make_previews([output_path], previews)
+
+
+def _generate_candidates(
+    args: argparse.Namespace,
+    file_config: FileConfig | None,
+    api_config: APIConfig,
+    prompt: str,
+    input_images: list[str],
+    aspect: str,
+    size: str,
+    output_format=None,
+    previews=None,
+) -> None:
+    """Generate args.candidates images concurrently; -o names are numbered.
+
+    The result cache is bypassed: it would return one image N times. With
+    output_format, the saved candidates are transcoded in parallel, and
+    with previews their thumbnails made in parallel.
+    Raises RuntimeError if any candidate failed, after saving the rest.
+    """
+    from nanobanana.candidates import candidate_path, generate_candidates
+
+    base = args.output or default_output_stem() + ".png"
+    uploads = None
+    if not api_config.use_openrouter:
+        from nanobanana.gemini import open_upload_cache
+        uploads = open_upload_cache(file_config)
+    with timings.phase("backend"):
+        results = generate_candidates(
+            api_config,
+            args.candidates,
             prompt=prompt,
-            input_images=args.input_images,
+            input_images=input_images,
             aspect_ratio=aspect,
             image_size=size,
+            output_for_mime=lambda index, mime: candidate_path(base, index, mime),
+            retry=_retry_policy(file_config, api_config),
+            uploads=uploads,
+            file_config=file_config,
         )
 
-    # Determine output filename
-    output_path = args.output
-    correct_ext = extension_from_mime(mime_type)
+    saved = [result[0] for result in results if not isinstance(result, BaseException)]
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if saved and output_format:
+        from nanobanana.transcode import format_transcode, transcode_files
+        sizes = [os.path.getsize(path) for path in saved]
+        with timings.phase("transcode"):
+            transcoded = transcode_files(saved, output_format)
+        errors += [path for path in transcoded if isinstance(path, RuntimeError)]
+        saved = [path for path in transcoded if not isinstance(path, RuntimeError)]
+        if saved:
+            original_bytes = sum(
+                size for size, path in zip(sizes, transcoded) if not isinstance(path, RuntimeError)
+            )
+            size_change = format_transcode(
+                original_bytes, sum(os.path.getsize(path) for path in saved), output_format.format,
+            )
+            print(f"  Format: {size_change}")
+    if saved:
+        print("\nImages saved to:")
+        for path in saved:
+            print(f"  {path}")
+    for error in errors:
+        if not isinstance(error, Exception):
+            raise error
+        print(f"  Failed: {error}", file=sys.stderr)
 
-    if not output_path:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = f"image_{timestamp}{correct_ext}"
+    if args.open_image:
+        for path in saved:
+            _open_image(path)
+    if previews and saved:
+        _make_previews(saved, previews)
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(results)} candidates failed")
+
+
+def _open_image(output_path: str) -> None:
+    if sys.platform == "darwin":
+        opener = ["open"]
+    elif sys.platform == "win32":
+        opener = ["start", ""]
     else:
-        current_ext = Path(output_path).suffix.lower()
-        if current_ext != correct_ext:
-            output_path = str(Path(output_path).with_suffix("")) + correct_ext
-            print(f"\nInfo: API returned {mime_type} format, adjusted output to: {output_path}")
-
-    # Write file
+        opener = ["xdg-open"]
     try:
-        Path(output_path).write_bytes(image_data)
-    except OSError as e:
-        raise RuntimeError(f"failed to write output file: {e}") from e
+        subprocess.Popen([*opener, output_path])
+    except OSError:
+        pass  # silently ignore if opener not available
 
-    print(f"\nImage saved to: {output_path}")
 
-    # Open image if requested
-    if args.open_image:
-        if sys.platform == "darwin":
-            opener = ["open"]
-        elif sys.platform == "win32":
-            opener = ["start", ""]
-        else:
-            opener = ["xdg-open"]
-        try:
-            subprocess.Popen([*opener, output_path])
-        except OSError:
-            pass  # silently ignore if opener not available
+def _wants_update_hint(argv: list[str]) -> bool:
+    """Only interactive, one-shot invocations show (and refresh) update hints."""
+    command_name, _ = _extract_subcommand(argv)
+    return command_name not in ("batch", "deck", "daemon") and sys.stderr.isatty()
 
 
 def main() -> None:
@@ -264,15 +704,17 @@ def main() -> None:
     try:
         run()
     except RuntimeError as e:
+        if is_auth_error(e):
+            # A rotated or revoked key: don't keep serving it from the key cache
+            invalidate_cached_key()
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
     finally:
-        try:
-            from nanobanana.update_check import check_for_update
-            fc = load_config()
-            auto = fc.auto_update if fc else False
-            hint = check_for_update(__version__, auto_update=auto)
-            if hint:
-                print(f"\n{hint}", file=sys.stderr)
-        except Exception:
-            pass
+        if _wants_update_hint(sys.argv[1:]):
+            try:
+                from nanobanana.update_check import check_for_update
+                hint = check_for_update(nanobanana.__version__)
+                if hint:
+                    print(f"\n{hint}", file=sys.stderr)
+            except Exception:
+                pass
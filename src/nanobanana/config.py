@@ -1,12 +1,18 @@
 """Configuration loading and validation."""
 
+import hashlib
 import json
 import os
 import subprocess
 import sys
+import tempfile
+import time
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from nanobanana import timings
+
 GEMINI_MODEL = "gemini-3-pro-image-preview"
 OPENROUTER_DEFAULT_MODEL = "google/gemini-3-pro-image-preview"
 HTTP_TIMEOUT = 120
@@ -18,6 +24,15 @@ VALID_ASPECT_RATIOS = frozenset({
 
 VALID_SIZES = frozenset({"1K", "2K", "4K"})
 
+KEY_CACHE_FILENAME = "keys.json"
+
+# Telemetry outputs: config key -> overriding environment variable
+TELEMETRY_ENV = {
+    "trace_file": "NANOBANANA_TRACE_FILE",
+    "otlp_endpoint": "NANOBANANA_OTLP_ENDPOINT",
+    "prometheus_file": "NANOBANANA_PROMETHEUS_FILE",
+}
+
 
 @dataclass
 class FileConfig:
@@ -26,8 +41,29 @@ class FileConfig:
     aspect: str = ""
     size: str = ""
     key_command: str = ""
+    key_cache_ttl: int = 0
     api_key: str = ""
     auto_update: bool = False
+    cache: bool = True
+    cache_max_mb: int = 0
+    input_format: str = ""
+    input_quality: int = 0
+    upload_cache: bool = True
+    rate_limit_rpm: int = 0
+    max_inflight: int = 0
+    hedge_percentile: int = 0
+    failover: bool = False
+    trace_file: str = ""
+    otlp_endpoint: str = ""
+    prometheus_file: str = ""
+    http2: bool = False
+    max_connections: int = 0
+    connect_timeout: float = 0
+    read_timeout: float = 0
+    write_timeout: float = 0
+    compress_requests: bool = False
+    thumbnails: list[int] = field(default_factory=list)
+    placeholder: str = ""
 
 
 @dataclass
@@ -71,24 +107,154 @@ def load_config() -> FileConfig | None:
         aspect=data.get("aspect", ""),
         size=data.get("size", ""),
         key_command=data.get("key_command", ""),
+        key_cache_ttl=data.get("key_cache_ttl", 0),
         api_key=data.get("api_key", ""),
         auto_update=data.get("auto_update", False),
+        cache=data.get("cache", True),
+        cache_max_mb=data.get("cache_max_mb", 0),
+        input_format=data.get("input_format", ""),
+        input_quality=data.get("input_quality", 0),
+        upload_cache=data.get("upload_cache", True),
+        rate_limit_rpm=data.get("rate_limit_rpm", 0),
+        max_inflight=data.get("max_inflight", 0),
+        hedge_percentile=data.get("hedge_percentile", 0),
+        failover=data.get("failover", False),
+        trace_file=data.get("trace_file", ""),
+        otlp_endpoint=data.get("otlp_endpoint", ""),
+        prometheus_file=data.get("prometheus_file", ""),
+        http2=data.get("http2", False),
+        max_connections=data.get("max_connections", 0),
+        connect_timeout=data.get("connect_timeout", 0),
+        read_timeout=data.get("read_timeout", 0),
+        write_timeout=data.get("write_timeout", 0),
+        compress_requests=data.get("compress_requests", False),
+        thumbnails=data.get("thumbnails", []),
+        placeholder=data.get("placeholder", ""),
     )
 
 
-def _run_key_command(command: str) -> str:
+def telemetry_targets(
+    file_config: FileConfig | None,
+    env: Mapping[str, str] | None = None,
+) -> dict[str, str]:
+    """Return the configured telemetry outputs, env vars overriding config.
+
+    Empty when telemetry is off, which callers check before importing
+    nanobanana.telemetry at all.
+    """
+    if env is None:
+        env = os.environ
+    targets = {}
+    for key, env_var in TELEMETRY_ENV.items():
+        value = env.get(env_var) or (getattr(file_config, key) if file_config else "")
+        if value:
+            targets[key] = value
+    return targets
+
+
+def _key_cache_path() -> Path | None:
+    """Return where key_command results are cached.
+
+    $XDG_RUNTIME_DIR/nanobanana (per-user tmpfs, cleared on logout) when
+    set, otherwise next to the config file.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "nanobanana" / KEY_CACHE_FILENAME
+    config_path = get_config_path()
+    return config_path.parent / KEY_CACHE_FILENAME if config_path else None
+
+
+def _read_key_cache(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_key_cache(path: Path, entries: dict) -> None:
+    """Replace the cache file; mkstemp creates it readable by the owner only."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _cached_key(command: str, ttl: int) -> str:
+    """Return command's cached output, or "" when absent, expired or disabled."""
+    path = _key_cache_path() if ttl > 0 else None
+    if path is None:
+        return ""
+    entry = _read_key_cache(path).get(hashlib.sha256(command.encode()).hexdigest())
+    if not isinstance(entry, dict) or entry.get("expires", 0) <= time.time():
+        return ""
+    return entry.get("key", "")
+
+
+def _cache_key(command: str, key: str, ttl: int) -> None:
+    path = _key_cache_path() if ttl > 0 else None
+    if path is None:
+        return
+    now = time.time()
+    entries = {
+        digest: entry for digest, entry in _read_key_cache(path).items()
+        if isinstance(entry, dict) and entry.get("expires", 0) > now
+    }
+    entries[hashlib.sha256(command.encode()).hexdigest()] = {"key": key, "expires": now + ttl}
+    _write_key_cache(path, entries)
+
+
+def invalidate_cached_key(api_key: str = "") -> None:
+    """Drop cached key_command results holding api_key (all when empty).
+
+    Called when a provider rejects a key, so a rotated key is fetched anew.
+    """
+    path = _key_cache_path()
+    if path is None or not path.exists():
+        return
+    entries = _read_key_cache(path)
+    kept = {
+        digest: entry for digest, entry in entries.items()
+        if api_key and isinstance(entry, dict) and entry.get("key") != api_key
+    }
+    if kept != entries:
+        _write_key_cache(path, kept)
+
+
+def is_auth_error(e: BaseException) -> bool:
+    """True if e is a provider rejecting the API key.
+
+    OpenRouter answers 401; Gemini answers 400 API_KEY_INVALID.
+    """
+    status = getattr(e, "status_code", None)
+    return status == 401 or (status == 400 and "API key not valid" in str(e))
+
+
+def _run_key_command(command: str, ttl: int = 0) -> str:
     """Run a shell command and return its stdout, stripped.
 
+    With ttl > 0 the output is cached for ttl seconds (see key_cache_ttl).
     Raises RuntimeError if the command fails.
     """
+    if not isinstance(ttl, int) or ttl < 0:
+        raise RuntimeError(f"invalid key_cache_ttl: {ttl} (seconds, 0 disables)")
+    cached = _cached_key(command, ttl)
+    if cached:
+        return cached
     try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
+        with timings.phase("key_command"):
+            result = subprocess.run(
+                command,
+                shell=True,
+                capture_output=True,
+                text=True,
+                timeout=30,
+            )
     except subprocess.TimeoutExpired as e:
         raise RuntimeError(f"key_command timed out: {command}") from e
 
@@ -99,6 +265,7 @@ def _run_key_command(command: str) -> str:
     key = result.stdout.strip()
     if not key:
         raise RuntimeError(f"key_command returned empty output: {command}")
+    _cache_key(command, key, ttl)
     return key
 
 
@@ -108,45 +275,42 @@ def resolve_config(
     size_flag: str,
     model_flag: str,
     file_config: FileConfig | None,
+    env: Mapping[str, str] | None = None,
 ) -> tuple[str, str, APIConfig]:
     """Resolve final aspect, size, and API config from flags + file config + env.
 
+    env defaults to os.environ; the daemon passes the calling client's keys.
     Returns (aspect, size, api_config).
     Raises RuntimeError on validation errors.
     """
+    if env is None:
+        env = os.environ
+
     # Defaults
-    aspect = "1:1"
-    size = "1K"
     model = ""
     use_openrouter = False
     key_command = ""
+    key_cache_ttl = 0
 
     # Apply config file values
     if file_config is not None:
-        if file_config.aspect:
-            aspect = file_config.aspect
-        if file_config.size:
-            size = file_config.size
         if file_config.model:
             model = file_config.model
         if file_config.api == "openrouter":
             use_openrouter = True
         if file_config.key_command:
             key_command = file_config.key_command
+            key_cache_ttl = file_config.key_cache_ttl
 
     # Apply CLI flags (override config)
-    if aspect_flag:
-        aspect = aspect_flag
-    if size_flag:
-        size = size_flag
     if model_flag:
         model = model_flag
         use_openrouter = True  # -model flag implies OpenRouter
 
     # Determine which API to use and validate API key
     # Priority: env var > api_key from config > key_command
-    openrouter_key = os.environ.get("OPENROUTER_API_KEY", "")
-    gemini_key = os.environ.get("GEMINI_API_KEY", "")
+    openrouter_key = env.get("OPENROUTER_API_KEY", "")
+    gemini_key = env.get("GEMINI_API_KEY", "")
     config_api_key = file_config.api_key if file_config else ""
 
     config = APIConfig()
@@ -155,7 +319,7 @@ def resolve_config(
         if not openrouter_key and config_api_key:
             openrouter_key = config_api_key
         if not openrouter_key and key_command:
-            openrouter_key = _run_key_command(key_command)
+            openrouter_key = _run_key_command(key_command, key_cache_ttl)
         if not openrouter_key:
             raise RuntimeError(
                 "OPENROUTER_API_KEY environment variable not set "
@@ -168,7 +332,7 @@ def resolve_config(
         if not gemini_key and config_api_key:
             gemini_key = config_api_key
         if not gemini_key and key_command:
-            gemini_key = _run_key_command(key_command)
+            gemini_key = _run_key_command(key_command, key_cache_ttl)
         if not gemini_key:
             raise RuntimeError(
                 "GEMINI_API_KEY environment variable not set "
@@ -177,6 +341,79 @@ def resolve_config(
         config.use_openrouter = False
         config.api_key = gemini_key
 
+    aspect, size = resolve_aspect_size(
+        aspect_flag=aspect_flag,
+        size_flag=size_flag,
+        file_config=file_config,
+    )
+
+    return aspect, size, config
+
+
+def resolve_alternate(
+    api_config: APIConfig,
+    file_config: FileConfig | None,
+    env: Mapping[str, str] | None = None,
+) -> APIConfig | None:
+    """Resolve the other backend serving the same model, for hedging/failover.
+
+    The key comes from the other provider's env var, or from api_key or
+    key_command in config only when its api names that provider (unset
+    means gemini); otherwise they hold the primary's key. A key identical
+    to the primary's is skipped, since no key is valid for both providers.
+    Returns None when there is no usable alternate, e.g. OpenRouter was
+    asked for a different model.
+    """
+    if env is None:
+        env = os.environ
+
+    if api_config.use_openrouter:
+        if api_config.model != OPENROUTER_DEFAULT_MODEL:
+            return None
+        key = env.get("GEMINI_API_KEY", "")
+        alternate = APIConfig(use_openrouter=False)
+        provider = "gemini"
+    else:
+        key = env.get("OPENROUTER_API_KEY", "")
+        alternate = APIConfig(use_openrouter=True, model=OPENROUTER_DEFAULT_MODEL)
+        provider = "openrouter"
+
+    if not key and file_config is not None and (file_config.api or "gemini") == provider:
+        key = file_config.api_key
+        if not key and file_config.key_command:
+            key = _run_key_command(file_config.key_command, file_config.key_cache_ttl)
+    if not key or key == api_config.api_key:
+        return None
+    alternate.api_key = key
+    return alternate
+
+
+def resolve_aspect_size(
+    *,
+    aspect_flag: str,
+    size_flag: str,
+    file_config: FileConfig | None,
+) -> tuple[str, str]:
+    """Resolve final aspect and size from flags + file config + defaults.
+
+    Split out of resolve_config so callers generating many images (batch)
+    can validate each job without re-resolving the API key.
+    Raises RuntimeError on validation errors.
+    """
+    aspect = "1:1"
+    size = "1K"
+
+    if file_config is not None:
+        if file_config.aspect:
+            aspect = file_config.aspect
+        if file_config.size:
+            size = file_config.size
+
+    if aspect_flag:
+        aspect = aspect_flag
+    if size_flag:
+        size = size_flag
+
     # Validate aspect ratio
     if aspect not in VALID_ASPECT_RATIOS:
         raise RuntimeError(
@@ -188,7 +425,7 @@ def resolve_config(
     if size not in VALID_SIZES:
         raise RuntimeError(f"invalid size: {size} (valid: 1K, 2K, 4K)")
 
-    return aspect, size, config
+    return aspect, size
 
 
 def write_config(data: dict) -> Path:
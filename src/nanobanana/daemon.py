@@ -0,0 +1,361 @@
+"""Opt-in warm daemon that serves generations over a Unix socket.
+
+The daemon keeps the expensive parts of a generation warm between CLI calls:
+the google-genai import, one Gemini client per API key, a pooled httpx
+client for OpenRouter, and resolved API configs (so key_command runs once).
+The CLI still parses arguments, renders templates and writes files itself;
+it only forwards config resolution and the backend call.
+
+Protocol: one JSON object per line in each direction. A successful
+generate reply is followed by exactly `length` raw image bytes.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from dataclasses import asdict
+from pathlib import Path
+
+import nanobanana
+from nanobanana.config import (
+    APIConfig,
+    get_config_path,
+    invalidate_cached_key,
+    is_auth_error,
+    load_config,
+    resolve_config,
+)
+
+# Only these environment variables influence config resolution
+_FORWARDED_ENV = ("GEMINI_API_KEY", "OPENROUTER_API_KEY")
+
+_CONNECT_TIMEOUT = 0.5
+
+
+def socket_path() -> Path:
+    """Return the daemon socket path.
+
+    $XDG_RUNTIME_DIR/nanobanana/daemon.sock when set (per-user tmpfs),
+    otherwise alongside the result cache.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "nanobanana" / "daemon.sock"
+    from nanobanana.cache import get_cache_dir
+    return get_cache_dir() / "daemon.sock"
+
+
+def _config_mtime() -> float:
+    path = get_config_path()
+    try:
+        return path.stat().st_mtime if path else 0.0
+    except OSError:
+        return 0.0
+
+
+class _WarmState:
+    """Clients and resolved configs shared by all daemon connections."""
+
+    def __init__(self) -> None:
+        # Import the backends up front; this is the cost the daemon amortizes
+        from nanobanana import gemini, openrouter
+        self._gemini = gemini
+        self._openrouter = openrouter
+        # Keeps connections to OpenRouter alive between requests
+        self._http = openrouter.create_client(load_config())
+        self._gemini_clients: dict[str, object] = {}
+        self._uploads = gemini.open_upload_cache(load_config())
+        self._resolved: dict[tuple, tuple[str, str, APIConfig]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, request: dict) -> dict:
+        env = {name: request.get("env", {}).get(name, "") for name in _FORWARDED_ENV}
+        key = (
+            request.get("aspect_flag", ""),
+            request.get("size_flag", ""),
+            request.get("model_flag", ""),
+            tuple(sorted(env.items())),
+            _config_mtime(),
+        )
+        with self._lock:
+            resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = resolve_config(
+                aspect_flag=key[0],
+                size_flag=key[1],
+                model_flag=key[2],
+                file_config=load_config(),
+                env=env,
+            )
+            with self._lock:
+                self._resolved[key] = resolved
+        aspect, size, api_config = resolved
+        return {"aspect": aspect, "size": size, "api_config": asdict(api_config)}
+
+    def _gemini_client(self, api_key: str):
+        with self._lock:
+            client = self._gemini_clients.get(api_key)
+            if client is None:
+                client = self._gemini.create_client(api_key)
+                self._gemini_clients[api_key] = client
+            return client
+
+    def forget(self, api_key: str) -> None:
+        """Drop every resolved config using a key the provider rejected."""
+        with self._lock:
+            self._resolved = {
+                key: resolved for key, resolved in self._resolved.items()
+                if resolved[2].api_key != api_key
+            }
+        invalidate_cached_key(api_key)
+
+    def generate(self, request: dict) -> tuple[bytes, str]:
+        api_config = APIConfig(**request["api_config"])
+        try:
+            return self._generate(api_config, request)
+        except RuntimeError as e:
+            if is_auth_error(e):
+                self.forget(api_config.api_key)
+            raise
+
+    def _generate(self, api_config: APIConfig, request: dict) -> tuple[bytes, str]:
+        from nanobanana.ratelimit import open_rate_limiter
+        from nanobanana.retry import RetryPolicy
+
+        retry = RetryPolicy(limiter=open_rate_limiter(load_config(), api_config))
+        if api_config.use_openrouter:
+            return self._openrouter.generate_image(
+                api_key=api_config.api_key,
+                model=api_config.model,
+                prompt=request["prompt"],
+                input_images=request["input_images"],
+                aspect_ratio=request["aspect"],
+                image_size=request["size"],
+                client=self._http,
+                retry=retry,
+            )
+        return self._gemini.generate_image(
+            api_key=api_config.api_key,
+            prompt=request["prompt"],
+            input_images=request["input_images"],
+            aspect_ratio=request["aspect"],
+            image_size=request["size"],
+            client=self._gemini_client(api_config.api_key),
+            uploads=self._uploads,
+            retry=retry,
+        )
+
+    def close(self) -> None:
+        self._http.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Serve requests on one connection until the client closes it."""
+
+    server: "_Server"
+
+    def _reply(self, message: dict) -> None:
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+                if op == "ping":
+                    self._reply({"version": nanobanana.__version__, "pid": os.getpid()})
+                elif op == "resolve":
+                    self._reply(self.server.state.resolve(request))
+                elif op == "generate":
+                    image_data, mime_type = self.server.state.generate(request)
+                    self._reply({"mime_type": mime_type, "length": len(image_data)})
+                    self.wfile.write(image_data)
+                elif op == "shutdown":
+                    self._reply({"ok": True})
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                else:
+                    self._reply({"error": f"unknown op: {op}"})
+            except RuntimeError as e:
+                self._reply({"error": str(e)})
+            except (KeyError, TypeError, ValueError) as e:
+                self._reply({"error": f"bad request: {e}"})
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path, state: _WarmState) -> None:
+        self.state = state
+        super().__init__(str(path), _Handler)
+
+
+class DaemonClient:
+    """Connection to a running daemon. Methods raise RuntimeError on failure."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self._file = sock.makefile("rwb")
+
+    def _send(self, request: dict) -> dict:
+        try:
+            self._file.write(json.dumps(request).encode() + b"\n")
+            self._file.flush()
+            line = self._file.readline()
+        except OSError as e:
+            raise RuntimeError(f"daemon connection lost: {e}") from e
+        if not line:
+            raise RuntimeError("daemon closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def ping(self) -> dict:
+        return self._send({"op": "ping"})
+
+    def resolve(
+        self,
+        *,
+        aspect_flag: str,
+        size_flag: str,
+        model_flag: str,
+    ) -> tuple[str, str, APIConfig]:
+        """Daemon-side resolve_config() using this process's API key env vars."""
+        reply = self._send({
+            "op": "resolve",
+            "aspect_flag": aspect_flag,
+            "size_flag": size_flag,
+            "model_flag": model_flag,
+            "env": {name: os.environ.get(name, "") for name in _FORWARDED_ENV},
+        })
+        return reply["aspect"], reply["size"], APIConfig(**reply["api_config"])
+
+    def generate(
+        self,
+        api_config: APIConfig,
+        *,
+        prompt: str,
+        input_images: list[str],
+        aspect: str,
+        size: str,
+    ) -> tuple[bytes, str]:
+        """Generate an image with the daemon's warm clients."""
+        reply = self._send({
+            "op": "generate",
+            "api_config": asdict(api_config),
+            "prompt": prompt,
+            # The daemon may run in a different working directory
+            "input_images": [str(Path(p).absolute()) for p in input_images],
+            "aspect": aspect,
+            "size": size,
+        })
+        length = reply["length"]
+        try:
+            image_data = self._file.read(length)
+        except OSError as e:
+            raise RuntimeError(f"daemon connection lost: {e}") from e
+        if len(image_data) != length:
+            raise RuntimeError("daemon closed the connection mid-response")
+        return image_data, reply["mime_type"]
+
+    def shutdown(self) -> None:
+        self._send({"op": "shutdown"})
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+
+def connect() -> DaemonClient | None:
+    """Connect to a running daemon of the same version. Returns None if unavailable."""
+    if not hasattr(socket, "AF_UNIX") or os.environ.get("NANOBANANA_NO_DAEMON"):
+        return None
+    path = socket_path()
+    if not path.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(_CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(path))
+        client = DaemonClient(sock)
+        info = client.ping()
+    except (OSError, RuntimeError, ValueError):
+        sock.close()
+        return None
+
+    if info.get("version") != nanobanana.__version__:
+        # Stale daemon from before an upgrade — don't mix versions
+        client.close()
+        return None
+    # Generations take far longer than the connect timeout
+    sock.settimeout(None)
+    return client
+
+
+def serve() -> None:
+    """Run the daemon in the foreground until stopped. Raises RuntimeError on failure."""
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("daemon requires Unix domain sockets (not available on this platform)")
+
+    path = socket_path()
+    existing = connect()
+    if existing is not None:
+        existing.close()
+        raise RuntimeError(f"daemon already running at {path}")
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        path.unlink(missing_ok=True)  # stale socket from a crashed daemon
+    except OSError as e:
+        raise RuntimeError(f"failed to prepare socket {path}: {e}") from e
+
+    state = _WarmState()
+    old_umask = os.umask(0o177)  # socket readable/writable by owner only
+    try:
+        server = _Server(path, state)
+    except OSError as e:
+        raise RuntimeError(f"failed to bind {path}: {e}") from e
+    finally:
+        os.umask(old_umask)
+
+    print(f"nanobanana daemon {nanobanana.__version__} listening on {path} (pid {os.getpid()})",
+          file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        state.close()
+        path.unlink(missing_ok=True)
+
+
+def run_daemon_command(action: str) -> None:
+    """Handle `nanobanana daemon [start|stop|status]`."""
+    if action in ("", "start"):
+        serve()
+        return
+
+    client = connect()
+    if action == "status":
+        if client is None:
+            print("daemon not running")
+            return
+        info = client.ping()
+        client.close()
+        print(f"daemon {info['version']} running at {socket_path()} (pid {info['pid']})")
+    elif action == "stop":
+        if client is None:
+            print("daemon not running")
+            return
+        client.shutdown()
+        client.close()
+        print("daemon stopped")
+    else:
+        raise RuntimeError(f"unknown daemon action: {action} (use start, stop or status)")
@@ -0,0 +1,197 @@
+"""Generate every slide of a markdown deck concurrently.
+
+A deck is a markdown file like examples/branded-presentation/presentation.md:
+each slide is a `nanobanana ...` command in a fenced code block, usually
+under a heading naming the slide. Commands may span lines with trailing
+backslashes. The commands become batch jobs (see nanobanana.batch), so all
+slides run at once over shared clients: an input used by every slide (a
+brand template) is prepared and uploaded once, and a slide whose input is
+another slide's output (-i template.png) starts when that output is written.
+
+Later commands writing an output already defined (a "Commands Summary"
+block repeating the slides) are skipped. Relative paths are resolved
+against the deck's directory, as for batch manifests.
+"""
+
+import re
+import shlex
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nanobanana.batch import BatchJob, jobs_from_rows, run_jobs
+from nanobanana.cli import _extract_subcommand, build_parser
+from nanobanana.config import FileConfig, load_config, resolve_config
+from nanobanana.slide_templates import get_slide_template
+from nanobanana.templates import get_command
+
+if TYPE_CHECKING:
+    from nanobanana.transcode import OutputFormat
+
+_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_HEADING = re.compile(r"^ {0,3}#{1,6}\s+(.*?)\s*#*\s*$")
+
+
+def _is_nanobanana(word: str) -> bool:
+    return word.rsplit("/", 1)[-1] == "nanobanana"
+
+
+def _command_lines(text: str) -> list[tuple[int, list[str], str]]:
+    """Return (line_number, words, heading) per nanobanana command in a code block.
+
+    Raises RuntimeError on a command with unbalanced quotes.
+    """
+    commands: list[tuple[int, list[str], str]] = []
+    heading = ""
+    fence = ""
+    pending, start = "", 0
+
+    for idx, raw in enumerate(text.splitlines(), start=1):
+        if not fence:
+            match = _FENCE.match(raw)
+            if match:
+                fence = match.group(1)
+                continue
+            match = _HEADING.match(raw)
+            if match:
+                heading = match.group(1)
+            continue
+
+        if raw.strip().startswith(fence[0] * len(fence)) and not raw.strip().strip(fence[0]):
+            if pending:
+                raise RuntimeError(f"line {start}: unterminated command")
+            fence = ""
+            continue
+
+        if not pending:
+            if not raw.strip() or raw.lstrip().startswith("#"):
+                continue
+            start = idx
+        line = raw.rstrip()
+        if line.endswith("\\"):
+            pending += line[:-1] + " "
+            continue
+        pending += line
+        try:
+            words = shlex.split(pending, comments=True)
+        except ValueError:
+            # A quoted prompt continuing on the next line
+            pending += "\n"
+            continue
+        pending = ""
+        if words and _is_nanobanana(words[0]):
+            commands.append((start, words[1:], heading))
+
+    if pending:
+        raise RuntimeError(f"line {start}: unterminated command")
+    return commands
+
+
+def _row_for(words: list[str]) -> dict:
+    """Turn a nanobanana command line into a manifest row (see MANIFEST_FIELDS)."""
+    command_name, argv = _extract_subcommand(words)
+    if command_name and get_command(command_name) is None:
+        raise RuntimeError(f"{command_name} does not generate an image")
+    try:
+        # Written-out commands often put flags after the prompt
+        args = build_parser().parse_intermixed_args(argv)
+    except SystemExit:
+        # argparse has already described the problem on stderr
+        raise RuntimeError("invalid nanobanana command") from None
+    if args.model:
+        raise RuntimeError("-model is set for the whole deck (nanobanana deck -model ...)")
+    if args.candidates != 1:
+        raise RuntimeError("-n is not supported in a deck")
+    if args.format:
+        raise RuntimeError("-format is set for the whole deck (nanobanana deck -format ...)")
+
+    prompt = args.prompt
+    row: dict = {"command": command_name}
+    if command_name == "slide" and prompt and get_slide_template(prompt[0]):
+        row["template"], prompt = prompt[0], prompt[1:]
+    row.update(
+        prompt=" ".join(prompt),
+        inputs=args.input_images,
+        aspect=args.aspect,
+        size=args.size,
+        output=args.output,
+    )
+    return row
+
+
+def load_deck(path: str, file_config: FileConfig | None = None) -> tuple[list[BatchJob], list[int]]:
+    """Parse and validate every slide of a markdown deck.
+
+    Returns (jobs, skipped_lines), where skipped_lines are commands repeating
+    an earlier command's output. Raises RuntimeError on invalid commands.
+    """
+    deck_path = Path(path)
+    try:
+        text = deck_path.read_text()
+    except OSError as e:
+        raise RuntimeError(f"failed to read deck: {e}") from e
+
+    try:
+        commands = _command_lines(text)
+    except RuntimeError as e:
+        raise RuntimeError(f"deck {e}") from e
+
+    rows: list[tuple[int, dict]] = []
+    headings: dict[int, str] = {}
+    skipped: list[int] = []
+    seen_outputs: set[str] = set()
+    for line, words, heading in commands:
+        try:
+            row = _row_for(words)
+        except RuntimeError as e:
+            raise RuntimeError(f"deck line {line}: {e}") from e
+        if row["output"]:
+            key = str(Path(row["output"]).with_suffix(""))
+            if key in seen_outputs:
+                skipped.append(line)
+                continue
+            seen_outputs.add(key)
+        rows.append((line, row))
+        headings[line] = heading
+
+    jobs = jobs_from_rows(rows, deck_path.parent, deck_path.stem, file_config, source="deck")
+    if not jobs:
+        raise RuntimeError(f"no nanobanana commands found in {path}")
+    for job in jobs:
+        job.label = headings[job.line] or job.label
+    return jobs, skipped
+
+
+def run_deck(
+    path: str,
+    *,
+    concurrency: int = 4,
+    model_flag: str = "",
+    use_cache: bool = True,
+    refresh: bool = False,
+    raw_inputs: bool = False,
+    output_format: "OutputFormat | None" = None,
+    resume: bool = False,
+) -> None:
+    """Generate every slide of a deck concurrently.
+
+    Raises RuntimeError on invalid decks or if any slide fails.
+    """
+    if concurrency < 1:
+        raise RuntimeError(f"invalid concurrency: {concurrency} (must be >= 1)")
+
+    file_config = load_config()
+    _, _, api_config = resolve_config(
+        aspect_flag="",
+        size_flag="",
+        model_flag=model_flag,
+        file_config=file_config,
+    )
+    jobs, skipped = load_deck(path, file_config)
+    if skipped:
+        lines = ", ".join(str(line) for line in skipped)
+        print(f"Skipping {len(skipped)} repeated commands (lines {lines})")
+    run_jobs(
+        jobs, path, api_config, file_config,
+        concurrency=concurrency, use_cache=use_cache, refresh=refresh, raw_inputs=raw_inputs,
+        kind="Deck", output_format=output_format, resume=resume,
+    )
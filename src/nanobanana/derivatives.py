@@ -0,0 +1,263 @@
+"""Thumbnails and placeholders for generated images.
+
+Galleries and agent UIs listing generated images shouldn't have to decode
+a 4K original to show it. With "thumbnails" in the config file (long-edge
+pixel sizes, e.g. [256, 1024]), every generated image gets WebP thumbnails
+next to it (slide.png -> slide.256.webp, slide.1024.webp), and with
+"placeholder" a BlurHash or a tiny inline WebP (LQIP) to show while those
+load. Everything is described in a sidecar, slide.png.json:
+
+    {"image": "slide.png", "mime_type": "image/png", "width": 4096,
+     "height": 2304, "bytes": 18874368, "blurhash": "LEHV6nWB2yk8...",
+     "thumbnails": [{"path": "slide.256.webp", "width": 256, ...}]}
+
+Paths in the sidecar are relative to its directory. Derivatives are made
+after the image is saved, several images at a time on a process pool for
+-n, batch and deck. Requires Pillow (the `images` extra).
+"""
+
+import base64
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from nanobanana.config import FileConfig
+from nanobanana.mime import mime_from_extension
+
+PLACEHOLDERS = ("blurhash", "lqip")
+
+THUMBNAIL_QUALITY = 80
+MAX_THUMBNAIL_SIZE = 4096
+
+# BlurHash components across and down; 4x3 suits landscape slides
+_BLURHASH_COMPONENTS = (4, 3)
+# Long edge of the image BlurHash is computed from; it only keeps a few
+# cosine components, so more pixels change nothing but the cost
+_BLURHASH_SOURCE = 32
+_LQIP_SIZE = 16
+_LQIP_QUALITY = 30
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+@dataclass
+class DerivativeOptions:
+    """What to derive from each generated image."""
+
+    sizes: list[int] = field(default_factory=list)
+    placeholder: str = ""
+
+
+def derivative_options(file_config: FileConfig | None) -> DerivativeOptions | None:
+    """Return the configured derivatives, or None if none are configured.
+
+    Returns None with a warning if Pillow is missing.
+    Raises RuntimeError on invalid thumbnails/placeholder settings.
+    """
+    if file_config is None:
+        return None
+    sizes = file_config.thumbnails
+    if not isinstance(sizes, list) or not all(
+        isinstance(n, int) and not isinstance(n, bool) and 1 <= n <= MAX_THUMBNAIL_SIZE for n in sizes
+    ):
+        raise RuntimeError(
+            f"invalid thumbnails: {sizes} (must be a list of sizes, 1-{MAX_THUMBNAIL_SIZE} px)"
+        )
+    placeholder = file_config.placeholder
+    if placeholder and placeholder not in PLACEHOLDERS:
+        raise RuntimeError(f"invalid placeholder: {placeholder} (valid: {', '.join(PLACEHOLDERS)})")
+    if not sizes and not placeholder:
+        return None
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print(
+            "Warning: thumbnails require Pillow (pip install 'nanobanana-cli[images]'); skipping",
+            file=sys.stderr,
+        )
+        return None
+    return DerivativeOptions(sorted(set(sizes), reverse=True), placeholder)
+
+
+def sidecar_path(image_path: str) -> str:
+    return image_path + ".json"
+
+
+def thumbnail_path(image_path: str, size: int) -> str:
+    return str(Path(image_path).with_suffix(f".{size}.webp"))
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(_BASE83[value // 83 ** (length - i) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = min(max(value, 0.0), 1.0)
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash(img, components: tuple[int, int] = _BLURHASH_COMPONENTS) -> str:
+    """Encode a PIL image as a BlurHash string (https://blurha.sh)."""
+    small = img.convert("RGB")
+    small.thumbnail((_BLURHASH_SOURCE, _BLURHASH_SOURCE))
+    width, height = small.size
+    linear = [_srgb_to_linear(v) for v in range(256)]
+    data = small.tobytes()
+    pixels = [(linear[data[k]], linear[data[k + 1]], linear[data[k + 2]]) for k in range(0, len(data), 3)]
+    cx, cy = components
+
+    factors: list[tuple[float, float, float]] = []
+    for j in range(cy):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(cx):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            scale = (1 if i == j == 0 else 2) / (width * height)
+            r = g = b = 0.0
+            for y in range(height):
+                row = pixels[y * width:(y + 1) * width]
+                for x, (pr, pg, pb) in enumerate(row):
+                    basis = cos_x[x] * cos_y[y]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((cx - 1) + (cy - 1) * 9, 1)
+    if ac:
+        quantized = max(0, min(82, int(math.floor(max(abs(v) for f in ac for v in f) * 166 - 0.5))))
+        max_ac = (quantized + 1) / 166
+    else:
+        quantized, max_ac = 0, 1.0
+    result += _base83(quantized, 1)
+    result += _base83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4,
+    )
+    for f in ac:
+        q = [max(0, min(18, int(math.floor(_sign_pow(v / max_ac, 0.5) * 9 + 9.5)))) for v in f]
+        result += _base83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return result
+
+
+def _lqip(img) -> str:
+    """Return a tiny WebP of img as a data URL."""
+    small = img.copy()
+    small.thumbnail((_LQIP_SIZE, _LQIP_SIZE))
+    buf = io.BytesIO()
+    small.save(buf, format="WEBP", quality=_LQIP_QUALITY)
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except OSError:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def make_derivatives(image_path: str, sizes: list[int], placeholder: str = "") -> str:
+    """Write thumbnails and the sidecar for image_path. Returns the sidecar path.
+
+    Sizes at or above the image's long edge are skipped. Runs in worker
+    processes, so it takes and returns plain values only.
+    Raises RuntimeError if the image can't be read or a file written.
+    """
+    from PIL import Image, ImageOps
+
+    sidecar: dict = {
+        "image": os.path.basename(image_path),
+        "mime_type": mime_from_extension(image_path),
+    }
+    try:
+        with Image.open(image_path) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+            sidecar.update(width=img.width, height=img.height, bytes=os.path.getsize(image_path))
+            if placeholder == "blurhash":
+                sidecar["blurhash"] = blurhash(img)
+            elif placeholder == "lqip":
+                sidecar["lqip"] = _lqip(img)
+
+            thumbnails = []
+            # Largest first, each shrunk from the previous one
+            current = img
+            for size in sizes:
+                if size >= max(img.size):
+                    continue
+                current = current.copy()
+                current.thumbnail((size, size), Image.Resampling.LANCZOS)
+                buf = io.BytesIO()
+                current.save(buf, format="WEBP", quality=THUMBNAIL_QUALITY)
+                path = thumbnail_path(image_path, size)
+                _write_atomic(path, buf.getvalue())
+                thumbnails.append({
+                    "path": os.path.basename(path),
+                    "width": current.width,
+                    "height": current.height,
+                    "bytes": len(buf.getvalue()),
+                })
+            sidecar["thumbnails"] = thumbnails[::-1]
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise RuntimeError(f"failed to make previews of {image_path}: {e}") from e
+
+    path = sidecar_path(image_path)
+    try:
+        _write_atomic(path, (json.dumps(sidecar, indent=1) + "\n").encode())
+    except OSError as e:
+        raise RuntimeError(f"failed to write {path}: {e}") from e
+    return path
+
+
+def make_all(
+    paths: list[str],
+    options: DerivativeOptions,
+    *,
+    executor: Executor | None = None,
+) -> list[str | RuntimeError]:
+    """Make derivatives of several images in parallel.
+
+    Uses executor if given, otherwise a temporary process pool (or none for
+    a single image). Returns the sidecar path or the error, per image.
+    """
+    if executor is None and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+            return make_all(paths, options, executor=pool)
+
+    results: list[str | RuntimeError] = []
+    if executor is None:
+        for path in paths:
+            try:
+                results.append(make_derivatives(path, options.sizes, options.placeholder))
+            except RuntimeError as e:
+                results.append(e)
+        return results
+    futures = [executor.submit(make_derivatives, path, options.sizes, options.placeholder) for path in paths]
+    for future in futures:
+        try:
+            results.append(future.result())
+        except RuntimeError as e:
+            results.append(e)
+    return results
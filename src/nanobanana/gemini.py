@@ -1,66 +1,471 @@
 """Gemini API image generation using google-genai SDK."""
 
-import base64
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
 
+import httpx
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 
-from nanobanana.config import GEMINI_MODEL, HTTP_TIMEOUT
+from nanobanana import timings
+from nanobanana.cache import get_cache_dir
+from nanobanana.config import GEMINI_MODEL, HTTP_TIMEOUT, FileConfig
 from nanobanana.mime import mime_from_extension
+from nanobanana.retry import (
+    APIError,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+    parse_retry_after,
+    transport_error,
+)
 
+# Inputs smaller than this are cheaper to send inline than to upload
+UPLOAD_MIN_BYTES = 64 * 1024
 
-def generate_image(
-    api_key: str,
-    prompt: str,
-    input_images: list[str],
-    aspect_ratio: str,
-    image_size: str,
-) -> tuple[bytes, str]:
-    """Generate an image using the Gemini API.
+# Stop reusing an upload this long before the Files API deletes it
+_UPLOAD_EXPIRY_MARGIN = timedelta(hours=1)
 
-    Returns (image_data, mime_type).
-    Raises RuntimeError on failure.
+# Content hashes remembered per UploadCache; a long-running service sees
+# many distinct inputs (every bytes input gets a fresh temporary path)
+_MAX_DIGESTS = 1024
+
+
+def create_client(api_key: str) -> genai.Client:
+    """Create a Gemini client. The same client serves sync and async calls.
+
+    NANOBANANA_GEMINI_BASE_URL points the client at a stand-in server.
     """
-    client = genai.Client(
+    return genai.Client(
         api_key=api_key,
-        http_options=types.HttpOptions(timeout=HTTP_TIMEOUT * 1000),
+        http_options=types.HttpOptions(
+            timeout=HTTP_TIMEOUT * 1000,
+            base_url=os.environ.get("NANOBANANA_GEMINI_BASE_URL") or None,
+        ),
     )
 
-    # Build content parts: input images first, then text prompt
-    parts: list[types.Part] = []
 
-    for img_path in input_images:
+class UploadCache:
+    """Files API URIs of uploaded inputs, keyed by API key and content hash.
+
+    Stored as one JSON file; uploads expire server-side after 48 hours, so
+    entries are only reused until shortly before their expiration time.
+    Best-effort: I/O errors mean a re-upload, never a failure.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path if path is not None else get_cache_dir() / "gemini-uploads.json"
+        self._lock = threading.Lock()
+        # (path, size, mtime) -> content hash, so a shared input is read once;
+        # least recently used first, at most _MAX_DIGESTS entries
+        self._digests: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+        # Guards the in-memory maps below; _lock serializes writes of the file
+        self._state_lock = threading.Lock()
+        # Upload key -> upload in progress, shared by concurrent requests.
+        # Tasks belong to the loop that started them, so each loop has its own
+        self._pending: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Task]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _memo(self, img_path: str, st: os.stat_result) -> tuple[str, int, int]:
+        return os.path.abspath(img_path), st.st_size, st.st_mtime_ns
+
+    def _remember(self, memo: tuple[str, int, int], digest: str) -> None:
+        with self._state_lock:
+            self._digests[memo] = digest
+            self._digests.move_to_end(memo)
+            while len(self._digests) > _MAX_DIGESTS:
+                self._digests.popitem(last=False)
+
+    def remember(self, img_path: str, data: bytes) -> None:
+        """Record the hash of an input just written from data, so it isn't read back."""
         try:
-            data = Path(img_path).read_bytes()
+            st = os.stat(img_path)
+        except OSError:
+            return
+        if st.st_size >= UPLOAD_MIN_BYTES:
+            self._remember(self._memo(img_path, st), hashlib.sha256(data).hexdigest())
+
+    def pending(self) -> dict[str, asyncio.Task]:
+        """Return the uploads in progress on the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._state_lock:
+            return self._pending.setdefault(loop, {})
+
+    def file_key(self, img_path: str, api_key: str) -> str:
+        """Return the upload key for an input, or "" if it is sent inline.
+
+        Raises RuntimeError if the file can't be read.
+        """
+        try:
+            st = os.stat(img_path)
         except OSError as e:
             raise RuntimeError(f"failed to read image {img_path}: {e}") from e
+        if st.st_size < UPLOAD_MIN_BYTES:
+            return ""
+        memo = self._memo(img_path, st)
+        with self._state_lock:
+            digest = self._digests.get(memo)
+            if digest is not None:
+                self._digests.move_to_end(memo)
+        if digest is None:
+            digest = hashlib.sha256(_read_input(img_path)).hexdigest()
+            self._remember(memo, digest)
+        # Uploads belong to the API key's project, so keys can't share them
+        account = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return f"{account}:{digest}"
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self.path.read_text())
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def _write(self, entries: dict) -> None:
+        now = datetime.now(UTC).isoformat()
+        entries = {k: v for k, v in entries.items() if v["expires"] > now}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> tuple[str, str] | None:
+        """Return (uri, mime_type) for a live upload, or None."""
+        entry = self._read().get(key)
+        if entry is None:
+            return None
+        if entry["expires"] <= (datetime.now(UTC) + _UPLOAD_EXPIRY_MARGIN).isoformat():
+            return None
+        return entry["uri"], entry["mime_type"]
+
+    def put(self, key: str, uploaded: types.File) -> None:
+        expires = uploaded.expiration_time or datetime.now(UTC) + timedelta(hours=47)
+        with self._lock:
+            entries = self._read()
+            entries[key] = {
+                "uri": uploaded.uri,
+                "mime_type": uploaded.mime_type,
+                "expires": expires.astimezone(UTC).isoformat(),
+            }
+            self._write(entries)
+
+    def forget(self, keys: list[str]) -> None:
+        with self._lock:
+            entries = self._read()
+            for key in keys:
+                entries.pop(key, None)
+            self._write(entries)
+
+
+def open_upload_cache(file_config: FileConfig | None) -> UploadCache | None:
+    """Return the upload cache unless disabled in file_config."""
+    if file_config is not None and not file_config.upload_cache:
+        return None
+    return UploadCache()
+
+
+def _read_input(img_path: str) -> bytes:
+    try:
+        return Path(img_path).read_bytes()
+    except OSError as e:
+        raise RuntimeError(f"failed to read image {img_path}: {e}") from e
+
+
+def _upload_config(img_path: str) -> types.UploadFileConfig:
+    return types.UploadFileConfig(mime_type=mime_from_extension(img_path))
+
+
+def _input_part(
+    img_path: str,
+    uploads: UploadCache | None,
+    api_key: str,
+    used: list[str],
+) -> tuple[types.Part | None, str]:
+    """Return (part, upload_key) for one input; part is None if it needs uploading.
+
+    Inline bytes without an upload cache or below UPLOAD_MIN_BYTES, else a
+    Files API reference. Reused upload keys are appended to used.
+    """
+    with timings.phase("prepare"):
         mime_type = mime_from_extension(img_path)
-        parts.append(types.Part.from_bytes(data=data, mime_type=mime_type))
+        key = uploads.file_key(img_path, api_key) if uploads is not None else ""
+        if not key:
+            # Sent base64-encoded inside the JSON request
+            data = _read_input(img_path)
+            timings.count("request_bytes", 4 * ((len(data) + 2) // 3))
+            return types.Part.from_bytes(data=data, mime_type=mime_type), ""
+        cached = uploads.get(key)
+    if cached is None:
+        return None, key
+    used.append(key)
+    uri, mime_type = cached
+    return types.Part.from_uri(file_uri=uri, mime_type=mime_type), key
+
+
+def _uploaded_part(uploads: UploadCache, key: str, uploaded: types.File) -> types.Part:
+    timings.count("upload_bytes", uploaded.size_bytes or 0)
+    uploads.put(key, uploaded)
+    return types.Part.from_uri(file_uri=uploaded.uri, mime_type=uploaded.mime_type)
+
+
+def _build_parts(
+    prompt: str,
+    input_images: list[str],
+    client: genai.Client | None = None,
+    uploads: UploadCache | None = None,
+    api_key: str = "",
+    used: list[str] | None = None,
+) -> list[types.Part]:
+    """Build content parts: input images first, then text prompt."""
+    parts: list[types.Part] = []
+    used = used if used is not None else []
+
+    for img_path in input_images:
+        part, key = _input_part(img_path, uploads, api_key, used)
+        if part is None:
+            try:
+                with timings.phase("upload"):
+                    uploaded = client.files.upload(file=img_path, config=_upload_config(img_path))
+            except Exception as e:
+                raise _request_error(e, "upload") from e
+            part = _uploaded_part(uploads, key, uploaded)
+        parts.append(part)
 
     parts.append(types.Part.from_text(text=prompt))
+    return parts
 
-    try:
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=parts,
-            config=types.GenerateContentConfig(
-                response_modalities=["IMAGE", "TEXT"],
-                image_generation_config=types.ImageGenerationConfig(
-                    aspect_ratio=aspect_ratio,
-                    image_size=image_size,
-                ),
-            ),
+
+async def _abuild_parts(
+    prompt: str,
+    input_images: list[str],
+    client: genai.Client,
+    uploads: UploadCache | None,
+    api_key: str,
+    used: list[str],
+) -> list[types.Part]:
+    """Async variant of _build_parts; uploads go through client.aio."""
+    parts: list[types.Part] = []
+
+    for img_path in input_images:
+        # Hashing and the upload cache file are disk I/O; keep them off the loop
+        part, key = await asyncio.to_thread(_input_part, img_path, uploads, api_key, used)
+        if part is None:
+            # Concurrent requests sharing an input wait for one upload
+            in_progress = uploads.pending()
+            pending = in_progress.get(key)
+            owner = pending is None
+            if owner:
+                pending = asyncio.ensure_future(
+                    client.aio.files.upload(file=img_path, config=_upload_config(img_path))
+                )
+                in_progress[key] = pending
+                pending.add_done_callback(lambda _, key=key: in_progress.pop(key, None))
+            try:
+                with timings.phase("upload"):
+                    uploaded = await asyncio.shield(pending)
+            except Exception as e:
+                raise _request_error(e, "upload") from e
+            if owner:
+                part = await asyncio.to_thread(_uploaded_part, uploads, key, uploaded)
+            else:
+                part = types.Part.from_uri(file_uri=uploaded.uri, mime_type=uploaded.mime_type)
+        parts.append(part)
+
+    parts.append(types.Part.from_text(text=prompt))
+    return parts
+
+
+def _is_stale_upload(e: Exception, used: list[str]) -> bool:
+    """True if a request failed because a reused upload is gone.
+
+    The API answers a deleted or expired file with 403 PERMISSION_DENIED
+    ("You do not have permission to access the File ... or it may not
+    exist") or 404 NOT_FOUND naming the file; other client errors are the
+    request's own fault and re-uploading wouldn't fix them.
+    """
+    if not used or not isinstance(e, errors.ClientError):
+        return False
+    if (e.code, e.status) not in ((403, "PERMISSION_DENIED"), (404, "NOT_FOUND")):
+        return False
+    return "file" in (e.message or "").lower()
+
+
+def _request_error(e: Exception, what: str = "request") -> RuntimeError:
+    """Map an SDK or transport exception to APIError where it can be classified."""
+    if isinstance(e, errors.APIError):
+        headers = getattr(e.response, "headers", None) or {}
+        return APIError(
+            f"{what} failed: {e}",
+            status_code=e.code,
+            retry_after=parse_retry_after(headers.get("retry-after")),
         )
-    except Exception as e:
-        raise RuntimeError(f"request failed: {e}") from e
+    if isinstance(e, httpx.HTTPError):
+        error = transport_error(e)
+        return APIError(f"{what} failed: {e}", retryable=error.retryable)
+    return RuntimeError(f"{what} failed: {e}")
+
+
+def _build_config(aspect_ratio: str, image_size: str) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        response_modalities=["IMAGE", "TEXT"],
+        image_config=types.ImageConfig(
+            aspect_ratio=aspect_ratio,
+            image_size=image_size,
+        ),
+    )
 
-    # Extract image from response
+
+def _extract_image(response: types.GenerateContentResponse) -> tuple[bytes, str]:
+    """Extract the first inline image from a response."""
     if not response.candidates:
         raise RuntimeError("no candidates in response")
 
     for part in response.candidates[0].content.parts:
         if part.inline_data and part.inline_data.data:
+            timings.count("image_bytes", len(part.inline_data.data))
             return part.inline_data.data, part.inline_data.mime_type
 
     raise RuntimeError("no image data in response")
+
+
+def generate_image(
+    api_key: str,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    client: genai.Client | None = None,
+    uploads: UploadCache | None = None,
+    retry: RetryPolicy | None = None,
+) -> tuple[bytes, str]:
+    """Generate an image using the Gemini API.
+
+    Pass a client to reuse its connection pool across calls, and uploads to
+    send large inputs as Files API references uploaded once. Rate limits and
+    transient failures are retried per retry (default: DEFAULT_RETRY).
+    Returns (image_data, mime_type).
+    Raises RuntimeError on failure.
+    """
+    if client is None:
+        with timings.phase("client"):
+            client = create_client(api_key)
+
+    def attempt() -> types.GenerateContentResponse:
+        used: list[str] = []
+        parts = _build_parts(prompt, input_images, client, uploads, api_key, used)
+        try:
+            # The SDK does connect, send, generation and decode in one call
+            with timings.phase("request"):
+                return client.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=parts,
+                    config=_build_config(aspect_ratio, image_size),
+                )
+        except Exception as e:
+            if _is_stale_upload(e, used):
+                # A reused upload is gone (deleted or expired early); upload afresh
+                uploads.forget(used)
+                raise APIError(f"request failed: {e}", retryable=True, retry_after=0) from e
+            raise _request_error(e) from e
+
+    return _extract_image(call_with_retry(attempt, retry))
+
+
+async def agenerate_image(
+    client: genai.Client,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    uploads: UploadCache | None = None,
+    api_key: str = "",
+    retry: RetryPolicy | None = None,
+) -> tuple[bytes, str]:
+    """Async variant of generate_image using a shared client.
+
+    api_key scopes upload cache entries and is only needed with uploads.
+    Returns (image_data, mime_type).
+    Raises RuntimeError on failure.
+    """
+    async def attempt() -> types.GenerateContentResponse:
+        used: list[str] = []
+        parts = await _abuild_parts(prompt, input_images, client, uploads, api_key, used)
+        try:
+            with timings.phase("request"):
+                return await client.aio.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=parts,
+                    config=_build_config(aspect_ratio, image_size),
+                )
+        except Exception as e:
+            if _is_stale_upload(e, used):
+                await asyncio.to_thread(uploads.forget, used)
+                raise APIError(f"request failed: {e}", retryable=True, retry_after=0) from e
+            raise _request_error(e) from e
+
+    return _extract_image(await acall_with_retry(attempt, retry))
+
+
+async def agenerate_candidates(
+    client: genai.Client,
+    n: int,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    uploads: UploadCache | None = None,
+    api_key: str = "",
+    retry: RetryPolicy | None = None,
+) -> list[tuple[bytes, str] | BaseException]:
+    """Generate n images for the same request concurrently.
+
+    Inputs are read, encoded and uploaded once, and the parts shared by all
+    n requests; they are rebuilt only when a reused upload turns out stale.
+    Returns (image_data, mime_type) or the exception, per candidate.
+    """
+    shared: list[tuple[list[types.Part], list[str]]] = []
+    lock = asyncio.Lock()
+
+    async def shared_parts() -> tuple[list[types.Part], list[str]]:
+        async with lock:
+            if not shared:
+                used: list[str] = []
+                parts = await _abuild_parts(prompt, input_images, client, uploads, api_key, used)
+                shared.append((parts, used))
+            return shared[0]
+
+    async def candidate() -> tuple[bytes, str]:
+        async def attempt() -> types.GenerateContentResponse:
+            parts, used = await shared_parts()
+            try:
+                with timings.phase("request"):
+                    return await client.aio.models.generate_content(
+                        model=GEMINI_MODEL,
+                        contents=parts,
+                        config=_build_config(aspect_ratio, image_size),
+                    )
+            except Exception as e:
+                if _is_stale_upload(e, used):
+                    async with lock:
+                        # The first candidate to notice rebuilds for everyone
+                        if shared and shared[0][0] is parts:
+                            await asyncio.to_thread(uploads.forget, used)
+                            shared.clear()
+                    raise APIError(f"request failed: {e}", retryable=True, retry_after=0) from e
+                raise _request_error(e) from e
+
+        return _extract_image(await acall_with_retry(attempt, retry))
+
+    return await asyncio.gather(*(candidate() for _ in range(n)), return_exceptions=True)
@@ -0,0 +1,244 @@
+"""Hedged requests and failover between the Gemini and OpenRouter backends.
+
+Both backends serve the same model, so a slow or failing provider doesn't
+have to mean a long wait. With hedge_percentile set, a request the primary
+backend hasn't answered within that percentile of its recent latencies is
+also sent to the other backend; whichever answers first wins and the other
+request is cancelled. With failover set, a request that still fails with a
+retryable error after retries is sent to the other backend instead.
+
+Latencies of successful requests are kept per backend in the cache
+directory. Until enough have been seen, DEFAULT_HEDGE_DELAY is used.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nanobanana.cache import get_cache_dir
+from nanobanana.config import APIConfig, FileConfig
+
+if TYPE_CHECKING:
+    from nanobanana.retry import RetryPolicy
+
+LATENCY_FILENAME = "latency.json"
+
+# Deadline before the primary's latency history is long enough to trust
+DEFAULT_HEDGE_DELAY = 60.0
+
+_HISTORY_SIZE = 50
+_MIN_SAMPLES = 5
+
+
+def backend_name(api_config: APIConfig) -> str:
+    return "OpenRouter" if api_config.use_openrouter else "Gemini"
+
+
+def hedge_options(file_config: FileConfig | None) -> tuple[int, bool]:
+    """Return (hedge_percentile, failover) from the config file.
+
+    Raises RuntimeError on an invalid hedge_percentile.
+    """
+    if file_config is None:
+        return 0, False
+    percentile = file_config.hedge_percentile
+    if not isinstance(percentile, int) or not 0 <= percentile <= 99:
+        raise RuntimeError(f"invalid hedge_percentile: {percentile} (valid: 1-99, 0 disables)")
+    return percentile, bool(file_config.failover)
+
+
+class LatencyHistory:
+    """Recent successful request latencies per backend, kept on disk."""
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path if path is not None else get_cache_dir() / LATENCY_FILENAME
+
+    def _load(self) -> dict[str, list[float]]:
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def record(self, backend: str, seconds: float) -> None:
+        """Add a latency sample. Best effort: concurrent writers may drop one."""
+        data = self._load()
+        data[backend] = (data.get(backend, []) + [round(seconds, 3)])[-_HISTORY_SIZE:]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def percentile(self, backend: str, pct: int) -> float | None:
+        """Return the pct-th percentile latency, or None with too few samples."""
+        samples = sorted(self._load().get(backend, []))
+        if len(samples) < _MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, len(samples) * pct // 100)]
+
+    def deadline(self, backend: str, pct: int) -> float:
+        """Seconds to wait on backend before hedging."""
+        value = self.percentile(backend, pct)
+        return DEFAULT_HEDGE_DELAY if value is None else value
+
+
+class _Clients:
+    """Backend clients opened on first use and closed together."""
+
+    def __init__(self, file_config: FileConfig | None = None) -> None:
+        self._file_config = file_config
+        self._http = None
+        self._gemini = None
+
+    def http(self):
+        if self._http is None:
+            from nanobanana.openrouter import create_async_client
+            self._http = create_async_client(self._file_config)
+        return self._http
+
+    def gemini(self, api_key: str):
+        if self._gemini is None:
+            from nanobanana.gemini import create_client
+            self._gemini = create_client(api_key)
+        return self._gemini
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+        if self._gemini is not None:
+            await self._gemini.aio.aclose()
+
+
+async def agenerate_hedged(
+    primary: APIConfig,
+    secondary: APIConfig,
+    *,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    output_for_mime: Callable[[str], str],
+    hedge_percentile: int = 0,
+    failover: bool = False,
+    retry_for: Callable[[APIConfig], "RetryPolicy | None"] = lambda api_config: None,
+    uploads=None,
+    history: LatencyHistory | None = None,
+    on_switch: Callable[[str], None] | None = None,
+    file_config: FileConfig | None = None,
+) -> tuple[str, str, APIConfig]:
+    """Generate on primary, hedging or failing over to secondary.
+
+    on_switch(message) is called when the secondary is brought in.
+    Returns (output_path, mime_type, api_config that served the image).
+    Raises the primary's error when both backends fail.
+    """
+    from nanobanana.cli import write_output
+    from nanobanana.retry import APIError
+
+    history = history if history is not None else LatencyHistory()
+    clients = _Clients(file_config)
+
+    async def generate(api_config: APIConfig) -> tuple[str, str, bytes | None]:
+        start = time.monotonic()
+        if api_config.use_openrouter:
+            from nanobanana.openrouter import agenerate_image_to_file
+            path, mime_type = await agenerate_image_to_file(
+                clients.http(),
+                api_key=api_config.api_key,
+                model=api_config.model,
+                prompt=prompt,
+                input_images=input_images,
+                aspect_ratio=aspect_ratio,
+                image_size=image_size,
+                output_for_mime=output_for_mime,
+                retry=retry_for(api_config),
+            )
+            data = None
+        else:
+            from nanobanana.gemini import agenerate_image
+            data, mime_type = await agenerate_image(
+                clients.gemini(api_config.api_key),
+                prompt=prompt,
+                input_images=input_images,
+                aspect_ratio=aspect_ratio,
+                image_size=image_size,
+                uploads=uploads,
+                api_key=api_config.api_key,
+                retry=retry_for(api_config),
+            )
+            # Written only once chosen, so a cancelled loser leaves no file
+            path = output_for_mime(mime_type)
+        await asyncio.to_thread(history.record, backend_name(api_config), time.monotonic() - start)
+        return path, mime_type, data
+
+    def switch(message: str) -> None:
+        if on_switch is not None:
+            on_switch(message)
+        tasks[asyncio.ensure_future(generate(secondary))] = secondary
+
+    tasks = {asyncio.ensure_future(generate(primary)): primary}
+    deadline = history.deadline(backend_name(primary), hedge_percentile) if hedge_percentile else None
+    started = time.monotonic()
+    switched = False
+    # By backend, so the primary's error is raised whichever failed first
+    errors: dict[str, BaseException] = {}
+    try:
+        while tasks:
+            timeout = None
+            if deadline is not None and not switched:
+                timeout = max(0.0, deadline - (time.monotonic() - started))
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                switched = True
+                switch(
+                    f"no answer from {backend_name(primary)} after {deadline:.1f}s, "
+                    f"also trying {backend_name(secondary)}"
+                )
+                continue
+
+            # Prefer a result already streamed to disk if both finished at once
+            winners = []
+            for task in done:
+                api_config = tasks.pop(task)
+                error = task.exception()
+                if error is None:
+                    winners.append((task.result()[2] is not None, task.result(), api_config))
+                    continue
+                errors[backend_name(api_config)] = error
+                if (not switched and failover and isinstance(error, APIError)
+                        and error.retryable):
+                    switched = True
+                    switch(f"{backend_name(primary)} failed ({error}), trying {backend_name(secondary)}")
+            if winners:
+                _, (path, mime_type, data), api_config = min(winners, key=lambda w: w[0])
+                # Stop the loser before writing, as it may be streaming to the same path
+                await _cancel(tasks)
+                if data is not None:
+                    await asyncio.to_thread(write_output, path, data)
+                return path, mime_type, api_config
+        raise errors[backend_name(primary)]
+    finally:
+        await _cancel(tasks)
+        await clients.aclose()
+
+
+async def _cancel(tasks: dict[asyncio.Future, APIConfig]) -> None:
+    """Cancel the requests still running and wait until they have stopped."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    tasks.clear()
+
+
+def generate_hedged(primary: APIConfig, secondary: APIConfig, **kwargs) -> tuple[str, str, APIConfig]:
+    """Blocking wrapper around agenerate_hedged for the CLI."""
+    return asyncio.run(agenerate_hedged(primary, secondary, **kwargs))
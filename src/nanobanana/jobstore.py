@@ -0,0 +1,196 @@
+"""Persistent job state for resumable batch and deck runs.
+
+Every batch or deck run records its jobs in .nanobanana-jobs.sqlite next to
+the manifest or deck: one row per output with its state (pending,
+in_flight, done, failed), how many times it was attempted, the path it was
+written to and the last error. Each change is committed as it happens, so
+the table survives a crash, an OOM kill or a laptop going to sleep.
+
+A fresh run resets the rows of its manifest; -resume keeps them and skips
+every job recorded as done whose output still exists and whose definition
+(prompt, template, inputs with their size and mtime, aspect, size,
+backend, model, -format and -quality) is unchanged. Jobs left in flight by a dead run are simply run
+again.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nanobanana.config import GEMINI_MODEL, APIConfig
+
+if TYPE_CHECKING:
+    from nanobanana.batch import BatchJob
+    from nanobanana.transcode import OutputFormat
+
+JOBS_FILENAME = ".nanobanana-jobs.sqlite"
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    source TEXT NOT NULL,
+    output TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    spec TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output_path TEXT NOT NULL DEFAULT '',
+    error TEXT NOT NULL DEFAULT '',
+    updated REAL NOT NULL,
+    PRIMARY KEY (source, output)
+)
+"""
+
+
+def _stamp(path: str) -> list:
+    """Return [path, size, mtime_ns]; size and mtime are None if it's missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [path, None, None]
+    return [path, st.st_size, st.st_mtime_ns]
+
+
+class JobStore:
+    """Job rows of one manifest or deck (source) in its directory's table."""
+
+    def __init__(
+        self, source: str, api_config: APIConfig, output_format: "OutputFormat | None" = None,
+    ) -> None:
+        """Open or create the table. Raises RuntimeError if it can't be opened."""
+        source_path = Path(source)
+        self.root = source_path.parent
+        self.path = self.root / JOBS_FILENAME
+        self.source = source_path.name
+        if api_config.use_openrouter:
+            self._backend = ["openrouter", api_config.model]
+        else:
+            self._backend = ["gemini", GEMINI_MODEL]
+        self._format = [output_format.format, output_format.quality] if output_format else None
+        try:
+            # Writes come from the event loop thread only; each is one short
+            # transaction, cheap enough not to need a worker thread
+            self._db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(_SCHEMA)
+        except sqlite3.Error as e:
+            raise RuntimeError(f"failed to open job store {self.path}: {e}") from e
+
+    def _key(self, job: "BatchJob") -> str:
+        return os.path.relpath(Path(job.output).with_suffix(""), self.root)
+
+    def _spec(self, job: "BatchJob") -> str:
+        # Inputs by size and mtime too, so an edited input runs the job again
+        inputs = [_stamp(path) for path in job.sources or job.inputs]
+        spec = [job.prompt, job.template, inputs, job.aspect, job.size, self._backend]
+        if self._format:
+            spec.append(self._format)
+        return hashlib.sha256(json.dumps(spec).encode()).hexdigest()
+
+    def _set(self, job: "BatchJob", **fields) -> None:
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        try:
+            self._db.execute(
+                f"UPDATE jobs SET {columns}, updated = ? WHERE source = ? AND output = ?",
+                (*fields.values(), time.time(), self.source, self._key(job)),
+            )
+        except sqlite3.Error:
+            pass  # losing one state change only costs a regeneration on -resume
+
+    def start(self, jobs: list["BatchJob"], resume: bool = False) -> dict[int, str]:
+        """Record a run of jobs; everything starts pending.
+
+        With resume, jobs recorded as done (unchanged, output still on disk)
+        stay done, and unchanged jobs keep their attempt counts. Returns
+        {job index: output_path} of the jobs already done.
+        Raises RuntimeError if the table can't be written.
+        """
+        finished: dict[int, str] = {}
+        now = time.time()
+        try:
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                rows = {}
+                if resume:
+                    rows = {
+                        output: (spec, state, path, attempts)
+                        for output, spec, state, path, attempts in self._db.execute(
+                            "SELECT output, spec, state, output_path, attempts FROM jobs WHERE source = ?",
+                            (self.source,),
+                        )
+                    }
+                self._db.execute("DELETE FROM jobs WHERE source = ?", (self.source,))
+                for i, job in enumerate(jobs):
+                    key, spec = self._key(job), self._spec(job)
+                    state, path, attempts = PENDING, "", 0
+                    previous = rows.get(key)
+                    if previous and previous[0] == spec:
+                        attempts = previous[3]
+                        stored = self.root / previous[2]
+                        if previous[1] == DONE and stored.is_file():
+                            state, path = DONE, previous[2]
+                            finished[i] = str(stored)
+                    self._db.execute(
+                        "INSERT INTO jobs (source, output, line, spec, state, attempts, output_path, updated)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (self.source, key, job.line, spec, state, attempts, path, now),
+                    )
+        except sqlite3.Error as e:
+            raise RuntimeError(f"failed to write job store {self.path}: {e}") from e
+        return finished
+
+    def begin(self, job: "BatchJob") -> None:
+        """Mark a job in flight, counting the attempt."""
+        try:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, updated = ?"
+                " WHERE source = ? AND output = ?",
+                (IN_FLIGHT, time.time(), self.source, self._key(job)),
+            )
+        except sqlite3.Error:
+            pass
+
+    def finish(self, job: "BatchJob", output_path: str) -> None:
+        # Re-stamped: an input made by an earlier job may not have existed at start()
+        self._set(
+            job,
+            state=DONE,
+            output_path=os.path.relpath(output_path, self.root),
+            error="",
+            spec=self._spec(job),
+        )
+
+    def fail(self, job: "BatchJob", error: str) -> None:
+        self._set(job, state=FAILED, error=error)
+
+    def release(self, job: "BatchJob") -> None:
+        """Put an interrupted job back to pending."""
+        self._set(job, state=PENDING)
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of jobs per state."""
+        return dict(self._db.execute(
+            "SELECT state, COUNT(*) FROM jobs WHERE source = ? GROUP BY state", (self.source,),
+        ).fetchall())
+
+    def rows(self) -> list[dict]:
+        """Return every job row of the source, in manifest order."""
+        cursor = self._db.execute(
+            "SELECT line, output, state, attempts, output_path, error FROM jobs"
+            " WHERE source = ? ORDER BY line",
+            (self.source,),
+        )
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def close(self) -> None:
+        self._db.close()
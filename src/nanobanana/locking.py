@@ -0,0 +1,62 @@
+"""Exclusive advisory locks on small state files shared between processes."""
+
+import os
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import BinaryIO
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock(f: BinaryIO) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(f: BinaryIO) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def pid_alive(pid: int) -> bool:
+        return True  # signal 0 isn't available; callers expire entries by age
+else:
+    import fcntl
+
+    def _lock(f: BinaryIO) -> None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+    def _unlock(f: BinaryIO) -> None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+
+@contextmanager
+def locked_file(path: str | os.PathLike) -> Iterator[BinaryIO]:
+    """Open path (created if missing) and hold an exclusive lock on it.
+
+    The file is positioned at the start; use rewrite() to replace its
+    contents. Raises OSError if the file can't be opened.
+    """
+    with open(path, "a+b") as f:
+        _lock(f)
+        try:
+            f.seek(0)
+            yield f
+        finally:
+            _unlock(f)
+
+
+def rewrite(f: BinaryIO, data: bytes) -> None:
+    """Replace the contents of a file opened by locked_file()."""
+    f.seek(0)
+    f.truncate()
+    f.write(data)
+    f.flush()
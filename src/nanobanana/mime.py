@@ -9,6 +9,7 @@ def extension_from_mime(mime_type: str) -> str:
         "image/png": ".png",
         "image/jpeg": ".jpg",
         "image/webp": ".webp",
+        "image/avif": ".avif",
     }
     return mapping.get(mime_type, ".png")
 
@@ -21,6 +22,20 @@ def mime_from_extension(path: str) -> str:
         ".jpg": "image/jpeg",
         ".jpeg": "image/jpeg",
         ".webp": "image/webp",
+        ".avif": "image/avif",
         ".gif": "image/gif",
     }
     return mapping.get(ext, "image/png")
+
+
+def mime_from_bytes(data: bytes) -> str:
+    """Return MIME type for image bytes from their signature (default PNG)."""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    return "image/png"
@@ -1,86 +1,365 @@
 """OpenRouter API image generation using httpx."""
 
+import asyncio
 import base64
+import binascii
+import importlib.util
+import json
+import mmap
+import os
+import re
+import sys
+import tempfile
+import uuid
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
+from pathlib import Path
 
 import httpx
 
-from nanobanana.config import HTTP_TIMEOUT
+from nanobanana import timings
+from nanobanana.config import HTTP_TIMEOUT, FileConfig
 from nanobanana.mime import mime_from_extension
+from nanobanana.retry import (
+    APIError,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+    parse_retry_after,
+    transport_error,
+)
 
 OPENROUTER_ENDPOINT = "https://openrouter.ai/api/v1/chat/completions"
 
+# JSON path of the generated image's data URL in a chat-completions response
+_IMAGE_URL_PATH = ("choices", 0, "message", "images", 0, "image_url", "url")
 
-def _load_image_as_data_url(path: str) -> str:
-    """Load an image file and return a data URL."""
-    try:
-        with open(path, "rb") as f:
-            data = f.read()
-    except OSError as e:
-        raise RuntimeError(f"failed to read image {path}: {e}") from e
+# Leading response bytes kept for error reporting when no image is found
+_HEAD_LIMIT = 64 * 1024
 
-    mime_type = mime_from_extension(path)
-    b64 = base64.b64encode(data).decode("ascii")
-    return f"data:{mime_type};base64,{b64}"
 
+# Raw bytes encoded per body chunk; a multiple of 3 so the base64 pieces
+# concatenate without padding in between
+_ENCODE_CHUNK = 3 * 256 * 1024
 
-def generate_image(
-    api_key: str,
-    model: str,
-    prompt: str,
-    input_images: list[str],
-    aspect_ratio: str,
-    image_size: str,
-) -> tuple[bytes, str]:
-    """Generate an image using the OpenRouter API.
 
-    Returns (image_data, mime_type).
-    Raises RuntimeError on failure.
+# Failing to connect shows quickly; generating a 4K image takes minutes
+CONNECT_TIMEOUT = 10.0
+WRITE_TIMEOUT = 60.0
+READ_TIMEOUT = float(HTTP_TIMEOUT)
+
+DEFAULT_MAX_CONNECTIONS = 10
+# Idle connections are kept this long for the next request
+KEEPALIVE_EXPIRY = 60.0
+
+
+def _accept_encoding() -> str:
+    """Response encodings httpx can decode with the packages installed."""
+    encodings = ["gzip", "deflate"]
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        encodings.insert(0, "br")
+    if importlib.util.find_spec("zstandard"):
+        encodings.insert(0, "zstd")
+    return ", ".join(encodings)
+
+
+# A response is mostly base64 image data, which gzip shrinks by about a
+# quarter; httpx decodes it as it streams in
+ACCEPT_ENCODING = _accept_encoding()
+
+# Request bodies are compressed at the fastest level: base64 gains nearly
+# all it can from Huffman coding alone, and higher levels cost several
+# times the CPU for a percent or two
+_GZIP_LEVEL = 1
+
+
+class _WireStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """A request body as sent, optionally gzip-compressed.
+
+    Counts the bytes actually sent as request_wire_bytes, next to the
+    request_bytes payload size counted by the callers.
     """
-    # Build content parts
-    content_parts: list[dict] = []
-
-    for img_path in input_images:
-        data_url = _load_image_as_data_url(img_path)
-        content_parts.append({
-            "type": "image_url",
-            "image_url": {"url": data_url},
-        })
-
-    content_parts.append({"type": "text", "text": prompt})
-
-    # Build request payload
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": content_parts}],
-        "modalities": ["image", "text"],
-        "image_config": {
-            "aspectRatio": aspect_ratio,
-            "imageSize": image_size,
-        },
+
+    def __init__(self, stream: Iterable[bytes] | AsyncIterable[bytes], compress: bool) -> None:
+        self._stream = stream
+        self._compress = compress
+
+    def _encoder(self):
+        return zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31) if self._compress else None
+
+    @staticmethod
+    def _sent(data: bytes) -> bytes:
+        timings.count("request_wire_bytes", len(data))
+        return data
+
+    def __iter__(self) -> Iterator[bytes]:
+        encoder = self._encoder()
+        for chunk in self._stream:
+            data = encoder.compress(chunk) if encoder else chunk
+            if data:
+                yield self._sent(data)
+        if encoder:
+            yield self._sent(encoder.flush())
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        encoder = self._encoder()
+        async for chunk in self._stream:
+            data = encoder.compress(chunk) if encoder else chunk
+            if data:
+                yield self._sent(data)
+        if encoder:
+            yield self._sent(encoder.flush())
+
+
+def _wire_request(request: httpx.Request, compress: bool) -> None:
+    """Wrap a request body in a _WireStream, switching to gzip if compress."""
+    if request.method != "POST" or isinstance(request.stream, _WireStream):
+        return
+    compress = compress and "Content-Encoding" not in request.headers
+    if compress:
+        # The compressed length isn't known until the body has been sent
+        del request.headers["Content-Length"]
+        request.headers["Content-Encoding"] = "gzip"
+        request.headers["Transfer-Encoding"] = "chunked"
+    request.stream = _WireStream(request.stream, compress)
+
+
+class _Transport(httpx.HTTPTransport):
+    def __init__(self, *, compress_requests: bool = False, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._compress = compress_requests
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _wire_request(request, self._compress)
+        return super().handle_request(request)
+
+
+class _AsyncTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, *, compress_requests: bool = False, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._compress = compress_requests
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _wire_request(request, self._compress)
+        return await super().handle_async_request(request)
+
+
+def client_options(file_config: FileConfig | None = None, max_connections: int = 0) -> dict:
+    """Return httpx client arguments: timeouts, pool limits and HTTP/2.
+
+    max_connections is the caller's expected concurrency; the config file's
+    max_connections takes precedence. Waiting for a pooled connection never
+    times out, as callers bound their own concurrency.
+    Raises RuntimeError on invalid settings.
+    """
+    def setting(name: str, default: float) -> float:
+        value = getattr(file_config, name, 0) if file_config else 0
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise RuntimeError(f"invalid {name}: {value} (must be a positive number)")
+        return value or default
+
+    connections = int(setting("max_connections", max_connections or DEFAULT_MAX_CONNECTIONS))
+    http2 = bool(file_config and file_config.http2)
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print(
+                "Warning: http2 requires the h2 package "
+                "(pip install 'nanobanana-cli[http2]'); using HTTP/1.1",
+                file=sys.stderr,
+            )
+            http2 = False
+    return {
+        "timeout": httpx.Timeout(
+            connect=setting("connect_timeout", CONNECT_TIMEOUT),
+            read=setting("read_timeout", READ_TIMEOUT),
+            write=setting("write_timeout", WRITE_TIMEOUT),
+            pool=None,
+        ),
+        "limits": httpx.Limits(
+            max_connections=connections,
+            max_keepalive_connections=connections,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "http2": http2,
     }
 
-    try:
-        resp = httpx.post(
-            OPENROUTER_ENDPOINT,
-            json=payload,
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}",
+
+def create_client(file_config: FileConfig | None = None, max_connections: int = 0) -> httpx.Client:
+    """Create a pooled client for OpenRouter requests; see client_options.
+
+    With compress_requests set in the config file, request bodies are sent
+    gzip-compressed.
+    """
+    options = client_options(file_config, max_connections)
+    transport = _Transport(
+        compress_requests=bool(file_config and file_config.compress_requests),
+        limits=options["limits"],
+        http2=options["http2"],
+    )
+    return httpx.Client(transport=transport, **options)
+
+
+def create_async_client(file_config: FileConfig | None = None, max_connections: int = 0) -> httpx.AsyncClient:
+    """Async variant of create_client, for sharing across concurrent requests."""
+    options = client_options(file_config, max_connections)
+    transport = _AsyncTransport(
+        compress_requests=bool(file_config and file_config.compress_requests),
+        limits=options["limits"],
+        http2=options["http2"],
+    )
+    return httpx.AsyncClient(transport=transport, **options)
+
+
+def _endpoint() -> str:
+    # NANOBANANA_OPENROUTER_URL points requests at a stand-in server
+    return os.environ.get("NANOBANANA_OPENROUTER_URL") or OPENROUTER_ENDPOINT
+
+
+def _b64_length(size: int) -> int:
+    return 4 * ((size + 2) // 3)
+
+
+class _RequestBody:
+    """Chat-completions JSON body that streams input images from disk.
+
+    The JSON around the images is serialized once with a placeholder per
+    image. Iterating yields that skeleton with each placeholder replaced by
+    a data URL whose base64 is encoded chunk by chunk from a memory-mapped
+    file, so no input is ever held in memory whole. The exact length is
+    known up front, which lets the request carry a Content-Length instead
+    of chunked encoding. Iterating again re-reads the files.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        prompt: str,
+        input_images: list[str],
+        aspect_ratio: str,
+        image_size: str,
+    ) -> None:
+        self._images: list[tuple[str, int, bytes]] = []
+        token = f"nanobanana-input-{uuid.uuid4().hex}"
+        content_parts: list[dict] = []
+
+        for i, img_path in enumerate(input_images):
+            try:
+                size = os.stat(img_path).st_size
+            except OSError as e:
+                raise RuntimeError(f"failed to read image {img_path}: {e}") from e
+            prefix = f"data:{mime_from_extension(img_path)};base64,".encode()
+            self._images.append((img_path, size, prefix))
+            content_parts.append({
+                "type": "image_url",
+                "image_url": {"url": f"{token}-{i}"},
+            })
+
+        content_parts.append({"type": "text", "text": prompt})
+
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": content_parts}],
+            "modalities": ["image", "text"],
+            "image_config": {
+                "aspectRatio": aspect_ratio,
+                "imageSize": image_size,
             },
-            timeout=HTTP_TIMEOUT,
+        }
+        skeleton = json.dumps(payload).encode()
+        # A quoted token can't come from user text: its quotes would be escaped
+        self._pieces: list[bytes] = []
+        for i in range(len(input_images)):
+            before, skeleton = skeleton.split(f'"{token}-{i}"'.encode(), 1)
+            self._pieces.append(before + b'"')
+            skeleton = b'"' + skeleton
+        self._pieces.append(skeleton)
+
+        self.content_length = sum(len(p) for p in self._pieces) + sum(
+            len(prefix) + _b64_length(size) for _, size, prefix in self._images
         )
-    except httpx.HTTPError as e:
-        raise RuntimeError(f"request failed: {e}") from e
 
+    def freeze(self) -> None:
+        """Encode the whole body once, for sending it several times.
+
+        Trades memory for not re-reading and re-encoding every input per
+        request.
+        """
+        if self._images:
+            self._pieces = [b"".join(self)]
+            self._images = []
+
+    def __iter__(self) -> Iterator[bytes]:
+        for piece, (img_path, size, prefix) in zip(self._pieces, self._images):
+            yield piece + prefix
+            yield from _iter_base64(img_path, size)
+        yield self._pieces[-1]
+
+    async def aiter(self) -> AsyncIterator[bytes]:
+        """Async view for httpx.AsyncClient, which rejects sync iterators."""
+        for chunk in self:
+            yield chunk
+
+    def headers(self, api_key: str) -> dict[str, str]:
+        return {**_headers(api_key), "Content-Length": str(self.content_length)}
+
+
+def _iter_base64(path: str, size: int) -> Iterator[bytes]:
+    """Yield the base64 encoding of a file in chunks, reading via mmap."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != size:
+                raise RuntimeError(f"input image changed while sending: {path}")
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, size, _ENCODE_CHUNK):
+                    yield binascii.b2a_base64(
+                        mapped[offset:offset + _ENCODE_CHUNK], newline=False,
+                    )
+    except OSError as e:
+        raise RuntimeError(f"failed to read image {path}: {e}") from e
+
+
+def _headers(api_key: str) -> dict[str, str]:
+    return {
+        "Content-Type": "application/json",
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Authorization": f"Bearer {api_key}",
+    }
+
+
+def _check_status(resp: httpx.Response) -> None:
     if resp.status_code != 200:
-        raise RuntimeError(
-            f"HTTP error: {resp.status_code} {resp.reason_phrase} - {resp.text}"
+        raise APIError(
+            f"HTTP error: {resp.status_code} {resp.reason_phrase} - {resp.text}",
+            status_code=resp.status_code,
+            retry_after=parse_retry_after(resp.headers.get("Retry-After")),
         )
 
-    data = resp.json()
 
-    if data.get("error"):
-        raise RuntimeError(f"API error: {data['error'].get('message', data['error'])}")
+def _mime_from_data_url_header(header: str) -> str:
+    """Return the MIME type from a data URL header like 'data:image/png;base64'."""
+    mime_type = "image/png"  # default
+    if header.startswith("data:"):
+        header_parts = header[5:].split(";")
+        if header_parts and header_parts[0]:
+            mime_type = header_parts[0]
+    return mime_type
+
+
+def _extract_data_url(data: dict) -> str:
+    """Return the first image's data URL from a parsed response body."""
+    error = data.get("error")
+    if error:
+        # Upstream provider errors can arrive with a 200 status; the code says more
+        code = error.get("code") if isinstance(error, dict) else None
+        message = error.get("message", error) if isinstance(error, dict) else error
+        raise APIError(
+            f"API error: {message}",
+            status_code=code if isinstance(code, int) else None,
+        )
 
     # Extract image data
     choices = data.get("choices", [])
@@ -91,8 +370,15 @@ def generate_image(
     if not images:
         raise RuntimeError("no images in response")
 
+    return images[0].get("image_url", {}).get("url", "")
+
+
+def _parse_response(resp: httpx.Response) -> tuple[bytes, str]:
+    """Extract (image_data, mime_type) from a chat-completions response."""
+    _check_status(resp)
+
     # Parse data URL (format: data:image/png;base64,iVBORw0KGgo...)
-    data_url = images[0].get("image_url", {}).get("url", "")
+    data_url = _extract_data_url(resp.json())
     if not data_url.startswith("data:"):
         raise RuntimeError(
             f"unexpected image URL format: {data_url[:50]}"
@@ -103,13 +389,7 @@ def generate_image(
         raise RuntimeError("invalid data URL format")
 
     header, b64_data = parts
-
-    # Extract MIME type from header
-    mime_type = "image/png"  # default
-    if header.startswith("data:"):
-        header_parts = header[5:].split(";")
-        if header_parts and header_parts[0]:
-            mime_type = header_parts[0]
+    mime_type = _mime_from_data_url_header(header)
 
     try:
         image_data = base64.b64decode(b64_data)
@@ -117,3 +397,473 @@ def generate_image(
         raise RuntimeError(f"failed to decode image data: {e}") from e
 
     return image_data, mime_type
+
+
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+_ESCAPES = {
+    ord('"'): b'"', ord("\\"): b"\\", ord("/"): b"/", ord("b"): b"\b",
+    ord("f"): b"\f", ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t",
+}
+
+
+class _JSONPathStream:
+    """Incremental JSON scanner that forwards one string value to a sink.
+
+    The value is located by its path (keys and array indexes). Structural
+    characters outside strings are inspected one at a time, but string bodies
+    are skipped with a regex search, so a multi-megabyte base64 value costs a
+    few slices rather than a Python loop per byte. Input is assumed to be
+    well-formed JSON; malformed input just means the value is never found.
+    """
+
+    def __init__(self, path: tuple, sink: Callable[[bytes], None]) -> None:
+        self._path = path
+        self._sink = sink
+        # One frame per open container: [is_object, key_or_index, expecting_key]
+        self._stack: list[list] = []
+        self._in_string = False
+        self._role = ""  # "key", "target" or "skip" while inside a string
+        self._key = bytearray()
+        self._carry = b""  # escape sequence split across chunks
+        self.found = False
+        self.done = False
+
+    def feed(self, data: bytes) -> None:
+        if self._carry:
+            data = self._carry + data
+            self._carry = b""
+        i = 0
+        n = len(data)
+        while i < n and not self.done:
+            if self._in_string:
+                i = self._scan_string(data, i)
+                continue
+            c = data[i]
+            if c == 0x22:  # "
+                self._start_string()
+            elif c == 0x7B:  # {
+                self._stack.append([True, None, True])
+            elif c == 0x5B:  # [
+                self._stack.append([False, 0, False])
+            elif c in (0x7D, 0x5D):  # } ]
+                if self._stack:
+                    self._stack.pop()
+            elif c == 0x3A and self._stack:  # :
+                self._stack[-1][2] = False
+            elif c == 0x2C and self._stack:  # ,
+                frame = self._stack[-1]
+                if frame[0]:
+                    frame[2] = True
+                else:
+                    frame[1] += 1
+            i += 1
+
+    def _start_string(self) -> None:
+        self._in_string = True
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame[0] and frame[2]:
+            self._role = "key"
+            self._key.clear()
+        elif tuple(f[1] for f in self._stack) == self._path:
+            self._role = "target"
+            self.found = True
+        else:
+            self._role = "skip"
+
+    def _emit(self, chunk: bytes) -> None:
+        if self._role == "target":
+            self._sink(chunk)
+        elif self._role == "key":
+            self._key.extend(chunk)
+
+    def _scan_string(self, data: bytes, i: int) -> int:
+        """Consume string content from data[i:]; return the next index."""
+        n = len(data)
+        m = _STRING_SPECIAL.search(data, i)
+        end = m.start() if m else n
+        if end > i and self._role != "skip":
+            self._emit(data[i:end])
+        if m is None:
+            return n
+
+        if data[end] == 0x22:  # closing quote
+            self._in_string = False
+            if self._role == "key":
+                self._stack[-1][1] = self._key.decode("utf-8", "replace")
+            elif self._role == "target":
+                self.done = True
+            return end + 1
+
+        # Backslash escape; stash it if the chunk ends mid-sequence
+        if end + 1 >= n:
+            self._carry = data[end:]
+            return n
+        kind = data[end + 1]
+        if kind == ord("u"):
+            if end + 6 > n:
+                self._carry = data[end:]
+                return n
+            char = chr(int(data[end + 2:end + 6], 16))
+            if self._role != "skip":
+                self._emit(char.encode("utf-8", "surrogatepass"))
+            return end + 6
+        if self._role != "skip":
+            self._emit(_ESCAPES.get(kind, bytes([kind])))
+        return end + 2
+
+
+class _DataURLFileWriter:
+    """Sink that decodes a streamed base64 data URL into a file.
+
+    Decoding happens in 4-character groups as chunks arrive, so memory stays
+    at one network chunk regardless of image size. Bytes go to a temporary
+    file next to the destination, which is renamed into place by commit().
+    """
+
+    def __init__(self, output_for_mime: Callable[[str], str]) -> None:
+        self._output_for_mime = output_for_mime
+        self._header = bytearray()
+        self._file = None
+        self._tmp_path = ""
+        self._pending = b""
+        self.mime_type = ""
+        self.output_path = ""
+        self.bytes_written = 0
+
+    def __call__(self, chunk: bytes) -> None:
+        if self._file is None:
+            self._header.extend(chunk)
+            if not self._header.startswith(b"data:"[:len(self._header)]):
+                raise RuntimeError(
+                    f"unexpected image URL format: {self._header[:50].decode(errors='replace')}"
+                )
+            comma = self._header.find(b",")
+            if comma < 0:
+                if len(self._header) > 1024:
+                    raise RuntimeError("invalid data URL format")
+                return
+            header = self._header[:comma].decode("ascii", "replace")
+            chunk = bytes(self._header[comma + 1:])
+            self._open(_mime_from_data_url_header(header))
+        self._decode(chunk, final=False)
+
+    def _open(self, mime_type: str) -> None:
+        self.mime_type = mime_type
+        self.output_path = self._output_for_mime(mime_type)
+        directory = Path(self.output_path).parent
+        try:
+            fd, self._tmp_path = tempfile.mkstemp(
+                dir=directory, prefix=".nanobanana-", suffix=".part",
+            )
+            self._file = os.fdopen(fd, "wb")
+        except OSError as e:
+            raise RuntimeError(f"failed to write output file: {e}") from e
+
+    def _decode(self, chunk: bytes, *, final: bool) -> None:
+        # Whitespace would break the 4-character alignment below
+        data = self._pending + chunk.translate(None, b" \t\r\n")
+        if not final:
+            cut = len(data) - len(data) % 4
+            data, self._pending = data[:cut], data[cut:]
+        if not data:
+            return
+        with timings.phase("decode"):
+            try:
+                decoded = binascii.a2b_base64(data)
+            except binascii.Error as e:
+                raise RuntimeError(f"failed to decode image data: {e}") from e
+            try:
+                self._file.write(decoded)
+            except OSError as e:
+                raise RuntimeError(f"failed to write output file: {e}") from e
+        self.bytes_written += len(decoded)
+
+    def commit(self) -> tuple[str, str]:
+        """Finish decoding and move the file into place. Returns (path, mime_type)."""
+        if self._file is None:
+            raise RuntimeError("invalid data URL format")
+        self._decode(b"", final=True)
+        try:
+            with timings.phase("write"):
+                self._file.close()
+                os.replace(self._tmp_path, self.output_path)
+        except OSError as e:
+            raise RuntimeError(f"failed to write output file: {e}") from e
+        self._file = None
+        timings.count("image_bytes", self.bytes_written)
+        return self.output_path, self.mime_type
+
+    def abort(self) -> None:
+        """Discard any partially written file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._tmp_path:
+            Path(self._tmp_path).unlink(missing_ok=True)
+
+
+class _StreamedImageResponse:
+    """Feeds response chunks to the scanner and keeps a head for errors."""
+
+    def __init__(self, output_for_mime: Callable[[str], str]) -> None:
+        self.writer = _DataURLFileWriter(output_for_mime)
+        self._scanner = _JSONPathStream(_IMAGE_URL_PATH, self.writer)
+        self._head = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        timings.count("response_bytes", len(chunk))
+        if len(self._head) < _HEAD_LIMIT:
+            self._head.extend(chunk[:_HEAD_LIMIT - len(self._head)])
+        self._scanner.feed(chunk)
+
+    def finish(self) -> tuple[str, str]:
+        if self._scanner.done:
+            return self.writer.commit()
+        if self._scanner.found:
+            raise RuntimeError("response ended inside image data")
+        # No image: report the same errors as the buffered parser would
+        try:
+            data = json.loads(self._head)
+        except ValueError:
+            raise RuntimeError("no images in response") from None
+        data_url = _extract_data_url(data)
+        raise RuntimeError(f"unexpected image URL format: {str(data_url)[:50]}")
+
+
+def generate_image(
+    api_key: str,
+    model: str,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    client: httpx.Client | None = None,
+    retry: RetryPolicy | None = None,
+) -> tuple[bytes, str]:
+    """Generate an image using the OpenRouter API.
+
+    Pass a client from create_client to reuse its connection pool across
+    calls. Rate limits and transient failures are retried per retry
+    (default: DEFAULT_RETRY).
+    Returns (image_data, mime_type).
+    Raises RuntimeError on failure.
+    """
+    with timings.phase("prepare"):
+        body = _RequestBody(model, prompt, input_images, aspect_ratio, image_size)
+
+    def attempt() -> tuple[bytes, str]:
+        timings.count("request_bytes", body.content_length)
+        try:
+            with timings.phase("download"):
+                resp = client.post(
+                    _endpoint(),
+                    content=body,
+                    headers=body.headers(api_key),
+                    extensions=timings.trace_extensions(),
+                )
+        except httpx.HTTPError as e:
+            raise transport_error(e) from e
+        timings.count("response_bytes", len(resp.content))
+        timings.count("response_wire_bytes", resp.num_bytes_downloaded)
+        with timings.phase("decode"):
+            image_data, mime_type = _parse_response(resp)
+        timings.count("image_bytes", len(image_data))
+        return image_data, mime_type
+
+    owns_client = client is None
+    if owns_client:
+        client = create_client()
+    try:
+        return call_with_retry(attempt, retry)
+    finally:
+        if owns_client:
+            client.close()
+
+
+async def agenerate_image(
+    client: httpx.AsyncClient,
+    api_key: str,
+    model: str,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    retry: RetryPolicy | None = None,
+) -> tuple[bytes, str]:
+    """Async variant of generate_image using a shared connection pool.
+
+    Returns (image_data, mime_type).
+    Raises RuntimeError on failure.
+    """
+    with timings.phase("prepare"):
+        body = _RequestBody(model, prompt, input_images, aspect_ratio, image_size)
+
+    async def attempt() -> tuple[bytes, str]:
+        timings.count("request_bytes", body.content_length)
+        try:
+            with timings.phase("download"):
+                resp = await client.post(
+                    _endpoint(),
+                    content=body.aiter(),
+                    headers=body.headers(api_key),
+                    extensions=timings.trace_extensions(asynchronous=True),
+                )
+        except httpx.HTTPError as e:
+            raise transport_error(e) from e
+        timings.count("response_bytes", len(resp.content))
+        timings.count("response_wire_bytes", resp.num_bytes_downloaded)
+        with timings.phase("decode"):
+            image_data, mime_type = _parse_response(resp)
+        timings.count("image_bytes", len(image_data))
+        return image_data, mime_type
+
+    return await acall_with_retry(attempt, retry)
+
+
+def generate_image_to_file(
+    api_key: str,
+    model: str,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    output_for_mime: Callable[[str], str],
+    client: httpx.Client | None = None,
+    retry: RetryPolicy | None = None,
+) -> tuple[str, str]:
+    """Generate an image and stream-decode it straight to disk.
+
+    output_for_mime maps the returned MIME type to the destination path.
+    The response body is never held in memory whole; the destination only
+    appears once the image is complete.
+    Returns (output_path, mime_type).
+    Raises RuntimeError on failure.
+    """
+    with timings.phase("prepare"):
+        body = _RequestBody(model, prompt, input_images, aspect_ratio, image_size)
+
+    def attempt() -> tuple[str, str]:
+        stream = _StreamedImageResponse(output_for_mime)
+        timings.count("request_bytes", body.content_length)
+        try:
+            with timings.phase("download"), client.stream(
+                "POST",
+                _endpoint(),
+                content=body,
+                headers=body.headers(api_key),
+                extensions=timings.trace_extensions(),
+            ) as resp:
+                if resp.status_code != 200:
+                    resp.read()
+                    _check_status(resp)
+                for chunk in resp.iter_bytes():
+                    stream.feed(chunk)
+                timings.count("response_wire_bytes", resp.num_bytes_downloaded)
+            return stream.finish()
+        except httpx.HTTPError as e:
+            stream.writer.abort()
+            raise transport_error(e) from e
+        except BaseException:
+            stream.writer.abort()
+            raise
+
+    owns_client = client is None
+    if owns_client:
+        client = create_client()
+    try:
+        return call_with_retry(attempt, retry)
+    finally:
+        if owns_client:
+            client.close()
+
+
+async def agenerate_image_to_file(
+    client: httpx.AsyncClient,
+    api_key: str,
+    model: str,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    output_for_mime: Callable[[str], str],
+    retry: RetryPolicy | None = None,
+) -> tuple[str, str]:
+    """Async variant of generate_image_to_file using a shared connection pool.
+
+    Returns (output_path, mime_type).
+    Raises RuntimeError on failure.
+    """
+    with timings.phase("prepare"):
+        body = _RequestBody(model, prompt, input_images, aspect_ratio, image_size)
+    return await _agenerate_to_file(client, body, api_key, output_for_mime, retry)
+
+
+async def agenerate_candidates_to_files(
+    client: httpx.AsyncClient,
+    n: int,
+    api_key: str,
+    model: str,
+    prompt: str,
+    input_images: list[str],
+    aspect_ratio: str,
+    image_size: str,
+    output_for_mime: Callable[[int, str], str],
+    retry: RetryPolicy | None = None,
+) -> list[tuple[str, str] | BaseException]:
+    """Generate n images for the same request concurrently, streamed to disk.
+
+    output_for_mime(index, mime_type) maps each candidate (0-based) to its
+    destination. The request body, inputs included, is encoded once and
+    shared by all n requests.
+    Returns (output_path, mime_type) or the exception, per candidate.
+    """
+    with timings.phase("prepare"):
+        body = _RequestBody(model, prompt, input_images, aspect_ratio, image_size)
+        if n > 1:
+            body.freeze()
+    return await asyncio.gather(
+        *(
+            _agenerate_to_file(
+                client, body, api_key, lambda mime, index=index: output_for_mime(index, mime), retry,
+            )
+            for index in range(n)
+        ),
+        return_exceptions=True,
+    )
+
+
+async def _agenerate_to_file(
+    client: httpx.AsyncClient,
+    body: _RequestBody,
+    api_key: str,
+    output_for_mime: Callable[[str], str],
+    retry: RetryPolicy | None,
+) -> tuple[str, str]:
+    async def attempt() -> tuple[str, str]:
+        stream = _StreamedImageResponse(output_for_mime)
+        timings.count("request_bytes", body.content_length)
+        try:
+            with timings.phase("download"):
+                async with client.stream(
+                    "POST",
+                    _endpoint(),
+                    content=body.aiter(),
+                    headers=body.headers(api_key),
+                    extensions=timings.trace_extensions(asynchronous=True),
+                ) as resp:
+                    if resp.status_code != 200:
+                        await resp.aread()
+                        _check_status(resp)
+                    async for chunk in resp.aiter_bytes():
+                        stream.feed(chunk)
+                    timings.count("response_wire_bytes", resp.num_bytes_downloaded)
+            return stream.finish()
+        except httpx.HTTPError as e:
+            stream.writer.abort()
+            raise transport_error(e) from e
+        except BaseException:
+            stream.writer.abort()
+            raise
+
+    return await acall_with_retry(attempt, retry)
@@ -0,0 +1,202 @@
+"""Downscale and recompress input images before upload.
+
+Reference photos and screenshots are often far larger than the requested
+output. Inputs whose long edge exceeds the bound for the target size are
+resized to fit, then re-encoded (WebP by default); inputs that already fit
+are sent as-is. A result is only used when it is smaller than the original.
+
+Prepared files are cached under the cache directory, keyed by (path,
+mtime, file size, bound, format, quality), so repeat runs with the same
+inputs cost one stat() each. Requires Pillow (the `images` extra); without
+it inputs are uploaded unchanged.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from nanobanana.cache import get_cache_dir
+from nanobanana.config import FileConfig
+
+# Long-edge bound per output size; inputs beyond this add upload time only
+SIZE_BOUNDS = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+INPUT_FORMATS = {"webp": ".webp", "jpeg": ".jpg"}
+DEFAULT_FORMAT = "webp"
+DEFAULT_QUALITY = 85
+
+_MAX_CACHE_ENTRIES = 256
+
+# Suffix of an empty marker recording that the original should be kept
+_KEEP_SUFFIX = ".keep"
+
+
+@dataclass
+class PreparedInputs:
+    """Paths to upload in place of the originals, with byte totals."""
+
+    paths: list[str]
+    original_bytes: int = 0
+    prepared_bytes: int = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.prepared_bytes
+
+
+def get_inputs_cache_dir() -> Path:
+    return get_cache_dir() / "inputs"
+
+
+def _options(file_config: FileConfig | None) -> tuple[str, int]:
+    fmt = (file_config.input_format if file_config else "") or DEFAULT_FORMAT
+    quality = (file_config.input_quality if file_config else 0) or DEFAULT_QUALITY
+    if fmt not in INPUT_FORMATS:
+        raise RuntimeError(f"invalid input_format: {fmt} (valid: webp, jpeg)")
+    if not 1 <= quality <= 100:
+        raise RuntimeError(f"invalid input_quality: {quality} (valid: 1-100)")
+    return fmt, quality
+
+
+def _cache_path(root: Path, path: str, st: os.stat_result, bound: int, fmt: str, quality: int) -> Path:
+    key = "\0".join(
+        str(v) for v in (os.path.abspath(path), st.st_mtime_ns, st.st_size, bound, fmt, quality)
+    )
+    return root / (hashlib.sha256(key.encode()).hexdigest()[:32] + INPUT_FORMATS[fmt])
+
+
+def _shrink(src: str, dest: str, bound: int, fmt: str, quality: int) -> bool:
+    """Resize and re-encode src into dest. Returns False to keep the original.
+
+    Runs in worker processes, so it takes and returns plain values only.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(src) as img:
+            # Inputs that already fit aren't worth a lossy re-encode
+            if getattr(img, "is_animated", False) or max(img.size) <= bound:
+                return False
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((bound, bound), Image.Resampling.LANCZOS)
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                if img.getchannel("A").getextrema() == (255, 255):
+                    img = img.convert("RGB")  # opaque screenshots carry a useless alpha
+                elif fmt == "jpeg":
+                    return False  # JPEG would flatten real transparency
+            elif img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, format=fmt.upper(), quality=quality)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+
+    data = buf.getvalue()
+    if len(data) >= os.path.getsize(src):
+        return False
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+    except OSError:
+        Path(tmp).unlink(missing_ok=True)
+        return False
+    return True
+
+
+def _prune(root: Path) -> None:
+    """Drop the least recently used entries beyond _MAX_CACHE_ENTRIES."""
+    try:
+        entries = sorted(root.iterdir(), key=lambda p: p.stat().st_mtime)
+    except OSError:
+        return
+    for path in entries[:-_MAX_CACHE_ENTRIES]:
+        path.unlink(missing_ok=True)
+
+
+def prepare_inputs(
+    input_images: list[str],
+    image_size: str,
+    file_config: FileConfig | None = None,
+    *,
+    executor: Executor | None = None,
+    root: Path | None = None,
+) -> PreparedInputs:
+    """Return downscaled copies of input_images for a request at image_size.
+
+    Inputs that can't be improved (already small, animated, unreadable) are
+    passed through unchanged; the backend reports unreadable files as usual.
+    Several uncached inputs are processed in parallel: on executor if given,
+    otherwise on a temporary process pool.
+    Raises RuntimeError on invalid input_format/input_quality settings.
+    """
+    fmt, quality = _options(file_config)
+    result = PreparedInputs(paths=list(input_images))
+    if not input_images:
+        return result
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return result
+
+    bound = SIZE_BOUNDS[image_size]
+    root = root if root is not None else get_inputs_cache_dir()
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return result
+
+    misses: list[tuple[int, Path, int]] = []
+    for i, path in enumerate(input_images):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        result.original_bytes += st.st_size
+        dest = _cache_path(root, path, st, bound, fmt, quality)
+        try:
+            dest_size = dest.stat().st_size
+            os.utime(dest)
+        except OSError:
+            if not dest.with_suffix(_KEEP_SUFFIX).exists():
+                misses.append((i, dest, st.st_size))
+            else:
+                result.prepared_bytes += st.st_size
+            continue
+        result.paths[i] = str(dest)
+        result.prepared_bytes += dest_size
+
+    if misses:
+        args = [(input_images[i], str(dest), bound, fmt, quality) for i, dest, _ in misses]
+        if executor is not None:
+            shrunk = list(executor.map(_shrink, *zip(*args)))
+        elif len(args) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(args), os.cpu_count() or 1)) as pool:
+                shrunk = list(pool.map(_shrink, *zip(*args)))
+        else:
+            shrunk = [_shrink(*args[0])]
+        for (i, dest, original_size), ok in zip(misses, shrunk):
+            try:
+                if ok:
+                    result.prepared_bytes += dest.stat().st_size
+                    result.paths[i] = str(dest)
+                    continue
+                dest.with_suffix(_KEEP_SUFFIX).touch()
+            except OSError:
+                pass
+            result.prepared_bytes += original_size
+        _prune(root)
+
+    return result
+
+
+def format_savings(prepared: PreparedInputs) -> str:
+    """Describe the upload size reduction, e.g. '24.1 MB -> 1.2 MB'."""
+    mb = 1024 * 1024
+    return f"{prepared.original_bytes / mb:.1f} MB -> {prepared.prepared_bytes / mb:.1f} MB"
@@ -0,0 +1,152 @@
+"""Client-side rate limiting shared by every nanobanana process.
+
+Parallel CI jobs and agent sandboxes using one API key can together exceed
+the provider's per-key quota, and then all of them get 429s. With
+rate_limit_rpm and/or max_inflight configured, each request attempt first
+takes a slot from a token bucket whose state lives in a lock-protected JSON
+file next to the config file, so concurrent invocations queue locally
+instead of being rejected by the provider.
+
+State is scoped per backend and API key (hashed, never stored). If the
+state file can't be opened, requests go out unlimited rather than failing.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+
+from nanobanana.config import HTTP_TIMEOUT, APIConfig, FileConfig, get_config_path
+from nanobanana.locking import locked_file, pid_alive, rewrite
+
+STATE_FILENAME = "ratelimit.json"
+
+# Slots held longer than this belong to a process that died mid-request
+_STALE_SLOT_SECONDS = HTTP_TIMEOUT * 2
+
+# How often a request queued on max_inflight checks for a freed slot
+_INFLIGHT_POLL = 0.25
+
+
+class RateLimiter:
+    """Token bucket plus in-flight cap, coordinated through a locked file.
+
+    The bucket refills at rpm/60 tokens per second and holds at most a
+    tenth of a minute's worth, so queued requests are spread out rather
+    than released in one burst.
+    """
+
+    def __init__(self, path: Path, scope: str, rpm: int = 0, max_inflight: int = 0) -> None:
+        self.path = path
+        self.scope = scope
+        self.rpm = rpm
+        self.max_inflight = max_inflight
+        self.burst = max(1.0, rpm / 10)
+
+    def _update(self, change) -> float:
+        """Apply change(bucket, now) to this scope's state under the file lock.
+
+        Returns what change returns. Returns 0 (proceed unlimited) when
+        the state file is unusable.
+        """
+        try:
+            with locked_file(self.path) as f:
+                try:
+                    state = json.loads(f.read() or b"{}")
+                except ValueError:
+                    state = {}
+                now = time.time()
+                bucket = state.get(self.scope) or {}
+                inflight = {
+                    slot: (pid, since)
+                    for slot, (pid, since) in bucket.get("inflight", {}).items()
+                    if now - since < _STALE_SLOT_SECONDS and pid_alive(pid)
+                }
+                tokens = bucket.get("tokens", self.burst)
+                if self.rpm:
+                    elapsed = max(0.0, now - bucket.get("updated", now))
+                    tokens = min(self.burst, tokens + elapsed * self.rpm / 60)
+                bucket = {"tokens": tokens, "updated": now, "inflight": inflight}
+                result = change(bucket, now)
+                state[self.scope] = bucket
+                rewrite(f, json.dumps(state).encode())
+                return result
+        except OSError:
+            return 0.0
+
+    def _try_acquire(self, slot: str) -> float:
+        """Take a slot if one is free. Returns 0 on success, else seconds to wait."""
+
+        def take(bucket: dict, now: float) -> float:
+            if self.rpm and bucket["tokens"] < 1:
+                return (1 - bucket["tokens"]) * 60 / self.rpm
+            if self.max_inflight and len(bucket["inflight"]) >= self.max_inflight:
+                return _INFLIGHT_POLL
+            if self.rpm:
+                bucket["tokens"] -= 1
+            if self.max_inflight:
+                bucket["inflight"][slot] = (os.getpid(), now)
+            return 0.0
+
+        return self._update(take)
+
+    def _release(self, slot: str) -> None:
+        def give_back(bucket: dict, now: float) -> float:
+            bucket["inflight"].pop(slot, None)
+            return 0.0
+
+        if self.max_inflight:
+            self._update(give_back)
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """Block until a request may be sent; hold the slot for its duration."""
+        slot = uuid.uuid4().hex
+        while (wait := self._try_acquire(slot)) > 0:
+            time.sleep(wait)
+        try:
+            yield
+        finally:
+            self._release(slot)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """Async variant of slot(); the file lock is taken on a worker thread."""
+        slot = uuid.uuid4().hex
+        while (wait := await asyncio.to_thread(self._try_acquire, slot)) > 0:
+            await asyncio.sleep(wait)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self._release, slot)
+
+
+def open_rate_limiter(file_config: FileConfig | None, api_config: APIConfig) -> RateLimiter | None:
+    """Return the limiter for api_config's key, or None when not configured.
+
+    Raises RuntimeError on invalid rate_limit_rpm/max_inflight settings.
+    """
+    rpm = file_config.rate_limit_rpm if file_config else 0
+    max_inflight = file_config.max_inflight if file_config else 0
+    if not isinstance(rpm, int) or rpm < 0:
+        raise RuntimeError(f"invalid rate_limit_rpm: {rpm} (must be a positive integer)")
+    if not isinstance(max_inflight, int) or max_inflight < 0:
+        raise RuntimeError(f"invalid max_inflight: {max_inflight} (must be a positive integer)")
+    if not rpm and not max_inflight:
+        return None
+
+    config_path = get_config_path()
+    if config_path is None:
+        return None
+    try:
+        config_path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    backend = "openrouter" if api_config.use_openrouter else "gemini"
+    scope = hashlib.sha256(f"{backend}\0{api_config.api_key}".encode()).hexdigest()[:16]
+    return RateLimiter(config_path.parent / STATE_FILENAME, scope, rpm, max_inflight)
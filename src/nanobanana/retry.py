@@ -0,0 +1,136 @@
+"""Retry policy shared by the OpenRouter and Gemini backends.
+
+Backends raise APIError for failed requests, classified as retryable
+(rate limits, transient server errors, dropped connections, timeouts) or
+fatal (bad key, invalid request). call_with_retry() retries the former
+with capped exponential backoff and full jitter, or waits as long as the
+server's Retry-After asks.
+"""
+
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, TypeVar
+
+import httpx
+
+if TYPE_CHECKING:
+    from nanobanana.ratelimit import RateLimiter
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class APIError(RuntimeError):
+    """A failed API request. retryable defaults from the HTTP status."""
+
+    def __init__(
+        self,
+        message: str,
+        *,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+        retryable: bool | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable if retryable is not None else status_code in RETRYABLE_STATUS
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=UTC)
+    return max(0.0, (when - datetime.now(UTC)).total_seconds())
+
+
+def transport_error(e: httpx.HTTPError) -> APIError:
+    """Classify an httpx exception; resets and timeouts are worth retrying."""
+    retryable = isinstance(e, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError))
+    return APIError(f"request failed: {e}", retryable=retryable)
+
+
+@dataclass
+class RetryPolicy:
+    """How often and how long to retry.
+
+    on_retry(attempt, error, delay) is called before each wait, e.g. to
+    report progress. With a limiter, every attempt first waits for a slot.
+    """
+
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    # A longer Retry-After than this is treated as fatal rather than waited out
+    max_retry_after: float = 120.0
+    on_retry: Callable[[int, APIError, float], None] | None = None
+    limiter: "RateLimiter | None" = None
+
+    def delay(self, attempt: int, error: APIError) -> float | None:
+        """Seconds to wait before retry number `attempt`, or None to give up."""
+        if not error.retryable or attempt >= self.max_attempts:
+            return None
+        if error.retry_after is not None:
+            return error.retry_after if error.retry_after <= self.max_retry_after else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def describe(self, attempt: int, error: APIError, delay: float) -> str:
+        """Describe a retry for progress output."""
+        reason = f"HTTP {error.status_code}" if error.status_code else str(error)
+        return f"retry {attempt}/{self.max_attempts - 1} after {reason}, waiting {delay:.1f}s"
+
+
+DEFAULT_RETRY = RetryPolicy()
+
+
+def _next_delay(policy: RetryPolicy, attempt: int, error: APIError) -> float:
+    """Return the wait before the next attempt, or re-raise error to give up."""
+    delay = policy.delay(attempt, error)
+    if delay is None:
+        raise error
+    if policy.on_retry is not None:
+        policy.on_retry(attempt, error, delay)
+    return delay
+
+
+def call_with_retry(fn: Callable[[], T], policy: RetryPolicy | None = None) -> T:
+    """Call fn, retrying on retryable APIError per policy."""
+    policy = policy or DEFAULT_RETRY
+    attempt = 1
+    while True:
+        try:
+            with policy.limiter.slot() if policy.limiter else nullcontext():
+                return fn()
+        except APIError as e:
+            time.sleep(_next_delay(policy, attempt, e))
+        attempt += 1
+
+
+async def acall_with_retry(fn: Callable[[], Awaitable[T]], policy: RetryPolicy | None = None) -> T:
+    """Async variant of call_with_retry; fn is called afresh for each attempt."""
+    policy = policy or DEFAULT_RETRY
+    attempt = 1
+    while True:
+        try:
+            async with policy.limiter.aslot() if policy.limiter else nullcontext():
+                return await fn()
+        except APIError as e:
+            await asyncio.sleep(_next_delay(policy, attempt, e))
+        attempt += 1
@@ -0,0 +1,252 @@
+"""Optional telemetry: trace spans and Prometheus metrics per generation.
+
+Enabled by trace_file, otlp_endpoint or prometheus_file in the config file
+(or NANOBANANA_TRACE_FILE, NANOBANANA_OTLP_ENDPOINT,
+NANOBANANA_PROMETHEUS_FILE). The CLI checks for these before importing
+this module, so with none set telemetry costs nothing.
+
+Each run becomes one trace: a root "nanobanana.generate" span with a child
+span per timing phase (see nanobanana.timings). Traces are OTLP/JSON,
+appended one line per run to trace_file or POSTed to an OTLP/HTTP collector
+at otlp_endpoint. Prometheus counters and histograms accumulate in a
+locked state file in the cache directory and are rendered to
+prometheus_file for node_exporter's textfile collector.
+
+Export problems are reported as warnings; they never fail a generation.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from nanobanana.cache import get_cache_dir
+from nanobanana.locking import locked_file, rewrite
+from nanobanana.timings import Timings
+
+# Generation latency histogram buckets, in seconds
+DURATION_BUCKETS = (1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0, 180.0)
+
+METRICS_STATE_FILENAME = "metrics.json"
+
+_OTLP_TIMEOUT = 2.0
+
+# Attributes copied from the run onto metric labels
+_LABELS = ("backend", "model", "command", "size")
+
+_COUNTER_HELP = {
+    "nanobanana_generations_total": "Generations by outcome.",
+    "nanobanana_bytes_total": "Bytes transferred by direction.",
+    "nanobanana_phase_seconds_total": "Time spent per phase, excluding nested phases.",
+}
+_DURATION_METRIC = "nanobanana_generation_duration_seconds"
+
+
+def error_class(e: BaseException | None) -> str:
+    """Classify a run's outcome for the status label and span status."""
+    if e is None:
+        return "ok"
+    if isinstance(e, KeyboardInterrupt):
+        return "interrupted"
+    status = getattr(e, "status_code", None)
+    if status == 429:
+        return "rate_limited"
+    if status == 408 or (status is not None and status >= 500):
+        return "server_error"
+    if status is not None and 400 <= status < 500:
+        return "client_error"
+    if getattr(e, "retryable", False):
+        return "transport_error"
+    return "error"
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def build_trace(timings: Timings) -> dict:
+    """Return the run as an OTLP/JSON ExportTraceServiceRequest."""
+    import nanobanana
+
+    trace_id = os.urandom(16).hex()
+    root_id = os.urandom(8).hex()
+
+    def nanos(monotonic: float) -> str:
+        return str(int((monotonic + timings.wall_offset) * 1e9))
+
+    outcome = error_class(timings.exception)
+    root = {
+        "traceId": trace_id,
+        "spanId": root_id,
+        "name": "nanobanana.generate",
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": nanos(timings.started),
+        "endTimeUnixNano": nanos(timings.started + timings.total),
+        "attributes": [
+            *(_attribute(f"nanobanana.{k}", v) for k, v in timings.attributes.items()),
+            *(_attribute(f"nanobanana.{k}", v) for k, v in timings.counters.items()),
+            _attribute("nanobanana.outcome", outcome),
+        ],
+        "status": {"code": 1} if outcome == "ok" else {"code": 2, "message": timings.error},
+    }
+    span_ids = {name: os.urandom(8).hex() for name in timings.spans}
+    spans = [root]
+    for name, (start, end, parent) in timings.spans.items():
+        spans.append({
+            "traceId": trace_id,
+            "spanId": span_ids[name],
+            "parentSpanId": span_ids.get(parent, root_id),
+            "name": name,
+            "kind": 1,
+            "startTimeUnixNano": nanos(start),
+            "endTimeUnixNano": nanos(end),
+            "attributes": [_attribute("nanobanana.self_ms", round(timings.phases[name] * 1000, 3))],
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            _attribute("service.name", "nanobanana"),
+            _attribute("service.version", nanobanana.__version__),
+        ]},
+        "scopeSpans": [{"scope": {"name": "nanobanana"}, "spans": spans}],
+    }]}
+
+
+def write_trace_file(trace: dict, path: str) -> None:
+    with open(path, "a") as f:
+        f.write(json.dumps(trace, separators=(",", ":")) + "\n")
+
+
+def post_otlp(trace: dict, endpoint: str) -> None:
+    """POST a trace to an OTLP/HTTP collector, e.g. http://localhost:4318."""
+    import urllib.request
+
+    url = endpoint if endpoint.rstrip("/").endswith("/v1/traces") else endpoint.rstrip("/") + "/v1/traces"
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(trace).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=_OTLP_TIMEOUT) as resp:
+        resp.read()
+
+
+def _label_key(labels: dict[str, str]) -> str:
+    return json.dumps(sorted(labels.items()))
+
+
+def _update_metrics(metrics: dict, timings: Timings) -> None:
+    labels = {name: str(timings.attributes.get(name, "")) for name in _LABELS}
+    counters = metrics.setdefault("counters", {})
+
+    def inc(metric: str, extra: dict[str, str], value: float) -> None:
+        series = counters.setdefault(metric, {})
+        key = _label_key({**labels, **extra})
+        series[key] = series.get(key, 0) + value
+
+    inc("nanobanana_generations_total", {
+        "status": error_class(timings.exception),
+        "cache": str(timings.attributes.get("cache", "miss")),
+    }, 1)
+    for counter, value in timings.counters.items():
+        direction = counter.removesuffix("_bytes")
+        inc("nanobanana_bytes_total", {"direction": direction}, value)
+    for name, seconds in timings.phases.items():
+        inc("nanobanana_phase_seconds_total", {"phase": name}, round(seconds, 6))
+
+    if timings.exception is None:
+        series = metrics.setdefault("histograms", {}).setdefault(_DURATION_METRIC, {})
+        hist = series.setdefault(_label_key(labels), {
+            "buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0,
+        })
+        total = timings.total
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if total <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += total
+        hist["count"] += 1
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: str, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = [*json.loads(key), *extra]
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus(metrics: dict) -> str:
+    """Render accumulated metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for metric, series in sorted(metrics.get("counters", {}).items()):
+        lines.append(f"# HELP {metric} {_COUNTER_HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} counter")
+        for key, value in sorted(series.items()):
+            lines.append(f"{metric}{_format_labels(key)} {_number(value)}")
+    for metric, series in sorted(metrics.get("histograms", {}).items()):
+        lines.append(f"# HELP {metric} Generation wall time for successful runs.")
+        lines.append(f"# TYPE {metric} histogram")
+        for key, hist in sorted(series.items()):
+            for bound, count in zip(DURATION_BUCKETS, hist["buckets"]):
+                lines.append(f"{metric}_bucket{_format_labels(key, (('le', _number(bound)),))} {count}")
+            lines.append(f"{metric}_bucket{_format_labels(key, (('le', '+Inf'),))} {hist['count']}")
+            lines.append(f"{metric}_sum{_format_labels(key)} {_number(round(hist['sum'], 6))}")
+            lines.append(f"{metric}_count{_format_labels(key)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def update_prometheus(timings: Timings, path: str, state_path: Path | None = None) -> None:
+    """Fold this run into the metrics state and rewrite the textfile."""
+    state_path = state_path if state_path is not None else get_cache_dir() / METRICS_STATE_FILENAME
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    target = os.path.abspath(path)
+    with locked_file(state_path) as f:
+        try:
+            state = json.loads(f.read() or b"{}")
+        except ValueError:
+            state = {}
+        metrics = state.setdefault(target, {})
+        _update_metrics(metrics, timings)
+        rewrite(f, json.dumps(state).encode())
+        # Written while holding the lock so concurrent runs can't interleave
+        text = render_prometheus(metrics)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as out:
+                out.write(text)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, target)
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+
+def export(timings: Timings, targets: dict[str, str]) -> None:
+    """Send one finished run to every configured output."""
+    trace = None
+    if targets.get("trace_file") or targets.get("otlp_endpoint"):
+        trace = build_trace(timings)
+    for key, action in (
+        ("trace_file", lambda target: write_trace_file(trace, target)),
+        ("otlp_endpoint", lambda target: post_otlp(trace, target)),
+        ("prometheus_file", lambda target: update_prometheus(timings, target)),
+    ):
+        target = targets.get(key)
+        if not target:
+            continue
+        try:
+            action(target)
+        except (OSError, ValueError) as e:
+            print(f"Warning: telemetry export to {target} failed: {e}", file=sys.stderr)
@@ -0,0 +1,219 @@
+"""Per-phase timing of a generation, reported by -timings.
+
+Phases are recorded into the Timings installed for the current context by
+collect(), so backends record without a parameter threaded through every
+call. Nested phases are charged to the innermost one only, so the report
+adds up to the wall time. Each phase name also keeps its first start, last
+end and parent, which telemetry exports as spans. With no Timings
+installed, phase() returns a shared no-op context manager and count() and
+annotate() return immediately.
+
+NANOBANANA_TIMINGS=1 has the same effect as -timings (report on stderr);
+set it to a file path to append one JSON line per run instead.
+"""
+
+import json
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+ENV_VAR = "NANOBANANA_TIMINGS"
+
+_current: ContextVar["Timings | None"] = ContextVar("nanobanana_timings", default=None)
+# The phase whose self time a finished child phase is subtracted from
+_parent: ContextVar["_Phase | None"] = ContextVar("nanobanana_timings_parent", default=None)
+
+_NOOP = nullcontext()
+
+# httpx/httpcore trace events (prefix stripped) -> phase name
+_TRACE_PHASES = {
+    "connect_tcp": "connect",
+    "connect_unix_socket": "connect",
+    "start_tls": "tls",
+    "send_connection_init": "send",
+    "send_request_headers": "send",
+    "send_request_body": "send",
+    "receive_response_headers": "wait",
+}
+
+
+class Timings:
+    """Accumulated self time per phase plus byte counters for one run."""
+
+    def __init__(self, started: float | None = None) -> None:
+        self.started = started if started is not None else time.monotonic()
+        # Converts monotonic readings to wall-clock time for exported spans
+        self.wall_offset = time.time() - time.monotonic()
+        self.finished: float | None = None
+        self.phases: dict[str, float] = {}
+        # name -> [first start, last end, parent name]
+        self.spans: dict[str, list] = {}
+        self.counters: dict[str, int] = {}
+        self.attributes: dict[str, str] = {}
+        self.exception: BaseException | None = None
+        self.error = ""
+
+    def record(self, name: str, start: float, end: float, own: float, parent: str = "") -> None:
+        """Record one occurrence of a phase; own excludes time in nested phases."""
+        self.phases[name] = self.phases.get(name, 0.0) + own
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [start, end, parent]
+        else:
+            span[1] = max(span[1], end)
+
+    def fail(self, e: BaseException) -> None:
+        self.exception = e
+        self.error = str(e) or type(e).__name__
+
+    def finish(self) -> None:
+        if self.finished is None:
+            self.finished = time.monotonic()
+
+    @property
+    def total(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def report(self) -> dict:
+        total = self.total
+        accounted = sum(self.phases.values())
+        phases = {name: round(s * 1000, 1) for name, s in self.phases.items()}
+        phases["other"] = round(max(0.0, total - accounted) * 1000, 1)
+        report = {
+            "total_ms": round(total * 1000, 1),
+            "phases_ms": phases,
+            "bytes": dict(self.counters),
+        }
+        if self.attributes:
+            report["attributes"] = dict(self.attributes)
+        if self.error:
+            report["error"] = self.error
+        return report
+
+
+class _Phase:
+    __slots__ = ("_timings", "_name", "_start", "_children", "_token")
+
+    def __init__(self, timings: Timings, name: str) -> None:
+        self._timings = timings
+        self._name = name
+        self._children = 0.0
+
+    def __enter__(self) -> None:
+        self._token = _parent.set(self)
+        self._start = time.monotonic()
+
+    def __exit__(self, *exc) -> None:
+        end = time.monotonic()
+        _parent.reset(self._token)
+        parent = _parent.get()
+        elapsed = end - self._start
+        self._timings.record(
+            self._name, self._start, end, elapsed - self._children,
+            parent._name if parent is not None else "",
+        )
+        if parent is not None:
+            parent._children += elapsed
+
+
+def phase(name: str):
+    """Context manager timing one phase; free when timings are off."""
+    timings = _current.get()
+    if timings is None:
+        return _NOOP
+    return _Phase(timings, name)
+
+
+def count(name: str, n: int) -> None:
+    """Add n to a byte counter, e.g. request_bytes."""
+    timings = _current.get()
+    if timings is not None:
+        timings.counters[name] = timings.counters.get(name, 0) + n
+
+
+def annotate(**attributes: str) -> None:
+    """Attach attributes (backend, model, ...) to the current run."""
+    timings = _current.get()
+    if timings is not None:
+        timings.attributes.update(attributes)
+
+
+def enabled() -> bool:
+    return _current.get() is not None
+
+
+def _trace_phase(event: str) -> tuple[str, str] | None:
+    # "http11.send_request_body.started" -> ("send", "started")
+    parts = event.split(".")
+    if len(parts) != 3 or parts[1] not in _TRACE_PHASES:
+        return None
+    return _TRACE_PHASES[parts[1]], parts[2]
+
+
+class _Tracer:
+    """httpx trace extension feeding connect/TLS/send/wait phases."""
+
+    def __init__(self, timings: Timings) -> None:
+        self._timings = timings
+        self._started: dict[str, float] = {}
+
+    def __call__(self, event: str, info: dict) -> None:
+        found = _trace_phase(event)
+        if found is None:
+            return
+        name, state = found
+        if state == "started":
+            self._started[event.rsplit(".", 1)[0]] = time.monotonic()
+            return
+        start = self._started.pop(event.rsplit(".", 1)[0], None)
+        if start is not None:
+            end = time.monotonic()
+            parent = _parent.get()
+            self._timings.record(name, start, end, end - start, parent._name if parent else "")
+            if parent is not None:
+                parent._children += end - start
+
+
+def trace_extensions(asynchronous: bool = False) -> dict:
+    """Request extensions timing httpx connection phases; {} when off."""
+    timings = _current.get()
+    if timings is None:
+        return {}
+    tracer = _Tracer(timings)
+    if not asynchronous:
+        return {"trace": tracer}
+
+    async def atrace(event: str, info: dict) -> None:
+        tracer(event, info)
+
+    return {"trace": atrace}
+
+
+@contextmanager
+def collect(started: float | None = None) -> Iterator[Timings]:
+    """Install a fresh Timings for the duration of the block.
+
+    started backdates the run to an earlier time.monotonic() reading.
+    """
+    timings = Timings(started)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+        timings.finish()
+
+
+def emit(timings: Timings, target: str) -> None:
+    """Write the report: pretty JSON on stderr, or append a line to a file."""
+    report = timings.report()
+    if target in ("1", "-", "stderr", "true"):
+        print(json.dumps(report, indent=2), file=sys.stderr)
+        return
+    try:
+        with open(target, "a") as f:
+            f.write(json.dumps(report) + "\n")
+    except OSError as e:
+        print(f"Warning: failed to write timings to {target}: {e}", file=sys.stderr)
@@ -0,0 +1,142 @@
+"""Transcode generated images to smaller formats (-format webp|avif|jpeg).
+
+The APIs mostly return PNG, and a 4K slide can be 15-25 MB; a lossy WebP or
+AVIF of the same image is usually a tenth of that. The image is re-encoded
+locally after it is written, next to the original (logo.png -> logo.webp),
+and the original is removed unless keep_original is set. An image the API
+already returned in the requested format is left alone. The result cache
+and build log still see the original generation.
+
+Several images (-n, batch, deck) are encoded in parallel on a process pool,
+since encoding a 4K image takes a second or more. Requires Pillow (the
+`images` extra); AVIF needs Pillow 11.2 or later.
+"""
+
+import io
+import os
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+OUTPUT_FORMATS = {"webp": ".webp", "avif": ".avif", "jpeg": ".jpg"}
+DEFAULT_QUALITY = 85
+
+
+@dataclass
+class OutputFormat:
+    """A requested output format. Validate with check_output_format."""
+
+    format: str
+    quality: int = DEFAULT_QUALITY
+    keep_original: bool = False
+
+
+def check_output_format(fmt: str, quality: int = 0, keep_original: bool = False) -> OutputFormat:
+    """Validate -format/-quality before anything is generated.
+
+    Raises RuntimeError on an unknown format or quality, or if the installed
+    Pillow can't write the format.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise RuntimeError(f"invalid -format: {fmt} (valid: {', '.join(OUTPUT_FORMATS)})")
+    quality = quality or DEFAULT_QUALITY
+    if not 1 <= quality <= 100:
+        raise RuntimeError(f"invalid -quality: {quality} (valid: 1-100)")
+    try:
+        from PIL import features
+    except ImportError:
+        raise RuntimeError(
+            "-format requires Pillow (pip install 'nanobanana-cli[images]')"
+        ) from None
+    if fmt != "jpeg":
+        try:
+            supported = features.check_module(fmt)
+        except ValueError:
+            # Pillow before 11.2 has no AVIF support to ask about
+            supported = False
+        if not supported:
+            raise RuntimeError(f"-format {fmt} is not supported by the installed Pillow")
+    return OutputFormat(fmt, quality, keep_original)
+
+
+def transcode_file(src: str, fmt: str, quality: int, keep_original: bool = False) -> str:
+    """Re-encode the image at src as fmt next to it. Returns the new path.
+
+    Returns src unchanged if it already has fmt's extension. Runs in worker
+    processes, so it takes and returns plain values only.
+    Raises RuntimeError if the image can't be converted or written.
+    """
+    from PIL import Image
+
+    dest = str(Path(src).with_suffix(OUTPUT_FORMATS[fmt]))
+    if dest == src:
+        return src
+    try:
+        with Image.open(src) as img:
+            icc_profile = img.info.get("icc_profile")
+            if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGBA")
+                # JPEG has no alpha; flatten onto white like a browser would
+                flat = Image.new("RGB", img.size, (255, 255, 255))
+                flat.paste(img, mask=img.getchannel("A"))
+                img = flat
+            elif img.mode not in ("RGB", "RGBA", "L"):
+                img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+            buf = io.BytesIO()
+            options = {"icc_profile": icc_profile} if icc_profile else {}
+            img.save(buf, format=fmt.upper(), quality=quality, **options)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise RuntimeError(f"failed to convert {src} to {fmt}: {e}") from e
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buf.getvalue())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, dest)
+    except OSError as e:
+        Path(tmp).unlink(missing_ok=True)
+        raise RuntimeError(f"failed to write output file: {e}") from e
+    if not keep_original:
+        Path(src).unlink(missing_ok=True)
+    return dest
+
+
+def transcode_files(
+    paths: list[str],
+    output_format: OutputFormat,
+    *,
+    executor: Executor | None = None,
+) -> list[str | RuntimeError]:
+    """Transcode several images in parallel.
+
+    Uses executor if given, otherwise a temporary process pool (or none for
+    a single image). Returns the new path or the error, per image.
+    """
+    args = (output_format.format, output_format.quality, output_format.keep_original)
+    if executor is None and len(paths) == 1:
+        results: list[str | RuntimeError] = []
+        try:
+            results.append(transcode_file(paths[0], *args))
+        except RuntimeError as e:
+            results.append(e)
+        return results
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+            return transcode_files(paths, output_format, executor=pool)
+
+    futures = [executor.submit(transcode_file, path, *args) for path in paths]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except RuntimeError as e:
+            results.append(e)
+    return results
+
+
+def format_transcode(original_bytes: int, transcoded_bytes: int, fmt: str) -> str:
+    """Describe the size reduction, e.g. '18.4 MB -> 1.9 MB (webp)'."""
+    mb = 1024 * 1024
+    return f"{original_bytes / mb:.1f} MB -> {transcoded_bytes / mb:.1f} MB ({fmt})"
@@ -1,17 +1,25 @@
-"""Check PyPI for newer versions of nanobanana-cli."""
+"""Check PyPI for newer versions of nanobanana-cli.
+
+The CLI never waits on the network for this: check_for_update() only reads
+the cached result in update_check.json and, at most once per
+_CHECK_INTERVAL, starts a detached background refresher (this module run
+with -m) that queries PyPI, and with auto_update set in the config
+reinstalls the tool, then records the outcome for later invocations.
+"""
 
 import json
 import subprocess
 import sys
 import time
-import urllib.request
 from pathlib import Path
 
-from nanobanana.config import get_config_path
+from nanobanana.config import get_config_path, load_config
 
 _PYPI_URL = "https://pypi.org/pypi/nanobanana-cli/json"
 _CHECK_INTERVAL = 86400  # 24 hours
 
+_UPGRADE_HINT = "uv tool install nanobanana-cli --force --refresh"
+
 
 def _cache_path() -> Path:
     """Return path to the update check cache file."""
@@ -42,6 +50,8 @@ def _write_cache(data: dict) -> None:
 
 def _fetch_latest_version() -> str | None:
     """Fetch latest version from PyPI. Returns None on any failure."""
+    import urllib.request
+
     try:
         req = urllib.request.Request(_PYPI_URL, headers={"Accept": "application/json"})
         with urllib.request.urlopen(req, timeout=3) as resp:
@@ -55,7 +65,7 @@ def _run_upgrade() -> bool:
     """Run uv tool install --force --refresh to bypass cache. Returns True on success."""
     try:
         result = subprocess.run(
-            ["uv", "tool", "install", "nanobanana-cli", "--force", "--refresh"],
+            _UPGRADE_HINT.split(),
             capture_output=True,
             text=True,
             timeout=120,
@@ -65,48 +75,84 @@ def _run_upgrade() -> bool:
         return False
 
 
-def check_for_update(current_version: str, *, auto_update: bool = False) -> str | None:
-    """Check if a newer version is available on PyPI.
+def _refresh_due(cache: dict) -> bool:
+    last = max(cache.get("last_check", 0), cache.get("last_attempt", 0))
+    return time.time() - last >= _CHECK_INTERVAL
+
+
+def _spawn_refresh(current_version: str) -> None:
+    """Start the refresher detached, so it outlives this process silently."""
+    kwargs: dict = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = (
+            subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        )
+    else:
+        kwargs["start_new_session"] = True
+    try:
+        subprocess.Popen(
+            [sys.executable, "-m", "nanobanana.update_check", current_version],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **kwargs,
+        )
+    except OSError:
+        pass
+
+
+def refresh(current_version: str) -> None:
+    """Query PyPI, auto-update if configured, and record the result.
 
-    If auto_update is True, automatically runs uv tool upgrade.
-    Otherwise returns an update hint string.
-    Returns None if up to date / check skipped. Never raises.
+    Runs in the background refresher; may block for minutes.
+    """
+    latest = _fetch_latest_version()
+    cache = {"last_check": time.time(), "latest_version": latest}
+    try:
+        file_config = load_config()
+    except RuntimeError:
+        file_config = None
+    if latest and latest != current_version and file_config and file_config.auto_update:
+        if _run_upgrade():
+            cache["installed_version"] = latest
+        else:
+            cache["upgrade_failed"] = latest
+    _write_cache(cache)
+
+
+def check_for_update(current_version: str) -> str | None:
+    """Return an update hint from the cached check result, if any.
+
+    Starts a background refresh when the cached result is stale. Returns
+    None if up to date / check skipped. Never raises, never blocks on the
+    network.
     """
     if current_version == "dev":
         return None
 
     try:
         cache = _read_cache()
-        last_check = cache.get("last_check", 0)
-
-        if time.time() - last_check < _CHECK_INTERVAL:
-            # Use cached result
-            latest = cache.get("latest_version")
-        else:
-            latest = _fetch_latest_version()
-            _write_cache({
-                "last_check": time.time(),
-                "latest_version": latest,
-            })
-
-        if latest and latest != current_version:
-            if auto_update:
-                print(
-                    f"Updating nanobanana-cli: {current_version} \u2192 {latest}...",
-                    file=sys.stderr,
-                )
-                if _run_upgrade():
-                    return f"Updated to {latest}. Restart to use the new version."
-                else:
-                    return (
-                        f"Auto-update failed. Run manually:\n"
-                        f"  uv tool install nanobanana-cli --force --refresh"
-                    )
-            return (
-                f"Update available: {current_version} \u2192 {latest}\n"
-                f"Run: uv tool install nanobanana-cli --force --refresh"
-            )
+        if _refresh_due(cache):
+            _write_cache({**cache, "last_attempt": time.time()})
+            _spawn_refresh(current_version)
+
+        latest = cache.get("latest_version")
+        if not latest or latest == current_version:
+            return None
+        if cache.get("installed_version") == latest:
+            return f"Updated to {latest}. Restart to use the new version."
+        if cache.get("upgrade_failed") == latest:
+            return f"Auto-update failed. Run manually:\n  {_UPGRADE_HINT}"
+        return (
+            f"Update available: {current_version} → {latest}\n"
+            f"Run: {_UPGRADE_HINT}"
+        )
     except Exception:
         pass
 
     return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2:
+        refresh(sys.argv[1])
@@ -10,38 +10,79 @@ import pytest
 from nanobanana.mime import mime_from_extension
 
 
+def _request_json(body) -> dict:
+    data = b"".join(body)
+    assert len(data) == body.content_length
+    return json.loads(data)
+
+
 def test_openrouter_data_url_building(tmp_path: Path) -> None:
     """Verify data URL construction for OpenRouter image uploads."""
-    from nanobanana.openrouter import _load_image_as_data_url
+    from nanobanana.openrouter import _RequestBody
 
     # Create a small test image file
     test_file = tmp_path / "test.png"
     test_data = b"\x89PNG\r\n\x1a\nfake"
     test_file.write_bytes(test_data)
 
-    data_url = _load_image_as_data_url(str(test_file))
+    body = _RequestBody("m", "a cat", [str(test_file)], "1:1", "1K")
+    parts = _request_json(body)["messages"][0]["content"]
+    data_url = parts[0]["image_url"]["url"]
 
     assert data_url.startswith("data:image/png;base64,")
     # Verify the base64 payload decodes back
     b64_part = data_url.split(",", 1)[1]
     assert base64.b64decode(b64_part) == test_data
+    assert parts[1] == {"type": "text", "text": "a cat"}
 
 
 def test_openrouter_data_url_jpeg(tmp_path: Path) -> None:
     test_file = tmp_path / "photo.jpg"
     test_file.write_bytes(b"\xff\xd8\xff\xe0fake")
 
-    from nanobanana.openrouter import _load_image_as_data_url
+    from nanobanana.openrouter import _RequestBody
 
-    data_url = _load_image_as_data_url(str(test_file))
+    body = _RequestBody("m", "x", [str(test_file)], "1:1", "1K")
+    data_url = _request_json(body)["messages"][0]["content"][0]["image_url"]["url"]
     assert data_url.startswith("data:image/jpeg;base64,")
 
 
 def test_openrouter_load_missing_file() -> None:
-    from nanobanana.openrouter import _load_image_as_data_url
+    from nanobanana.openrouter import _RequestBody
 
     with pytest.raises(RuntimeError, match="failed to read image"):
-        _load_image_as_data_url("/nonexistent/file.png")
+        _RequestBody("m", "x", ["/nonexistent/file.png"], "1:1", "1K")
+
+
+def test_openrouter_body_streams_inputs(tmp_path: Path) -> None:
+    """Large inputs are encoded chunk by chunk, never held whole."""
+    import tracemalloc
+
+    from nanobanana.openrouter import _RequestBody
+
+    inputs = []
+    for i in range(2):
+        path = tmp_path / f"ref{i}.jpg"
+        path.write_bytes(bytes([i]) * (8 * 1024 * 1024))
+        inputs.append(str(path))
+    prompt = 'quote " backslash \\ and a fake "nanobanana-input-0"'
+
+    tracemalloc.start()
+    try:
+        body = _RequestBody("m", prompt, inputs, "16:9", "4K")
+        total = sum(len(chunk) for chunk in body)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert total == body.content_length
+    assert peak < 4 * 1024 * 1024, f"peak {peak} bytes"
+
+    payload = _request_json(body)
+    parts = payload["messages"][0]["content"]
+    assert parts[2]["text"] == prompt
+    assert payload["image_config"] == {"aspectRatio": "16:9", "imageSize": "4K"}
+    b64 = parts[1]["image_url"]["url"].split(",", 1)[1]
+    assert base64.b64decode(b64) == Path(inputs[1]).read_bytes()
 
 
 def test_gemini_load_missing_file() -> None:
@@ -0,0 +1,268 @@
+"""Tests for batch manifest loading and concurrent execution — no network calls."""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from nanobanana.batch import BatchJob, _rerun_may_help, _run_jobs, load_manifest, run_batch
+from nanobanana.cli import _extract_subcommand, build_parser
+from nanobanana.config import APIConfig, FileConfig
+from nanobanana.retry import APIError
+
+
+def _write_jsonl(path: Path, rows: list[dict]) -> Path:
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+    return path
+
+
+class TestManifestLoading:
+    """Tests for JSONL/CSV parsing and up-front validation."""
+
+    def test_jsonl_applies_command_defaults(self, tmp_path: Path) -> None:
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [
+            {"command": "dashboard", "prompt": "MRR and churn", "output": "dash.png"},
+        ])
+        [job] = load_manifest(str(manifest))
+        assert job.aspect == "16:9"
+        assert job.size == "2K"
+        assert "MRR and churn" in job.prompt
+        assert "TASK" in job.prompt
+        assert job.output == str(tmp_path / "dash.png")
+
+    def test_slide_template_rendered(self, tmp_path: Path) -> None:
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [
+            {"command": "slide", "template": "funnel", "prompt": "our funnel", "size": "4K"},
+        ])
+        [job] = load_manifest(str(manifest))
+        assert "Funnel Diagnostic" in job.prompt
+        assert "4K resolution" in job.prompt
+        assert job.label == "slide (funnel)"
+
+    def test_free_prompt_and_default_output(self, tmp_path: Path) -> None:
+        manifest = _write_jsonl(tmp_path / "nightly.jsonl", [
+            {"prompt": "a cute cat"},
+            {"prompt": "a cute dog"},
+        ])
+        jobs = load_manifest(str(manifest))
+        assert [j.prompt for j in jobs] == ["a cute cat", "a cute dog"]
+        assert jobs[1].output == str(tmp_path / "nightly_002")
+
+    def test_inputs_resolved_against_manifest_dir(self, tmp_path: Path) -> None:
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [
+            {"prompt": "x", "inputs": ["template.jpg", "logo.png"]},
+        ])
+        [job] = load_manifest(str(manifest))
+        assert job.inputs == [str(tmp_path / "template.jpg"), str(tmp_path / "logo.png")]
+
+    def test_csv_manifest(self, tmp_path: Path) -> None:
+        manifest = tmp_path / "jobs.csv"
+        manifest.write_text(
+            "command,prompt,inputs,aspect,output\n"
+            "social,launch post,a.png;b.png,9:16,post.png\n"
+        )
+        [job] = load_manifest(str(manifest))
+        assert job.line == 2
+        assert job.aspect == "9:16"
+        assert job.size == "2K"
+        assert job.inputs == [str(tmp_path / "a.png"), str(tmp_path / "b.png")]
+
+    def test_file_config_used_without_command_default(self, tmp_path: Path) -> None:
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [{"prompt": "x"}])
+        [job] = load_manifest(str(manifest), FileConfig(aspect="4:3"))
+        # generate's own default (1:1) wins, as on the CLI
+        assert job.aspect == "1:1"
+
+    @pytest.mark.parametrize(
+        "row, match",
+        [
+            ({"command": "nope", "prompt": "x"}, "unknown command"),
+            ({"command": "slide", "template": "nope", "prompt": "x"}, "unknown slide template"),
+            ({"command": "icon", "template": "funnel", "prompt": "x"}, "only valid with the slide"),
+            ({"prompt": ""}, "no prompt"),
+            ({"prompt": "x", "aspect": "7:3"}, "invalid aspect ratio"),
+            ({"prompt": "x", "size": "8K"}, "invalid size"),
+            ({"prompt": "x", "colour": "red"}, "unknown fields"),
+        ],
+    )
+    def test_invalid_rows_report_line(self, tmp_path: Path, row: dict, match: str) -> None:
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [{"prompt": "ok"}, row])
+        with pytest.raises(RuntimeError, match=f"manifest line 2: .*{match}"):
+            load_manifest(str(manifest))
+
+    def test_duplicate_outputs_rejected(self, tmp_path: Path) -> None:
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [
+            {"prompt": "a", "output": "same.png"},
+            {"prompt": "b", "output": "same.jpg"},
+        ])
+        with pytest.raises(RuntimeError, match="already used on line 1"):
+            load_manifest(str(manifest))
+
+    def test_missing_output_dir_rejected(self, tmp_path: Path) -> None:
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [
+            {"prompt": "a", "output": "a.png"},
+            {"prompt": "b", "output": "renders/b.png"},
+        ])
+        with pytest.raises(RuntimeError, match=f"manifest line 2: output directory {tmp_path / 'renders'} "
+                                               "does not exist"):
+            load_manifest(str(manifest))
+        (tmp_path / "renders").mkdir()
+        assert len(load_manifest(str(manifest))) == 2
+
+    def test_empty_manifest(self, tmp_path: Path) -> None:
+        manifest = tmp_path / "jobs.jsonl"
+        manifest.write_text("# nothing yet\n\n")
+        with pytest.raises(RuntimeError, match="no jobs"):
+            load_manifest(str(manifest))
+
+
+class TestRunJobs:
+    """Tests for bounded-concurrency execution with a fake backend."""
+
+    def _patch_openrouter(self, monkeypatch, delay: float, fail_prompts=()) -> dict:
+        stats = {"inflight": 0, "peak": 0, "calls": 0}
+
+        async def fake_generate(client, *, api_key, model, prompt, input_images,
+                                aspect_ratio, image_size, output_for_mime, retry=None):
+            stats["calls"] += 1
+            stats["inflight"] += 1
+            stats["peak"] = max(stats["peak"], stats["inflight"])
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                stats["inflight"] -= 1
+            if prompt in fail_prompts:
+                raise RuntimeError("HTTP error: 500")
+            output_path = output_for_mime("image/jpeg")
+            Path(output_path).write_bytes(prompt.encode())
+            return output_path, "image/jpeg"
+
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", fake_generate)
+        return stats
+
+    def test_concurrency_is_bounded(self, tmp_path: Path, monkeypatch) -> None:
+        stats = self._patch_openrouter(monkeypatch, delay=0.02)
+        jobs = [
+            BatchJob(line=i, prompt=f"p{i}", output=str(tmp_path / f"out{i}.png"))
+            for i in range(10)
+        ]
+        api = APIConfig(use_openrouter=True, api_key="k", model="m")
+        failures = asyncio.run(_run_jobs(jobs, api, concurrency=3))
+        assert failures == 0
+        assert stats["calls"] == 10
+        assert stats["peak"] == 3
+        # Extension corrected to match returned MIME type
+        assert (tmp_path / "out7.jpg").read_bytes() == b"p7"
+
+    def test_failures_do_not_stop_other_jobs(self, tmp_path: Path, monkeypatch, capsys) -> None:
+        self._patch_openrouter(monkeypatch, delay=0, fail_prompts={"p1"})
+        jobs = [
+            BatchJob(line=i + 1, prompt=f"p{i}", output=str(tmp_path / f"out{i}"))
+            for i in range(3)
+        ]
+        api = APIConfig(use_openrouter=True, api_key="k", model="m")
+        failures = asyncio.run(_run_jobs(jobs, api, concurrency=2))
+        assert failures == 1
+        assert (tmp_path / "out0.jpg").exists()
+        assert (tmp_path / "out2.jpg").exists()
+        assert "FAILED line 2" in capsys.readouterr().err
+
+    def test_run_batch_raises_on_failures(self, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        self._patch_openrouter(monkeypatch, delay=0, fail_prompts={"bad"})
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [
+            {"prompt": "good"}, {"prompt": "bad"},
+        ])
+        with pytest.raises(RuntimeError, match="1 of 2 jobs failed"):
+            run_batch(str(manifest), concurrency=2)
+        assert (tmp_path / "jobs_001.jpg").read_bytes() == b"good"
+
+    @pytest.mark.parametrize("error, helps", [
+        (RuntimeError("HTTP error: 500"), True),
+        (APIError("overloaded", status_code=503, retryable=True), True),
+        (APIError("rate limited", status_code=429, retryable=True), True),
+        (APIError("HTTP error: 401", status_code=401), True),  # after fixing the key
+        (APIError("HTTP error: 400", status_code=400), False),
+        (OSError("disk full"), False),
+    ])
+    def test_rerun_may_help(self, error: Exception, helps: bool) -> None:
+        assert _rerun_may_help(error) is helps
+        wrapped = RuntimeError("failed to write output file")
+        wrapped.__cause__ = FileNotFoundError()
+        assert not _rerun_may_help(wrapped)
+
+    def test_cache_hits_skip_requests(self, tmp_path: Path, monkeypatch, capsys) -> None:
+        from nanobanana.cache import ResultCache
+
+        stats = self._patch_openrouter(monkeypatch, delay=0)
+        cache = ResultCache(root=tmp_path / "cache")
+        api = APIConfig(use_openrouter=True, api_key="k", model="m")
+
+        def jobs(suffix: str) -> list[BatchJob]:
+            return [
+                BatchJob(line=i, prompt=f"p{i}", aspect="1:1", size="1K",
+                         output=str(tmp_path / f"{suffix}{i}"))
+                for i in range(3)
+            ]
+
+        asyncio.run(_run_jobs(jobs("a"), api, concurrency=2, cache=cache))
+        asyncio.run(_run_jobs(jobs("b"), api, concurrency=2, cache=cache))
+        assert stats["calls"] == 3
+        assert (tmp_path / "b1.jpg").read_bytes() == b"p1"
+        assert "cached" in capsys.readouterr().out
+
+        asyncio.run(_run_jobs(jobs("c"), api, concurrency=2, cache=cache, refresh=True))
+        assert stats["calls"] == 6
+
+    def test_output_used_as_input_waits(self, tmp_path: Path, monkeypatch) -> None:
+        seen: dict[str, list[str]] = {}
+
+        async def fake_generate(client, *, prompt, input_images, output_for_mime, **kwargs):
+            seen[prompt] = [Path(p).read_bytes().decode() for p in input_images]
+            await asyncio.sleep(0.01 if prompt == "template" else 0)
+            output_path = output_for_mime("image/jpeg")
+            Path(output_path).write_bytes(prompt.encode())
+            return output_path, "image/jpeg"
+
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", fake_generate)
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [
+            {"prompt": "slide", "inputs": ["template.png"], "output": "slide.png"},
+            {"prompt": "template", "output": "template.png"},
+        ])
+        jobs = load_manifest(str(manifest))
+        api = APIConfig(use_openrouter=True, api_key="k", model="m")
+        assert asyncio.run(_run_jobs(jobs, api, concurrency=2)) == 0
+        # Waited for the template, and read it under the extension the API chose
+        assert seen["slide"] == ["template"]
+        assert jobs[0].inputs == [str(tmp_path / "template.jpg")]
+
+    def test_input_cycle_rejected(self, tmp_path: Path) -> None:
+        manifest = _write_jsonl(tmp_path / "jobs.jsonl", [
+            {"prompt": "a", "inputs": ["b.png"], "output": "a.png"},
+            {"prompt": "b", "inputs": ["a.png"], "output": "b.png"},
+        ])
+        with pytest.raises(RuntimeError, match="manifest line 2: input cycle with line 1"):
+            load_manifest(str(manifest))
+
+    def test_invalid_concurrency(self, tmp_path: Path) -> None:
+        with pytest.raises(RuntimeError, match="invalid concurrency"):
+            run_batch(str(tmp_path / "jobs.jsonl"), concurrency=0)
+
+
+class TestBatchCommand:
+    """Tests for batch subcommand routing."""
+
+    def test_batch_extracted_with_concurrency(self) -> None:
+        cmd, rest = _extract_subcommand(["-concurrency", "8", "batch", "jobs.jsonl"])
+        assert cmd == "batch"
+        args = build_parser().parse_args(rest)
+        assert args.concurrency == 8
+        assert args.prompt == ["jobs.jsonl"]
+
+    def test_default_concurrency(self) -> None:
+        args = build_parser().parse_args(["jobs.jsonl"])
+        assert args.concurrency == 4
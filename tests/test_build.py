@@ -0,0 +1,127 @@
+"""Tests for make-style incremental rebuilds of batch and deck outputs."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from nanobanana.batch import run_batch
+from nanobanana.build import BUILD_FILENAME, BuildLog
+from nanobanana.config import APIConfig
+from nanobanana.deck import run_deck
+
+API = APIConfig(use_openrouter=True, api_key="k", model="m")
+
+
+def _fingerprint(log: BuildLog, inputs: list[str] = (), prompt: str = "p") -> dict:
+    return log.fingerprint(API, prompt=prompt, template="t", input_images=list(inputs),
+                           aspect="1:1", size="1K")
+
+
+class TestBuildLog:
+    """Tests for recording and matching outputs."""
+
+    def test_round_trip(self, tmp_path: Path) -> None:
+        (tmp_path / "out.jpg").write_bytes(b"image")
+        log = BuildLog(tmp_path)
+        log.record(str(tmp_path / "out.jpg"), _fingerprint(log))
+        log.save()
+
+        log = BuildLog(tmp_path)
+        # Matched by name without extension, as outputs are named before the API picks one
+        assert log.current(str(tmp_path / "out.png"), _fingerprint(log)) == str(tmp_path / "out.jpg")
+        assert log.skipped == ["out"]
+        assert json.loads((tmp_path / BUILD_FILENAME).read_text())["outputs"]["out"]["output"] == "out.jpg"
+
+    def test_changes_make_output_stale(self, tmp_path: Path) -> None:
+        (tmp_path / "out.jpg").write_bytes(b"image")
+        (tmp_path / "in.png").write_bytes(b"v1")
+        log = BuildLog(tmp_path)
+        log.record(str(tmp_path / "out.jpg"), _fingerprint(log, [str(tmp_path / "in.png")]))
+
+        assert not log.current(str(tmp_path / "out"), _fingerprint(log, [str(tmp_path / "in.png")], "edited"))
+        (tmp_path / "in.png").write_bytes(b"v2")
+        assert not log.current(str(tmp_path / "out"), _fingerprint(log, [str(tmp_path / "in.png")]))
+        (tmp_path / "in.png").write_bytes(b"v1")
+        assert log.current(str(tmp_path / "out"), _fingerprint(log, [str(tmp_path / "in.png")]))
+        (tmp_path / "out.jpg").unlink()
+        assert not log.current(str(tmp_path / "out"), _fingerprint(log, [str(tmp_path / "in.png")]))
+
+    def test_model_is_part_of_fingerprint(self, tmp_path: Path) -> None:
+        log = BuildLog(tmp_path)
+        other = log.fingerprint(APIConfig(use_openrouter=True, api_key="k", model="other"),
+                                prompt="p", template="t", input_images=[], aspect="1:1", size="1K")
+        assert other != _fingerprint(log)
+
+    def test_unreadable_log_ignored(self, tmp_path: Path) -> None:
+        (tmp_path / BUILD_FILENAME).write_text("{not json")
+        assert BuildLog(tmp_path).outputs == {}
+
+
+class TestRebuilds:
+    """Tests for rerunning manifests and decks with a fake backend."""
+
+    @pytest.fixture
+    def calls(self, tmp_path: Path, monkeypatch) -> list[str]:
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        calls: list[str] = []
+
+        async def fake_generate(client, *, prompt, input_images, output_for_mime, **kwargs):
+            calls.append(prompt)
+            output_path = output_for_mime("image/png")
+            data = prompt + "".join(Path(p).read_text() for p in input_images)
+            Path(output_path).write_text(data)
+            return output_path, "image/png"
+
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", fake_generate)
+        return calls
+
+    def test_batch_skips_up_to_date_outputs(self, tmp_path: Path, calls: list[str], capsys) -> None:
+        manifest = tmp_path / "jobs.jsonl"
+
+        def write(prompts: list[str]) -> None:
+            manifest.write_text("".join(
+                json.dumps({"prompt": p, "output": f"out{i}.png"}) + "\n" for i, p in enumerate(prompts)
+            ))
+
+        write(["a", "b", "c"])
+        run_batch(str(manifest), use_cache=False)
+        assert sorted(calls) == ["a", "b", "c"]
+
+        write(["a", "B", "c"])
+        capsys.readouterr()
+        run_batch(str(manifest), use_cache=False)
+        assert sorted(calls) == ["B", "a", "b", "c"]
+        out = capsys.readouterr().out
+        assert out.count(", up to date)") == 2
+        assert "3 succeeded (2 up to date), 0 failed" in out
+
+        run_batch(str(manifest), use_cache=False, refresh=True)
+        assert len(calls) == 7
+
+    def test_deck_rebuilds_dependents_of_changed_template(self, tmp_path: Path, calls: list[str]) -> None:
+        deck = tmp_path / "deck.md"
+
+        def write(template_prompt: str, title: str) -> None:
+            deck.write_text("```\n"
+                            f'nanobanana -o template.png "{template_prompt}"\n'
+                            f'nanobanana -i template.png -o title.png "{title}"\n'
+                            'nanobanana -o other.png "unrelated"\n'
+                            "```\n")
+
+        write("brand", "title")
+        run_deck(str(deck), use_cache=False)
+        assert len(calls) == 3
+
+        write("brand", "new title")
+        run_deck(str(deck), use_cache=False)
+        assert calls[3:] == ["new title"]
+
+        write("rebrand", "new title")
+        run_deck(str(deck), use_cache=False)
+        # The title's input changed, so it is regenerated too
+        assert calls[4:] == ["rebrand", "new title"]
+        assert (tmp_path / "title.png").read_text() == "new titlerebrand"
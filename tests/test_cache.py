@@ -0,0 +1,142 @@
+"""Tests for the content-addressed result cache."""
+
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from nanobanana.cache import ResultCache, cache_key, get_cache_dir, key_for, open_cache
+from nanobanana.config import APIConfig, FileConfig
+
+
+def _key(**overrides) -> str:
+    params = {
+        "backend": "gemini",
+        "model": "m",
+        "prompt": "a cat",
+        "input_images": [],
+        "aspect": "1:1",
+        "size": "1K",
+    }
+    params.update(overrides)
+    return cache_key(**params)
+
+
+class TestCacheKey:
+    """Tests for request hashing."""
+
+    def test_stable(self) -> None:
+        assert _key() == _key()
+
+    @pytest.mark.parametrize(
+        "field, value",
+        [
+            ("backend", "openrouter"),
+            ("model", "other"),
+            ("prompt", "a dog"),
+            ("aspect", "16:9"),
+            ("size", "2K"),
+        ],
+    )
+    def test_every_field_changes_key(self, field: str, value: str) -> None:
+        assert _key(**{field: value}) != _key()
+
+    def test_inputs_hashed_by_content(self, tmp_path: Path) -> None:
+        a = tmp_path / "a.png"
+        b = tmp_path / "renamed.png"
+        a.write_bytes(b"same")
+        b.write_bytes(b"same")
+        assert _key(input_images=[str(a)]) == _key(input_images=[str(b)])
+        b.write_bytes(b"different")
+        assert _key(input_images=[str(a)]) != _key(input_images=[str(b)])
+
+    def test_missing_input_raises(self) -> None:
+        with pytest.raises(RuntimeError, match="failed to read image"):
+            _key(input_images=["/nonexistent/file.png"])
+
+    def test_key_for_uses_backend_model(self) -> None:
+        gemini = APIConfig(use_openrouter=False, api_key="k")
+        openrouter = APIConfig(use_openrouter=True, api_key="k", model="google/x")
+        args = {"prompt": "p", "input_images": [], "aspect": "1:1", "size": "1K"}
+        assert key_for(gemini, **args) != key_for(openrouter, **args)
+        # API key is not part of the key
+        assert key_for(gemini, **args) == key_for(APIConfig(api_key="other"), **args)
+
+
+class TestResultCache:
+    """Tests for storage, statistics and LRU eviction."""
+
+    def test_miss_then_hit(self, tmp_path: Path) -> None:
+        cache = ResultCache(root=tmp_path)
+        assert cache.get("ab" * 32) is None
+        cache.put("ab" * 32, b"\x89PNG\nbytes", "image/png")
+        assert cache.get("ab" * 32) == (b"\x89PNG\nbytes", "image/png")
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["stores"] == 1
+        assert stats["entries"] == 1
+
+    def test_truncated_entry_is_miss(self, tmp_path: Path) -> None:
+        cache = ResultCache(root=tmp_path)
+        key = "cd" * 32
+        cache.put(key, b"data", "image/png")
+        next(tmp_path.glob("*/*.img")).write_bytes(b"image/png")
+        assert cache.get(key) is None
+        assert cache.stats()["entries"] == 0
+
+    def test_evicts_least_recently_used(self, tmp_path: Path) -> None:
+        cache = ResultCache(root=tmp_path, max_bytes=250)
+        for i, key in enumerate(["aa" * 32, "bb" * 32]):
+            cache.put(key, b"x" * 100, "image/png")
+            path = cache._entry_path(key)
+            os.utime(path, (1000 + i, 1000 + i))
+        # Touch the older entry so the newer one becomes least recently used
+        assert cache.get("aa" * 32) is not None
+        cache.put("cc" * 32, b"x" * 100, "image/png")
+        assert cache.get("bb" * 32) is None
+        assert cache.get("aa" * 32) is not None
+        assert cache.get("cc" * 32) is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_clear(self, tmp_path: Path) -> None:
+        cache = ResultCache(root=tmp_path)
+        cache.put("ab" * 32, b"data", "image/png")
+        assert cache.clear() == 1
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["hits"] == 0
+
+    def test_concurrent_stats_not_lost(self, tmp_path: Path) -> None:
+        cache = ResultCache(root=tmp_path)
+
+        def bump() -> None:
+            for _ in range(25):
+                cache._bump_stats(hits=1)
+
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert cache.stats()["hits"] == 200
+        assert not list(tmp_path.glob("*.tmp"))
+
+
+class TestCacheConfig:
+    """Tests for cache location and config switches."""
+
+    def test_xdg_cache_home(self, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        assert get_cache_dir() == tmp_path / "nanobanana"
+
+    def test_disabled_by_config(self) -> None:
+        assert open_cache(FileConfig(cache=False)) is None
+
+    def test_max_size_from_config(self) -> None:
+        cache = open_cache(FileConfig(cache_max_mb=5))
+        assert cache is not None
+        assert cache.max_bytes == 5 * 1024 * 1024
+
+    def test_enabled_without_config(self) -> None:
+        assert open_cache(None) is not None
@@ -0,0 +1,109 @@
+"""Tests for -n candidate generation against the benchmark stand-in server."""
+
+import importlib.util
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from nanobanana import cli
+from nanobanana.candidates import candidate_path, check_candidates
+
+_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "mock_server.py"
+_spec = importlib.util.spec_from_file_location("mock_server", _PATH)
+mock_server = importlib.util.module_from_spec(_spec)
+sys.modules.setdefault("mock_server", mock_server)
+_spec.loader.exec_module(mock_server)
+
+
+@pytest.fixture
+def server(tmp_path: Path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("NANOBANANA_NO_DAEMON", "1")
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+    monkeypatch.setattr("nanobanana.retry.time.sleep", lambda s: None)
+    with mock_server.serve() as server:
+        for name, value in server.env().items():
+            monkeypatch.setenv(name, value)
+        yield server
+
+
+@pytest.fixture
+def reference(tmp_path: Path) -> str:
+    path = tmp_path / "ref.png"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4)
+    return str(path)
+
+
+class TestNaming:
+    """Tests for numbered and collision-free output names."""
+
+    def test_candidate_path(self) -> None:
+        assert candidate_path("logo.png", 0, "image/png") == "logo-1.png"
+        assert candidate_path("out/logo.png", 2, "image/jpeg") == "out/logo-3.jpg"
+
+    @pytest.mark.parametrize("n", [0, -1, 9])
+    def test_invalid_count(self, n: int) -> None:
+        with pytest.raises(RuntimeError, match="invalid -n"):
+            check_candidates(n)
+
+    def test_default_name_skips_existing(self, tmp_path: Path, monkeypatch) -> None:
+        class Frozen(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime(2026, 1, 2, 3, 4, 5)
+
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr("nanobanana.cli.datetime", Frozen)
+        assert cli.default_output_stem() == "image_20260102_030405"
+        (tmp_path / "image_20260102_030405.png").write_bytes(b"")
+        assert cli.default_output_stem() == "image_20260102_030405_2"
+        (tmp_path / "image_20260102_030405_2-1.jpg").write_bytes(b"")
+        assert cli.default_output_stem() == "image_20260102_030405_3"
+
+
+class TestCLI:
+    """Tests for nanobanana -n N end to end."""
+
+    def test_openrouter_encodes_inputs_once(self, server, reference: str, monkeypatch) -> None:
+        from nanobanana import openrouter
+
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        reads: list[str] = []
+        iter_base64 = openrouter._iter_base64
+
+        def counting(path: str, size: int):
+            reads.append(path)
+            return iter_base64(path, size)
+
+        monkeypatch.setattr(openrouter, "_iter_base64", counting)
+        cli.run(["-n", "3", "-i", reference, "-o", "logo.png", "a logo"])
+        assert server.counts["requests"] == 3
+        assert reads == [reference]
+        for i in (1, 2, 3):
+            assert Path(f"logo-{i}.png").read_bytes() == mock_server.synthetic_image("1K")
+
+    def test_gemini_reads_inputs_once(self, server, reference: str, monkeypatch) -> None:
+        from nanobanana import gemini
+
+        monkeypatch.setenv("GEMINI_API_KEY", "k")
+        reads: list[str] = []
+        read_input = gemini._read_input
+        monkeypatch.setattr(gemini, "_read_input", lambda path: reads.append(path) or read_input(path))
+        cli.run(["-n", "2", "-i", reference, "a logo"])
+        assert server.counts["requests"] == 2
+        assert reads == [reference]
+        assert len(list(Path().glob("image_*-[12].png"))) == 2
+
+    def test_failures_reported(self, server, capsys, monkeypatch) -> None:
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        server.error_rate = 1.0
+        server.error_status = 400
+        with pytest.raises(RuntimeError, match="3 of 3 candidates failed"):
+            cli.run(["-n", "3", "-o", "logo.png", "a logo"])
+        assert capsys.readouterr().err.count("Failed:") == 3
+        assert list(Path().glob("logo*")) == []
@@ -2,15 +2,23 @@
 
 import json
 import os
+import stat
+import sys
+import time
 
 import pytest
 
 from nanobanana.config import (
+    OPENROUTER_DEFAULT_MODEL,
     VALID_ASPECT_RATIOS,
     VALID_SIZES,
+    APIConfig,
     FileConfig,
     _run_key_command,
+    invalidate_cached_key,
+    is_auth_error,
     load_config,
+    resolve_alternate,
     resolve_config,
 )
 
@@ -239,3 +247,142 @@ def test_load_config_with_key_command(tmp_path, monkeypatch: pytest.MonkeyPatch)
     fc = load_config()
     assert fc is not None
     assert fc.key_command == "op read 'op://API Keys/OpenRouter/credential'"
+
+
+# --- key_command cache ---
+
+@pytest.fixture
+def key_cache(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    counter = tmp_path / "runs"
+    # Appends a line per run so tests can count shell invocations
+    return f"echo x >> {counter} && echo secret-$(wc -l < {counter} | tr -d ' ')", counter
+
+
+def test_key_cache_disabled_by_default(key_cache) -> None:
+    command, counter = key_cache
+    assert _run_key_command(command) == "secret-1"
+    assert _run_key_command(command) == "secret-2"
+
+
+def test_key_cache_reuses_within_ttl(key_cache, tmp_path) -> None:
+    command, counter = key_cache
+    assert _run_key_command(command, 300) == "secret-1"
+    assert _run_key_command(command, 300) == "secret-1"
+    assert len(counter.read_text().splitlines()) == 1
+    path = tmp_path / "run" / "nanobanana" / "keys.json"
+    assert command not in path.read_text()
+    if sys.platform != "win32":
+        assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+
+def test_key_cache_expires(key_cache, monkeypatch: pytest.MonkeyPatch) -> None:
+    command, _ = key_cache
+    assert _run_key_command(command, 60) == "secret-1"
+    later = time.time() + 61
+    monkeypatch.setattr("nanobanana.config.time.time", lambda: later)
+    assert _run_key_command(command, 60) == "secret-2"
+
+
+def test_key_cache_invalidated(key_cache) -> None:
+    command, _ = key_cache
+    assert _run_key_command(command, 300) == "secret-1"
+    invalidate_cached_key("other-key")
+    assert _run_key_command(command, 300) == "secret-1"
+    invalidate_cached_key("secret-1")
+    assert _run_key_command(command, 300) == "secret-2"
+    invalidate_cached_key()
+    assert _run_key_command(command, 300) == "secret-3"
+
+
+def test_key_cache_ttl_validated() -> None:
+    with pytest.raises(RuntimeError, match="invalid key_cache_ttl"):
+        _run_key_command("echo k", "1h")
+
+
+@pytest.mark.parametrize(
+    "status, message, expected",
+    [
+        (401, "HTTP error: 401", True),
+        (400, "request failed: 400 INVALID_ARGUMENT. API key not valid.", True),
+        (400, "request failed: invalid aspect ratio", False),
+        (403, "file not found", False),
+        (None, "API key not valid", False),
+    ],
+)
+def test_is_auth_error(status, message: str, expected: bool) -> None:
+    error = RuntimeError(message)
+    error.status_code = status
+    assert is_auth_error(error) is expected
+
+
+def test_cli_401_invalidates_cache(key_cache, tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from nanobanana import cli
+    from nanobanana.retry import APIError
+
+    command, _ = key_cache
+    config_dir = tmp_path / "config" / "nanobanana"
+    config_dir.mkdir(parents=True)
+    (config_dir / "config.json").write_text(json.dumps({
+        "api": "openrouter", "key_command": command, "key_cache_ttl": 300,
+    }))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("NANOBANANA_NO_DAEMON", "1")
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    keys: list[str] = []
+
+    def rejected(**kwargs):
+        keys.append(kwargs["api_key"])
+        raise APIError("HTTP error: 401", status_code=401)
+
+    monkeypatch.setattr("nanobanana.openrouter.generate_image_to_file", rejected)
+    monkeypatch.setattr(sys, "argv", ["nanobanana", "-no-cache", "-o", str(tmp_path / "out.png"), "a cat"])
+    for _ in range(2):
+        with pytest.raises(SystemExit):
+            cli.main()
+    assert keys == ["secret-1", "secret-2"]
+
+
+# --- Alternate backend for hedging/failover ---
+
+def test_alternate_openrouter_for_gemini() -> None:
+    primary = APIConfig(api_key="g-key")
+    alternate = resolve_alternate(primary, None, env={"OPENROUTER_API_KEY": "or-key"})
+    assert alternate == APIConfig(use_openrouter=True, api_key="or-key", model=OPENROUTER_DEFAULT_MODEL)
+
+
+def test_alternate_gemini_for_default_openrouter_model() -> None:
+    primary = APIConfig(use_openrouter=True, api_key="or-key", model=OPENROUTER_DEFAULT_MODEL)
+    alternate = resolve_alternate(primary, None, env={"GEMINI_API_KEY": "g-key"})
+    assert alternate == APIConfig(use_openrouter=False, api_key="g-key")
+
+
+def test_alternate_none_for_other_openrouter_model() -> None:
+    primary = APIConfig(use_openrouter=True, api_key="or-key", model="openai/gpt-image-1")
+    assert resolve_alternate(primary, None, env={"GEMINI_API_KEY": "g-key"}) is None
+
+
+def test_alternate_from_key_command() -> None:
+    """Config keys serve the alternate when their api names it, e.g. -model picked OpenRouter."""
+    fc = FileConfig(api="gemini", key_command="echo g-secret")
+    primary = APIConfig(use_openrouter=True, api_key="or-key", model=OPENROUTER_DEFAULT_MODEL)
+    alternate = resolve_alternate(primary, fc, env={})
+    assert alternate == APIConfig(use_openrouter=False, api_key="g-secret")
+
+
+def test_alternate_ignores_other_providers_config_key() -> None:
+    """A config key for the primary's provider is never sent to the other one."""
+    primary = APIConfig(api_key="g-key")
+    assert resolve_alternate(primary, FileConfig(key_command="echo g-secret"), env={}) is None
+    assert resolve_alternate(primary, FileConfig(api="gemini", api_key="g-other"), env={}) is None
+    fc = FileConfig(api="openrouter", api_key="or-config")
+    primary = APIConfig(use_openrouter=True, api_key="or-env", model=OPENROUTER_DEFAULT_MODEL)
+    assert resolve_alternate(primary, fc, env={}) is None
+
+
+def test_alternate_skips_primary_key() -> None:
+    """A config key already used by the primary isn't valid for the other provider."""
+    fc = FileConfig(api_key="g-key")
+    assert resolve_alternate(APIConfig(api_key="g-key"), fc, env={}) is None
@@ -0,0 +1,195 @@
+"""Tests for the warm daemon — Unix socket round trips with a fake backend."""
+
+import json
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from nanobanana import daemon
+from nanobanana.config import APIConfig
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="requires Unix sockets")
+
+
+@pytest.fixture
+def env(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("OPENROUTER_API_KEY", "or-key")
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("NANOBANANA_NO_DAEMON", raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_openrouter(monkeypatch) -> list[dict]:
+    calls: list[dict] = []
+
+    def fake_generate(**kwargs):
+        calls.append(kwargs)
+        return b"image:" + kwargs["prompt"].encode(), "image/png"
+
+    monkeypatch.setattr("nanobanana.openrouter.generate_image", fake_generate)
+    return calls
+
+
+@pytest.fixture
+def running_daemon(env: Path):
+    thread = threading.Thread(target=daemon.serve, daemon=True)
+    thread.start()
+    for _ in range(100):
+        client = daemon.connect()
+        if client is not None:
+            client.close()
+            break
+        time.sleep(0.02)
+    else:
+        pytest.fail("daemon did not start")
+    yield
+    # Connect directly: tests may have patched connect()'s checks
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(str(daemon.socket_path()))
+    client = daemon.DaemonClient(sock)
+    client.shutdown()
+    client.close()
+    thread.join(timeout=5)
+
+
+class TestConnect:
+    """Tests for daemon discovery and fallback."""
+
+    def test_no_socket_returns_none(self, env: Path) -> None:
+        assert daemon.connect() is None
+
+    def test_stale_socket_returns_none(self, env: Path) -> None:
+        path = daemon.socket_path()
+        path.parent.mkdir(parents=True)
+        path.write_text("")
+        assert daemon.connect() is None
+
+    def test_socket_path_uses_runtime_dir(self, env: Path) -> None:
+        assert daemon.socket_path() == env / "run" / "nanobanana" / "daemon.sock"
+
+    def test_disabled_by_env(self, running_daemon, monkeypatch) -> None:
+        monkeypatch.setenv("NANOBANANA_NO_DAEMON", "1")
+        assert daemon.connect() is None
+
+    def test_version_mismatch_ignored(self, running_daemon, monkeypatch) -> None:
+        monkeypatch.setattr(
+            daemon.DaemonClient, "ping", lambda self: {"version": "other", "pid": 1},
+        )
+        assert daemon.connect() is None
+
+
+class TestRoundTrip:
+    """Tests for resolve/generate forwarded through the socket."""
+
+    def test_resolve_uses_client_env(self, running_daemon, monkeypatch) -> None:
+        monkeypatch.setenv("OPENROUTER_API_KEY", "client-key")
+        client = daemon.connect()
+        aspect, size, api_config = client.resolve(
+            aspect_flag="16:9", size_flag="2K", model_flag="",
+        )
+        client.close()
+        assert (aspect, size) == ("16:9", "2K")
+        assert api_config.use_openrouter is True
+        assert api_config.api_key == "client-key"
+
+    def test_resolve_error_propagates(self, running_daemon) -> None:
+        client = daemon.connect()
+        with pytest.raises(RuntimeError, match="invalid size"):
+            client.resolve(aspect_flag="", size_flag="8K", model_flag="")
+        client.close()
+
+    def test_key_command_runs_once(self, running_daemon, env: Path, monkeypatch) -> None:
+        monkeypatch.delenv("OPENROUTER_API_KEY")
+        config_dir = env / "config" / "nanobanana"
+        config_dir.mkdir(parents=True)
+        (config_dir / "config.json").write_text(json.dumps({
+            "api": "openrouter", "key_command": "print-key",
+        }))
+        runs: list[str] = []
+
+        def fake_key_command(command: str, ttl: int = 0) -> str:
+            runs.append(command)
+            return "secret"
+
+        monkeypatch.setattr("nanobanana.config._run_key_command", fake_key_command)
+        for _ in range(3):
+            client = daemon.connect()
+            _, _, api_config = client.resolve(aspect_flag="", size_flag="", model_flag="")
+            client.close()
+            assert api_config.api_key == "secret"
+        assert runs == ["print-key"]
+
+    def test_rejected_key_is_resolved_again(self, running_daemon, env: Path, monkeypatch) -> None:
+        from nanobanana.retry import APIError
+
+        monkeypatch.delenv("OPENROUTER_API_KEY")
+        config_dir = env / "config" / "nanobanana"
+        config_dir.mkdir(parents=True)
+        (config_dir / "config.json").write_text(json.dumps({
+            "api": "openrouter", "key_command": "print-key",
+        }))
+        keys = iter(["revoked", "rotated"])
+        monkeypatch.setattr("nanobanana.config._run_key_command", lambda command, ttl=0: next(keys))
+
+        def rejected(**kwargs):
+            raise APIError("HTTP error: 401", status_code=401)
+
+        monkeypatch.setattr("nanobanana.openrouter.generate_image", rejected)
+        client = daemon.connect()
+        _, _, api_config = client.resolve(aspect_flag="", size_flag="", model_flag="")
+        assert api_config.api_key == "revoked"
+        with pytest.raises(RuntimeError, match="401"):
+            client.generate(api_config, prompt="p", input_images=[], aspect="1:1", size="1K")
+        _, _, api_config = client.resolve(aspect_flag="", size_flag="", model_flag="")
+        client.close()
+        assert api_config.api_key == "rotated"
+
+    def test_generate_returns_bytes(self, running_daemon, fake_openrouter, tmp_path: Path) -> None:
+        client = daemon.connect()
+        image_data, mime_type = client.generate(
+            APIConfig(use_openrouter=True, api_key="k", model="m"),
+            prompt="a cat",
+            input_images=["rel.png"],
+            aspect="1:1",
+            size="1K",
+        )
+        client.close()
+        assert image_data == b"image:a cat"
+        assert mime_type == "image/png"
+        # Relative inputs are made absolute for the daemon's working directory
+        assert Path(fake_openrouter[0]["input_images"][0]).is_absolute()
+
+    def test_generate_error_propagates(self, running_daemon, monkeypatch) -> None:
+        def failing(**kwargs):
+            raise RuntimeError("HTTP error: 401 Unauthorized")
+
+        monkeypatch.setattr("nanobanana.openrouter.generate_image", failing)
+        client = daemon.connect()
+        with pytest.raises(RuntimeError, match="401"):
+            client.generate(
+                APIConfig(use_openrouter=True, api_key="k", model="m"),
+                prompt="x", input_images=[], aspect="1:1", size="1K",
+            )
+        # Connection stays usable after an error
+        assert client.ping()["version"]
+        client.close()
+
+    def test_cli_run_forwards_to_daemon(self, running_daemon, fake_openrouter, tmp_path: Path) -> None:
+        from nanobanana.cli import run
+
+        out = tmp_path / "out.png"
+        run(["-no-cache", "-o", str(out), "a cute cat"])
+        assert out.read_bytes() == b"image:a cute cat"
+        assert len(fake_openrouter) == 1
+
+    def test_already_running(self, running_daemon) -> None:
+        with pytest.raises(RuntimeError, match="already running"):
+            daemon.serve()
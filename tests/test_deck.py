@@ -0,0 +1,180 @@
+"""Tests for markdown deck parsing and concurrent slide generation."""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+from nanobanana import cli
+from nanobanana.deck import load_deck
+
+_ROOT = Path(__file__).resolve().parent.parent
+_spec = importlib.util.spec_from_file_location("mock_server", _ROOT / "benchmarks" / "mock_server.py")
+mock_server = importlib.util.module_from_spec(_spec)
+sys.modules.setdefault("mock_server", mock_server)
+_spec.loader.exec_module(mock_server)
+
+
+@pytest.fixture
+def server(tmp_path: Path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+    with mock_server.serve() as server:
+        for name, value in server.env().items():
+            monkeypatch.setenv(name, value)
+        yield server
+
+
+def _write_deck(tmp_path: Path, text: str) -> str:
+    path = tmp_path / "deck.md"
+    path.write_text(text)
+    return str(path)
+
+
+class TestLoadDeck:
+    """Tests for extracting slides from markdown."""
+
+    def test_presentation_example(self) -> None:
+        deck = _ROOT / "examples" / "presentation" / "presentation.md"
+        jobs, skipped = load_deck(str(deck))
+        assert [job.output for job in jobs] == [
+            str(deck.parent / f"slide_{name}.png") for name in ("01_title", "02_features", "03_cta")
+        ]
+        assert len(skipped) == 3
+
+    def test_branded_example(self) -> None:
+        deck = _ROOT / "examples" / "branded-presentation" / "presentation.md"
+        jobs, skipped = load_deck(str(deck))
+        # The "Commands Summary" block repeats all four outputs
+        assert skipped == [72, 75, 76, 77]
+        assert [job.label for job in jobs] == [
+            "Template", "Slide 1: Title", "Slide 2: Three Pillars", "Slide 3: Contact",
+        ]
+        template = str(deck.parent / "template.png")
+        assert jobs[0].output == template
+        assert all(job.inputs == [template] for job in jobs[1:])
+        assert all((job.aspect, job.size) == ("16:9", "2K") for job in jobs)
+        assert jobs[1].prompt.startswith("Using this template style exactly")
+
+    def test_continuations_comments_and_subcommands(self, tmp_path: Path) -> None:
+        deck = _write_deck(tmp_path, """# Deck
+
+## Funnel
+```bash
+cd somewhere
+# not a command
+nanobanana slide funnel -o funnel.png \\
+  "Q4 funnel"  # trailing comment
+nanobanana -o quote.png "a prompt
+over two lines"
+```
+
+```python
+print("nanobanana -o ignored.png")
+```
+""")
+        jobs, skipped = load_deck(deck)
+        assert skipped == []
+        assert [job.line for job in jobs] == [7, 9]
+        assert jobs[0].label == "Funnel"
+        assert "Q4 funnel" in jobs[0].prompt
+        assert jobs[0].aspect == "16:9"
+        assert jobs[1].prompt == "a prompt\nover two lines"
+        assert jobs[1].output == str(tmp_path / "quote.png")
+
+    def test_unnamed_outputs_numbered(self, tmp_path: Path) -> None:
+        deck = _write_deck(tmp_path, '```\nnanobanana "one"\nnanobanana "two"\n```\n')
+        jobs, _ = load_deck(deck)
+        assert [job.output for job in jobs] == [str(tmp_path / "deck_001"), str(tmp_path / "deck_002")]
+        assert [job.label for job in jobs] == ["generate", "generate"]
+
+    @pytest.mark.parametrize("command,match", [
+        ('nanobanana -model other "x"', "-model is set for the whole deck"),
+        ('nanobanana -n 3 "x"', "-n is not supported"),
+        ('nanobanana -size 9K "x"', "invalid size"),
+        ('nanobanana cache clear', "does not generate an image"),
+        ('nanobanana -o a.png', "no prompt provided"),
+        ('nanobanana "unterminated', "unterminated command"),
+    ])
+    def test_invalid_commands_report_line(self, tmp_path: Path, command: str, match: str) -> None:
+        deck = _write_deck(tmp_path, f"# Deck\n```\n{command}\n```\n")
+        with pytest.raises(RuntimeError, match=f"deck line 3: .*{match}"):
+            load_deck(deck)
+
+    def test_input_cycle_rejected(self, tmp_path: Path) -> None:
+        deck = _write_deck(tmp_path, "```\n"
+                           'nanobanana -i b.png -o a.png "x"\n'
+                           'nanobanana -i a.png -o b.png "y"\n'
+                           "```\n")
+        with pytest.raises(RuntimeError, match="input cycle"):
+            load_deck(deck)
+
+    def test_no_commands(self, tmp_path: Path) -> None:
+        deck = _write_deck(tmp_path, "# Deck\n\nnanobanana outside a code block\n")
+        with pytest.raises(RuntimeError, match="no nanobanana commands"):
+            load_deck(deck)
+
+
+class TestDeckCommand:
+    """Tests for nanobanana deck end to end against the stand-in server."""
+
+    def test_template_generated_before_slides(self, server, tmp_path: Path, monkeypatch, capsys) -> None:
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        deck = _write_deck(tmp_path, """## Template
+```bash
+./nanobanana -aspect 16:9 -o template.png "brand template"
+```
+## Slide 1
+```bash
+./nanobanana -i template.png -o slide_01.png "title slide"
+```
+## Slide 2
+```bash
+./nanobanana -i template.png -o slide_02.png "agenda"
+```
+## Summary
+```bash
+./nanobanana -aspect 16:9 -o template.png "template prompt..."
+```
+""")
+        cli.run(["deck", "-no-cache", deck])
+        out = capsys.readouterr().out
+        assert "Skipping 1 repeated commands (lines 15)" in out
+        assert "[1/3] " + str(tmp_path / "template.png") + " (Template" in out
+        assert "Deck finished" in out
+        assert server.counts["requests"] == 3
+        for name in ("template", "slide_01", "slide_02"):
+            assert (tmp_path / f"{name}.png").read_bytes() == mock_server.synthetic_image("1K")
+
+    def test_gemini_uploads_shared_input_once(self, server, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setenv("GEMINI_API_KEY", "k")
+        # Large enough to go through the Files API instead of inline
+        (tmp_path / "brand.png").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 512)
+        slides = "".join(
+            f'```\nnanobanana -i brand.png -o slide_{i}.png "slide {i}"\n```\n' for i in range(4)
+        )
+        cli.run(["deck", "-no-cache", "-raw-inputs", _write_deck(tmp_path, slides)])
+        assert server.counts["requests"] == 4
+        assert server.counts["uploads"] == 1
+        assert len(list(tmp_path.glob("slide_*.png"))) == 4
+
+    def test_failed_dependency_fails_dependents(self, server, tmp_path: Path, monkeypatch, capsys) -> None:
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        server.error_rate = 1.0
+        server.error_status = 400
+        deck = _write_deck(tmp_path, "```\n"
+                           'nanobanana -o template.png "template"\n'
+                           'nanobanana -i template.png -o slide.png "title"\n'
+                           "```\n")
+        with pytest.raises(RuntimeError, match="2 of 2 jobs failed$"):
+            cli.run(["deck", "-no-cache", deck])
+        assert server.counts["requests"] == 1
+        assert "input from line 2 was not generated" in capsys.readouterr().err
+
+    def test_missing_deck_argument(self) -> None:
+        with pytest.raises(RuntimeError, match="no deck provided"):
+            cli.run(["deck"])
@@ -0,0 +1,118 @@
+"""Tests for thumbnails, placeholders and sidecars — no network calls."""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from nanobanana.batch import BatchJob, _run_jobs
+from nanobanana.config import APIConfig, FileConfig
+from nanobanana.derivatives import (
+    DerivativeOptions,
+    blurhash,
+    derivative_options,
+    make_all,
+    make_derivatives,
+)
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(path: Path, size: tuple[int, int] = (800, 450)) -> Path:
+    Image.linear_gradient("L").resize(size).convert("RGB").save(path)
+    return path
+
+
+class TestOptions:
+    """Tests for the thumbnails and placeholder config keys."""
+
+    def test_not_configured(self) -> None:
+        assert derivative_options(None) is None
+        assert derivative_options(FileConfig()) is None
+
+    def test_sizes_sorted_largest_first(self) -> None:
+        options = derivative_options(FileConfig(thumbnails=[256, 1024, 256], placeholder="lqip"))
+        assert options == DerivativeOptions([1024, 256], "lqip")
+
+    @pytest.mark.parametrize("config, match", [
+        (FileConfig(thumbnails=[0]), "invalid thumbnails"),
+        (FileConfig(thumbnails="256"), "invalid thumbnails"),
+        (FileConfig(thumbnails=[True]), "invalid thumbnails"),
+        (FileConfig(placeholder="thumbhash"), "invalid placeholder: thumbhash"),
+    ])
+    def test_invalid(self, config: FileConfig, match: str) -> None:
+        with pytest.raises(RuntimeError, match=match):
+            derivative_options(config)
+
+
+class TestBlurHash:
+    """Tests for the BlurHash encoder."""
+
+    def test_matches_reference_encoder(self) -> None:
+        img = Image.effect_mandelbrot((32, 24), (-2, -1, 1, 1), 50).convert("RGB")
+        # As encoded by the reference implementation (blurhash-python)
+        assert blurhash(img) == "L35OQnof00WBt7j[WBayj[IUM{?b"
+
+    def test_solid_color(self) -> None:
+        encoded = blurhash(Image.new("RGB", (32, 24), (255, 0, 0)))
+        # 4x3 components, then the average color exactly red
+        assert encoded[0] == "L"
+        assert encoded[2:6] == "TI:j"  # 0xFF0000 in base83
+
+    def test_gradient_has_detail(self) -> None:
+        encoded = blurhash(Image.linear_gradient("L").convert("RGB"))
+        assert len(encoded) == 28
+        assert encoded[6:] != "fQ" * 11
+
+
+class TestMakeDerivatives:
+    """Tests for thumbnails and the sidecar describing them."""
+
+    def test_thumbnails_and_sidecar(self, tmp_path: Path) -> None:
+        src = _png(tmp_path / "slide.png")
+        sidecar = make_derivatives(str(src), [1024, 256, 128], "blurhash")
+        assert sidecar == str(tmp_path / "slide.png.json")
+        data = json.loads(Path(sidecar).read_text())
+        assert (data["image"], data["mime_type"]) == ("slide.png", "image/png")
+        assert (data["width"], data["height"], data["bytes"]) == (800, 450, src.stat().st_size)
+        assert len(data["blurhash"]) == 28
+        # Smallest first; 1024 would be an upscale and is skipped
+        assert [t["path"] for t in data["thumbnails"]] == ["slide.128.webp", "slide.256.webp"]
+        with Image.open(tmp_path / "slide.256.webp") as thumb:
+            assert thumb.size == (256, 144)
+        assert data["thumbnails"][1]["bytes"] == (tmp_path / "slide.256.webp").stat().st_size
+
+    def test_lqip(self, tmp_path: Path) -> None:
+        src = _png(tmp_path / "slide.png")
+        data = json.loads(Path(make_derivatives(str(src), [], "lqip")).read_text())
+        assert data["lqip"].startswith("data:image/webp;base64,")
+        assert data["thumbnails"] == []
+
+    def test_unreadable_image(self, tmp_path: Path) -> None:
+        bad = tmp_path / "bad.png"
+        bad.write_bytes(b"nope")
+        good = _png(tmp_path / "good.png")
+        results = make_all([str(bad), str(good)], DerivativeOptions([64]))
+        assert isinstance(results[0], RuntimeError)
+        assert results[1] == str(good) + ".json"
+        assert not (tmp_path / "bad.png.json").exists()
+
+
+class TestBatchPreviews:
+    """Tests that batch runs make previews of every output."""
+
+    def test_batch_writes_sidecars(self, tmp_path: Path, monkeypatch) -> None:
+        async def fake_generate(client, *, prompt, output_for_mime, **kwargs):
+            output_path = output_for_mime("image/png")
+            _png(Path(output_path))
+            return output_path, "image/png"
+
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", fake_generate)
+        jobs = [BatchJob(line=i, prompt=f"p{i}", output=str(tmp_path / f"out{i}")) for i in range(3)]
+        api = APIConfig(use_openrouter=True, api_key="k", model="m")
+        config = FileConfig(thumbnails=[200], placeholder="blurhash")
+        assert asyncio.run(_run_jobs(jobs, api, concurrency=2, file_config=config)) == 0
+        for i in range(3):
+            data = json.loads((tmp_path / f"out{i}.png.json").read_text())
+            assert data["thumbnails"][0]["width"] == 200
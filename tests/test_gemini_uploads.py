@@ -0,0 +1,247 @@
+"""Tests for the Gemini Files API upload cache against a local stand-in server."""
+
+import asyncio
+import base64
+import json
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from nanobanana import gemini
+from nanobanana.gemini import UPLOAD_MIN_BYTES, UploadCache
+
+IMAGE = b"\x89PNG\r\n\x1a\ngenerated"
+
+
+def _file_uri(part: dict) -> str:
+    # The SDK may send either JSON casing
+    file_data = part.get("fileData") or part.get("file_data") or {}
+    return file_data.get("fileUri") or file_data.get("file_uri") or ""
+
+
+def _is_inline(part: dict) -> bool:
+    return "inlineData" in part or "inline_data" in part
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    """Minimal Files API upload + generateContent endpoint."""
+
+    server: "_StandInServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _json(self, status: int, body: dict, headers: dict | None = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        state = self.server.state
+        host = f"http://{self.headers['Host']}"
+        if self.path.startswith("/upload/v1beta/files"):
+            self._json(200, {}, {"X-Goog-Upload-URL": f"{host}/upload-session"})
+        elif self.path == "/upload-session":
+            time.sleep(state.get("upload_delay", 0))
+            state["uploads"].append(len(body))
+            name = f"files/f{len(state['uploads'])}"
+            state["live"].add(name)
+            expires = datetime.now(UTC) + timedelta(hours=48)
+            self._json(200, {"file": {
+                "name": name,
+                "uri": f"{host}/v1beta/{name}",
+                "mimeType": "image/jpeg",
+                "expirationTime": expires.isoformat().replace("+00:00", "Z"),
+            }}, {"X-Goog-Upload-Status": "final"})
+        elif ":generateContent" in self.path:
+            parts = json.loads(body)["contents"][0]["parts"]
+            state["requests"].append(parts)
+            for part in parts:
+                uri = _file_uri(part)
+                if uri and uri.split("/v1beta/")[1] not in state["live"]:
+                    self._json(403, {"error": {
+                        "code": 403, "message": "file not found", "status": "PERMISSION_DENIED",
+                    }})
+                    return
+            self._json(200, {"candidates": [{"content": {"parts": [{"inlineData": {
+                "mimeType": "image/png", "data": base64.b64encode(IMAGE).decode(),
+            }}]}}]})
+        else:
+            self._json(404, {"error": {"code": 404, "message": self.path, "status": "NOT_FOUND"}})
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    state: dict
+
+
+@pytest.fixture
+def stand_in(tmp_path: Path, monkeypatch) -> dict:
+    server = _StandInServer(("127.0.0.1", 0), _StandIn)
+    server.state = {"uploads": [], "requests": [], "live": set()}
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setenv("NANOBANANA_GEMINI_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    yield server.state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def template(tmp_path: Path) -> str:
+    path = tmp_path / "template.jpg"
+    path.write_bytes(b"\xff\xd8\xff" + b"\0" * UPLOAD_MIN_BYTES)
+    return str(path)
+
+
+def _generate(inputs: list[str], uploads: UploadCache | None) -> tuple[bytes, str]:
+    return gemini.generate_image(
+        api_key="k", prompt="slide", input_images=inputs,
+        aspect_ratio="16:9", image_size="2K", uploads=uploads,
+    )
+
+
+class TestUploadCache:
+    """Tests for uploading once and reusing file references."""
+
+    def test_uploaded_once_then_referenced(self, stand_in: dict, template: str) -> None:
+        uploads = UploadCache()
+        for _ in range(3):
+            assert _generate([template], uploads) == (IMAGE, "image/png")
+        assert len(stand_in["uploads"]) == 1
+        for parts in stand_in["requests"]:
+            assert _file_uri(parts[0]).endswith("/v1beta/files/f1")
+            assert not _is_inline(parts[0])
+
+    def test_small_inputs_stay_inline(self, stand_in: dict, tmp_path: Path) -> None:
+        small = tmp_path / "logo.png"
+        small.write_bytes(b"\x89PNG small")
+        _generate([str(small)], UploadCache())
+        assert stand_in["uploads"] == []
+        assert _is_inline(stand_in["requests"][0][0])
+
+    def test_disabled_sends_inline(self, stand_in: dict, template: str) -> None:
+        _generate([template], None)
+        assert stand_in["uploads"] == []
+        assert _is_inline(stand_in["requests"][0][0])
+
+    def test_entries_scoped_by_api_key(self, stand_in: dict, template: str) -> None:
+        uploads = UploadCache()
+        _generate([template], uploads)
+        gemini.generate_image(
+            api_key="other", prompt="x", input_images=[template],
+            aspect_ratio="1:1", image_size="1K", uploads=uploads,
+        )
+        assert len(stand_in["uploads"]) == 2
+
+    def test_stale_upload_reuploaded(self, stand_in: dict, template: str) -> None:
+        uploads = UploadCache()
+        _generate([template], uploads)
+        stand_in["live"].clear()  # deleted server-side
+        assert _generate([template], uploads) == (IMAGE, "image/png")
+        assert len(stand_in["uploads"]) == 2
+
+    @pytest.mark.parametrize(("code", "status", "message", "stale"), [
+        (403, "PERMISSION_DENIED", "You do not have permission to access the File abc or it may not exist.", True),
+        (404, "NOT_FOUND", "File files/abc not found.", True),
+        (403, "PERMISSION_DENIED", "Method doesn't allow unregistered callers.", False),
+        (400, "INVALID_ARGUMENT", "Unsupported file uri", False),
+        (400, "INVALID_ARGUMENT", "Request contains an invalid argument.", False),
+        (404, "NOT_FOUND", "models/gemini-x is not found", False),
+    ])
+    def test_only_missing_files_are_stale(self, code: int, status: str, message: str, stale: bool) -> None:
+        from google.genai import errors
+
+        e = errors.ClientError(code, {"error": {"code": code, "message": message, "status": status}})
+        assert gemini._is_stale_upload(e, ["key"]) is stale
+        assert gemini._is_stale_upload(e, []) is False
+
+    def test_expired_entry_not_reused(self, stand_in: dict, template: str) -> None:
+        uploads = UploadCache()
+        _generate([template], uploads)
+        entries = json.loads(uploads.path.read_text())
+        for entry in entries.values():
+            entry["expires"] = (datetime.now(UTC) + timedelta(minutes=5)).isoformat()
+        uploads.path.write_text(json.dumps(entries))
+        _generate([template], uploads)
+        assert len(stand_in["uploads"]) == 2
+
+    def test_async_uploads_once(self, stand_in: dict, template: str) -> None:
+        uploads = UploadCache()
+
+        async def go() -> None:
+            client = gemini.create_client("k")
+            try:
+                for _ in range(2):
+                    await gemini.agenerate_image(
+                        client, prompt="x", input_images=[template],
+                        aspect_ratio="1:1", image_size="1K", uploads=uploads, api_key="k",
+                    )
+            finally:
+                await client.aio.aclose()
+
+        asyncio.run(go())
+        assert len(stand_in["uploads"]) == 1
+
+    def test_uploads_on_several_loops(self, stand_in: dict, template: str) -> None:
+        # An upload in progress on one loop can't be awaited from another
+        stand_in["upload_delay"] = 0.3
+        uploads = UploadCache()
+        errors: list[BaseException] = []
+
+        async def go() -> None:
+            client = gemini.create_client("k")
+            try:
+                await gemini.agenerate_image(
+                    client, prompt="x", input_images=[template],
+                    aspect_ratio="1:1", image_size="1K", uploads=uploads, api_key="k",
+                )
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                await client.aio.aclose()
+
+        threads = [threading.Thread(target=asyncio.run, args=(go(),)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.1)
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(stand_in["requests"]) == 2
+
+
+class TestDigests:
+    """Tests for remembering input hashes."""
+
+    def test_bounded(self, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setattr(gemini, "_MAX_DIGESTS", 2)
+        uploads = UploadCache(tmp_path / "uploads.json")
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"input{i}.jpg"
+            path.write_bytes(bytes([i]) * UPLOAD_MIN_BYTES)
+            paths.append(str(path))
+            uploads.file_key(str(path), "k")
+        uploads.file_key(paths[1], "k")
+        assert [memo[0] for memo in uploads._digests] == paths[2:] + paths[1:2]
+
+    def test_remembered_input_not_read(self, tmp_path: Path, monkeypatch) -> None:
+        uploads = UploadCache(tmp_path / "uploads.json")
+        data = b"\xff\xd8\xff" + b"\1" * UPLOAD_MIN_BYTES
+        path = tmp_path / "input.jpg"
+        path.write_bytes(data)
+        uploads.remember(str(path), data)
+        monkeypatch.setattr(gemini, "_read_input", pytest.fail)
+        assert uploads.file_key(str(path), "k").endswith(":" + gemini.hashlib.sha256(data).hexdigest())
@@ -0,0 +1,203 @@
+"""Tests for hedged requests and failover between backends — no network calls."""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from nanobanana.config import OPENROUTER_DEFAULT_MODEL, APIConfig, FileConfig
+from nanobanana.hedge import LatencyHistory, agenerate_hedged, hedge_options
+from nanobanana.retry import APIError
+
+GEMINI = APIConfig(api_key="g-key")
+OPENROUTER = APIConfig(use_openrouter=True, api_key="or-key", model=OPENROUTER_DEFAULT_MODEL)
+
+
+class _Backends:
+    """Fake backend calls with scripted delays and outcomes."""
+
+    def __init__(self, monkeypatch) -> None:
+        self.delay = {"gemini": 0.0, "openrouter": 0.0}
+        self.error: dict[str, Exception | None] = {"gemini": None, "openrouter": None}
+        self.calls: list[str] = []
+        self.cancelled: list[str] = []
+        monkeypatch.setattr("nanobanana.gemini.agenerate_image", self._gemini)
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", self._openrouter)
+
+    async def _run(self, name: str) -> None:
+        self.calls.append(name)
+        try:
+            await asyncio.sleep(self.delay[name])
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        if self.error[name] is not None:
+            raise self.error[name]
+
+    async def _gemini(self, client, **kwargs) -> tuple[bytes, str]:
+        await self._run("gemini")
+        return b"from gemini", "image/png"
+
+    async def _openrouter(self, client, **kwargs) -> tuple[str, str]:
+        await self._run("openrouter")
+        path = kwargs["output_for_mime"]("image/jpeg")
+        Path(path).write_bytes(b"from openrouter")
+        return path, "image/jpeg"
+
+
+@pytest.fixture
+def backends(monkeypatch) -> _Backends:
+    return _Backends(monkeypatch)
+
+
+@pytest.fixture
+def history(tmp_path: Path) -> LatencyHistory:
+    return LatencyHistory(tmp_path / "latency.json")
+
+
+def _generate(tmp_path: Path, history: LatencyHistory, primary=GEMINI, secondary=OPENROUTER, **kwargs):
+    switches: list[str] = []
+    result = asyncio.run(agenerate_hedged(
+        primary, secondary,
+        prompt="p", input_images=[], aspect_ratio="1:1", image_size="1K",
+        output_for_mime=lambda mime: str(tmp_path / ("out.jpg" if mime == "image/jpeg" else "out.png")),
+        history=history, on_switch=switches.append, **kwargs,
+    ))
+    return result, switches
+
+
+class TestHedging:
+    """Tests for racing a slow primary against the other backend."""
+
+    def test_fast_primary_not_hedged(self, tmp_path: Path, backends, history) -> None:
+        (path, mime_type, served_by), switches = _generate(tmp_path, history, hedge_percentile=90)
+        assert served_by is GEMINI
+        assert Path(path).read_bytes() == b"from gemini"
+        assert backends.calls == ["gemini"]
+        assert switches == []
+        assert len(json.loads(history.path.read_text())["Gemini"]) == 1
+
+    def test_slow_primary_hedged_and_cancelled(self, tmp_path: Path, backends, history) -> None:
+        for _ in range(5):
+            history.record("Gemini", 0.05)
+        backends.delay["gemini"] = 5.0
+        (path, mime_type, served_by), switches = _generate(tmp_path, history, hedge_percentile=90)
+        assert served_by is OPENROUTER
+        assert mime_type == "image/jpeg"
+        assert backends.cancelled == ["gemini"]
+        assert "no answer from Gemini after 0.1s" in switches[0]
+        # The cancelled Gemini request never wrote its file
+        assert [p.name for p in tmp_path.iterdir() if p.suffix != ".json"] == ["out.jpg"]
+
+    def test_primary_wins_race_after_hedge(self, tmp_path: Path, backends, history) -> None:
+        for _ in range(5):
+            history.record("OpenRouter", 0.01)
+        backends.delay.update(openrouter=0.1, gemini=1.0)
+        (path, _, served_by), switches = _generate(
+            tmp_path, history, primary=OPENROUTER, secondary=GEMINI, hedge_percentile=50,
+        )
+        assert served_by is OPENROUTER
+        assert len(switches) == 1
+        assert backends.cancelled == ["gemini"]
+        assert not (tmp_path / "out.png").exists()
+
+    def test_loser_stopped_before_winner_written(self, tmp_path: Path, backends, history, monkeypatch) -> None:
+        """A losing stream still writing the output path can't clobber the winner."""
+        output = tmp_path / "out.png"
+
+        async def streaming(client, **kwargs) -> tuple[str, str]:
+            path = kwargs["output_for_mime"]("image/png")
+            try:
+                await asyncio.sleep(5)
+            finally:
+                Path(path).write_bytes(b"partial")
+            return path, "image/png"
+
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", streaming)
+        for _ in range(5):
+            history.record("OpenRouter", 0.01)
+        path, _, served_by = asyncio.run(agenerate_hedged(
+            OPENROUTER, GEMINI,
+            prompt="p", input_images=[], aspect_ratio="1:1", image_size="1K",
+            output_for_mime=lambda mime: str(output), history=history, hedge_percentile=50,
+        ))
+        assert served_by is GEMINI
+        assert output.read_bytes() == b"from gemini"
+
+    def test_default_deadline_without_history(self, history) -> None:
+        history.record("Gemini", 1.0)
+        assert history.deadline("Gemini", 90) == 60.0
+
+    def test_percentile(self, history) -> None:
+        for seconds in range(1, 11):
+            history.record("Gemini", float(seconds))
+        assert history.percentile("Gemini", 50) == 6.0
+        assert history.percentile("Gemini", 99) == 10.0
+
+
+class TestFailover:
+    """Tests for moving to the other backend after retryable failures."""
+
+    def test_retryable_error_fails_over(self, tmp_path: Path, backends, history) -> None:
+        backends.error["gemini"] = APIError("overloaded", status_code=503)
+        (path, _, served_by), switches = _generate(tmp_path, history, failover=True)
+        assert served_by is OPENROUTER
+        assert switches == ["Gemini failed (overloaded), trying OpenRouter"]
+
+    def test_fatal_error_not_failed_over(self, tmp_path: Path, backends, history) -> None:
+        backends.error["gemini"] = APIError("HTTP error: 401", status_code=401)
+        with pytest.raises(APIError, match="401"):
+            _generate(tmp_path, history, failover=True)
+        assert backends.calls == ["gemini"]
+
+    def test_disabled_by_default(self, tmp_path: Path, backends, history) -> None:
+        backends.error["gemini"] = APIError("overloaded", status_code=503)
+        with pytest.raises(APIError, match="overloaded"):
+            _generate(tmp_path, history)
+        assert backends.calls == ["gemini"]
+
+    def test_both_fail_raises_primary_error(self, tmp_path: Path, backends, history) -> None:
+        backends.error["gemini"] = APIError("gemini down", status_code=503)
+        backends.error["openrouter"] = APIError("openrouter down", status_code=502)
+        with pytest.raises(APIError, match="gemini down"):
+            _generate(tmp_path, history, failover=True)
+
+    def test_hedge_secondary_fails_first(self, tmp_path: Path, backends, history) -> None:
+        for _ in range(5):
+            history.record("Gemini", 0.01)
+        backends.delay["gemini"] = 0.2
+        backends.error["gemini"] = APIError("gemini down", status_code=503)
+        backends.error["openrouter"] = APIError("openrouter down", status_code=502)
+        with pytest.raises(APIError, match="gemini down"):
+            _generate(tmp_path, history, hedge_percentile=50)
+        assert backends.calls == ["gemini", "openrouter"]
+
+
+class TestOptions:
+    """Tests for the hedging config keys and CLI wiring."""
+
+    @pytest.mark.parametrize("percentile", [-1, 100, "90"])
+    def test_invalid_percentile(self, percentile) -> None:
+        with pytest.raises(RuntimeError, match="invalid hedge_percentile"):
+            hedge_options(FileConfig(hedge_percentile=percentile))
+
+    def test_cli_fails_over(self, tmp_path: Path, backends, monkeypatch, capsys) -> None:
+        from nanobanana.cli import run
+
+        config_dir = tmp_path / "config" / "nanobanana"
+        config_dir.mkdir(parents=True)
+        (config_dir / "config.json").write_text(json.dumps({"failover": True, "cache": False}))
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setenv("GEMINI_API_KEY", "g-key")
+        monkeypatch.setenv("OPENROUTER_API_KEY", "or-key")
+        monkeypatch.setenv("NANOBANANA_NO_DAEMON", "1")
+        backends.error["gemini"] = APIError("overloaded", status_code=503)
+
+        run(["-o", str(tmp_path / "out.png"), "a cat"])
+        captured = capsys.readouterr()
+        assert "Backup: OpenRouter (failover)" in captured.out
+        assert "Served: OpenRouter" in captured.out
+        assert "trying OpenRouter" in captured.err
+        assert (tmp_path / "out.jpg").read_bytes() == b"from openrouter"
@@ -0,0 +1,219 @@
+"""Tests for the SQLite job store, -resume and Ctrl-C handling — no network calls."""
+
+import asyncio
+import json
+import os
+import signal
+from pathlib import Path
+
+import pytest
+
+from nanobanana.batch import BatchInterrupted, BatchJob, _run_jobs, run_batch
+from nanobanana.config import APIConfig
+from nanobanana.jobstore import DONE, FAILED, IN_FLIGHT, PENDING, JobStore
+from nanobanana.transcode import OutputFormat
+
+API = APIConfig(use_openrouter=True, api_key="k", model="m")
+
+
+def _jobs(tmp_path: Path, n: int = 3) -> list[BatchJob]:
+    return [BatchJob(line=i + 1, prompt=f"p{i}", output=str(tmp_path / f"out{i}")) for i in range(n)]
+
+
+def _states(store: JobStore) -> dict[str, str]:
+    return {row["output"]: row["state"] for row in store.rows()}
+
+
+class TestJobStore:
+    """Tests for job rows, states and what -resume keeps."""
+
+    def test_fresh_run_resets(self, tmp_path: Path) -> None:
+        store = JobStore(str(tmp_path / "jobs.jsonl"), API)
+        jobs = _jobs(tmp_path)
+        assert store.start(jobs) == {}
+        store.begin(jobs[0])
+        store.finish(jobs[0], str(tmp_path / "out0.png"))
+        store.begin(jobs[1])
+        store.fail(jobs[1], "HTTP error: 500")
+        assert _states(store) == {"out0": DONE, "out1": FAILED, "out2": PENDING}
+        assert store.rows()[1]["error"] == "HTTP error: 500"
+
+        assert store.start(jobs) == {}
+        assert set(_states(store).values()) == {PENDING}
+
+    def test_resume_keeps_done_jobs(self, tmp_path: Path) -> None:
+        source = str(tmp_path / "jobs.jsonl")
+        store = JobStore(source, API)
+        jobs = _jobs(tmp_path)
+        store.start(jobs)
+        for job in jobs:
+            store.begin(job)
+        (tmp_path / "out0.png").write_bytes(b"x")
+        store.finish(jobs[0], str(tmp_path / "out0.png"))
+        store.finish(jobs[1], str(tmp_path / "out1.png"))  # since deleted
+        store.close()
+
+        # A new process after a crash: out2 was left in flight
+        store = JobStore(source, API)
+        assert _states(store)["out2"] == IN_FLIGHT
+        assert store.start(jobs, resume=True) == {0: str(tmp_path / "out0.png")}
+        assert _states(store) == {"out0": DONE, "out1": PENDING, "out2": PENDING}
+        assert [row["attempts"] for row in store.rows()] == [1, 1, 1]
+
+    def test_changed_job_runs_again(self, tmp_path: Path) -> None:
+        store = JobStore(str(tmp_path / "jobs.jsonl"), API)
+        [job] = _jobs(tmp_path, 1)
+        store.start([job])
+        (tmp_path / "out0.png").write_bytes(b"x")
+        store.finish(job, str(tmp_path / "out0.png"))
+        job.prompt = "edited"
+        assert store.start([job], resume=True) == {}
+        assert store.rows()[0]["attempts"] == 0
+
+    def test_changed_input_runs_again(self, tmp_path: Path) -> None:
+        store = JobStore(str(tmp_path / "jobs.jsonl"), API)
+        source = tmp_path / "in.png"
+        source.write_bytes(b"before")
+        job = BatchJob(line=1, prompt="p", inputs=[str(source)], output=str(tmp_path / "out0"))
+        store.start([job])
+        (tmp_path / "out0.png").write_bytes(b"x")
+        store.finish(job, str(tmp_path / "out0.png"))
+        assert store.start([job], resume=True) == {0: str(tmp_path / "out0.png")}
+
+        store.finish(job, str(tmp_path / "out0.png"))
+        source.write_bytes(b"edited input")
+        assert store.start([job], resume=True) == {}
+
+    def test_input_made_during_run_stamped_on_finish(self, tmp_path: Path) -> None:
+        """An input written by an earlier job is stamped as the job used it."""
+        store = JobStore(str(tmp_path / "jobs.jsonl"), API)
+        made = tmp_path / "made.png"
+        job = BatchJob(line=2, prompt="p", inputs=[str(made)], output=str(tmp_path / "out0"))
+        store.start([job])
+        made.write_bytes(b"made")
+        (tmp_path / "out0.png").write_bytes(b"x")
+        store.finish(job, str(tmp_path / "out0.png"))
+        assert store.start([job], resume=True) == {0: str(tmp_path / "out0.png")}
+
+    def test_changed_format_runs_again(self, tmp_path: Path) -> None:
+        source = str(tmp_path / "jobs.jsonl")
+        store = JobStore(source, API, OutputFormat("webp"))
+        [job] = _jobs(tmp_path, 1)
+        store.start([job])
+        (tmp_path / "out0.webp").write_bytes(b"x")
+        store.finish(job, str(tmp_path / "out0.webp"))
+        store.close()
+        assert JobStore(source, API, OutputFormat("webp")).start([job], resume=True) == {
+            0: str(tmp_path / "out0.webp"),
+        }
+        assert JobStore(source, API, OutputFormat("webp", 60)).start([job], resume=True) == {}
+        assert JobStore(source, API, OutputFormat("jpeg")).start([job], resume=True) == {}
+
+    def test_sources_kept_apart(self, tmp_path: Path) -> None:
+        a = JobStore(str(tmp_path / "a.jsonl"), API)
+        b = JobStore(str(tmp_path / "b.jsonl"), API)
+        a.start(_jobs(tmp_path, 2))
+        b.start(_jobs(tmp_path, 1))
+        assert len(a.rows()) == 2
+        assert len(b.rows()) == 1
+
+
+class TestResume:
+    """Tests for batch runs recording state and resuming."""
+
+    @pytest.fixture
+    def calls(self, tmp_path: Path, monkeypatch) -> list[str]:
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        calls: list[str] = []
+        self.fail = {"p1"}
+
+        async def fake_generate(client, *, prompt, output_for_mime, **kwargs):
+            calls.append(prompt)
+            await asyncio.sleep(0.01)
+            if prompt in self.fail:
+                raise RuntimeError("HTTP error: 500")
+            output_path = output_for_mime("image/png")
+            Path(output_path).write_bytes(prompt.encode())
+            return output_path, "image/png"
+
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", fake_generate)
+        return calls
+
+    def _manifest(self, tmp_path: Path, n: int = 3) -> str:
+        path = tmp_path / "jobs.jsonl"
+        path.write_text("".join(json.dumps({"prompt": f"p{i}"}) + "\n" for i in range(n)))
+        return str(path)
+
+    def test_resume_runs_only_unfinished(self, tmp_path: Path, calls: list[str], capsys) -> None:
+        manifest = self._manifest(tmp_path)
+        with pytest.raises(RuntimeError, match="1 of 3 jobs failed; rerun them with -resume"):
+            run_batch(manifest, concurrency=2, use_cache=False)
+        # Lose the build log, as when the process is killed before saving it
+        (tmp_path / ".nanobanana-build.json").unlink()
+
+        self.fail = set()
+        calls.clear()
+        run_batch(manifest, concurrency=2, use_cache=False, resume=True)
+        assert calls == ["p1"]
+        out = capsys.readouterr().out
+        assert "Resuming: 2 of 3 jobs already done" in out
+        assert "3 succeeded (2 resumed)" in out
+        store = JobStore(manifest, API)
+        assert set(_states(store).values()) == {DONE}
+        assert [row["attempts"] for row in store.rows()] == [1, 2, 1]
+
+    def test_store_records_run(self, tmp_path: Path, calls: list[str]) -> None:
+        store = JobStore(str(tmp_path / "jobs.jsonl"), API)
+        jobs = _jobs(tmp_path)
+        store.start(jobs)
+        assert asyncio.run(_run_jobs(jobs, API, concurrency=3, store=store)) == 1
+        assert _states(store) == {"out0": DONE, "out1": FAILED, "out2": DONE}
+        assert store.rows()[0]["output_path"] == "out0.png"
+
+    def test_ctrl_c_drains_in_flight_jobs(self, tmp_path: Path, calls: list[str], monkeypatch) -> None:
+        self.fail = set()
+        manifest = self._manifest(tmp_path, 4)
+        original = asyncio.sleep
+
+        async def interrupted_sleep(delay: float) -> None:
+            if len(calls) == 2 and not getattr(self, "sent", False):
+                self.sent = True
+                os.kill(os.getpid(), signal.SIGINT)
+            await original(delay)
+
+        monkeypatch.setattr(asyncio, "sleep", interrupted_sleep)
+        with pytest.raises(RuntimeError, match="interrupted with 2 of 4 jobs not run; continue with: "
+                                               "nanobanana batch -resume"):
+            run_batch(manifest, concurrency=2, use_cache=False)
+        # Both jobs in flight finished; the rest never started
+        assert calls == ["p0", "p1"]
+        assert (tmp_path / "jobs_002.png").read_bytes() == b"p1"
+        assert list(_states(JobStore(manifest, API)).values()) == [DONE, DONE, PENDING, PENDING]
+
+        monkeypatch.setattr(asyncio, "sleep", original)
+        calls.clear()
+        run_batch(manifest, concurrency=2, use_cache=False, resume=True)
+        assert calls == ["p2", "p3"]
+
+    def test_second_ctrl_c_cancels(self, tmp_path: Path, calls: list[str], monkeypatch) -> None:
+        original = asyncio.sleep
+
+        async def stuck(delay: float) -> None:
+            if delay == 0.01:
+                os.kill(os.getpid(), signal.SIGINT)
+                os.kill(os.getpid(), signal.SIGINT)
+                delay = 60
+            await original(delay)
+
+        monkeypatch.setattr(asyncio, "sleep", stuck)
+        store = JobStore(str(tmp_path / "jobs.jsonl"), API)
+        jobs = _jobs(tmp_path, 2)
+        store.start(jobs)
+        with pytest.raises(BatchInterrupted) as e:
+            asyncio.run(asyncio.wait_for(_run_jobs(jobs, API, concurrency=1, store=store), 10))
+        assert e.value.not_run == 2
+        # The cancelled job went back to pending, its attempt counted
+        assert [(row["state"], row["attempts"]) for row in store.rows()] == [(PENDING, 1), (PENDING, 0)]
@@ -0,0 +1,142 @@
+"""Tests for the nanobanana.api library interface against the stand-in server."""
+
+import asyncio
+import importlib.util
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from nanobanana import api
+
+_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "mock_server.py"
+_spec = importlib.util.spec_from_file_location("mock_server", _PATH)
+mock_server = importlib.util.module_from_spec(_spec)
+sys.modules.setdefault("mock_server", mock_server)
+_spec.loader.exec_module(mock_server)
+
+
+@pytest.fixture
+def server(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+    (tmp_path / "tmp").mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+    for name in ("_configs", "_limiters"):
+        monkeypatch.setattr(api, name, {})
+    monkeypatch.setattr(api, "_uploads", None)
+    api._file_config.cache_clear()
+    with mock_server.serve() as server:
+        for name, value in server.env().items():
+            monkeypatch.setenv(name, value)
+        yield server
+    api.close()
+    api._file_config.cache_clear()
+
+
+class TestAgenerate:
+    """Tests for async generation."""
+
+    def test_result(self, server, monkeypatch) -> None:
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+
+        async def main():
+            try:
+                return await api.agenerate("a cat", size="2K")
+            finally:
+                await api.aclose()
+
+        result = asyncio.run(main())
+        assert result.data == mock_server.synthetic_image("2K")
+        assert (result.mime_type, result.extension) == ("image/png", ".png")
+        assert (result.backend, result.aspect, result.size) == ("openrouter", "1:1", "2K")
+        assert result.timings["total_ms"] > 0
+        assert result.timings["bytes"]["image_bytes"] == len(result.data)
+
+    def test_concurrent_calls_share_one_client(self, server, monkeypatch) -> None:
+        # Calls beyond the in-flight limit queue instead of timing out in the pool
+        monkeypatch.setattr(api, "MAX_CONCURRENCY", 4)
+
+        async def main():
+            results = await asyncio.gather(*(
+                api.agenerate(f"cat {i}", backend="openrouter", api_key="k") for i in range(40)
+            ))
+            clients = len(api._pool().clients)
+            await api.aclose()
+            return results, clients
+
+        results, clients = asyncio.run(main())
+        assert len(results) == 40
+        assert clients == 1
+        assert server.counts["requests"] == 40
+
+    def test_bytes_inputs(self, server, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setenv("GEMINI_API_KEY", "k")
+        large = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 512
+        small = tmp_path / "small.png"
+        small.write_bytes(b"\x89PNG\r\n\x1a\n")
+
+        async def main():
+            try:
+                return await api.agenerate("combine", inputs=[large, small])
+            finally:
+                await api.aclose()
+
+        result = asyncio.run(main())
+        assert result.backend == "gemini"
+        # The large input went through the Files API
+        assert server.counts["uploads"] == 1
+        # Temporary copies of byte inputs are removed
+        assert list((tmp_path / "tmp").iterdir()) == []
+
+    def test_command_template(self, server) -> None:
+        prompt, aspect, size = api._render("Q4 review", "slide", "funnel", "", "")
+        assert "Q4 review" in prompt and prompt != "Q4 review"
+        assert aspect == "16:9"
+        assert api._render("a cat", "", "", "", "") == ("a cat", "1:1", "1K")
+
+    @pytest.mark.parametrize("status,retryable", [(400, False), (503, True)])
+    def test_errors(self, server, status: int, retryable: bool) -> None:
+        server.error_rate = 1.0
+        server.error_status = status
+
+        async def main():
+            try:
+                await api.agenerate("a cat", backend="openrouter", api_key="k")
+            finally:
+                await api.aclose()
+
+        with pytest.raises(api.GenerationError) as excinfo:
+            asyncio.run(main())
+        assert excinfo.value.status_code == status
+        assert excinfo.value.retryable is retryable
+
+    @pytest.mark.parametrize("kwargs,match", [
+        ({"backend": "dall-e"}, "invalid backend"),
+        ({"backend": "gemini", "model": "m"}, "only valid with the openrouter"),
+        ({"size": "8K"}, "invalid size"),
+        ({"command": "nope"}, "unknown command"),
+    ])
+    def test_invalid_options(self, server, kwargs: dict, match: str) -> None:
+        with pytest.raises(api.GenerationError, match=match):
+            asyncio.run(api.agenerate("a cat", api_key="k", **kwargs))
+
+    def test_missing_key(self, server) -> None:
+        with pytest.raises(api.GenerationError, match="GEMINI_API_KEY"):
+            asyncio.run(api.agenerate("a cat", backend="gemini"))
+
+
+class TestGenerate:
+    """Tests for the blocking wrapper."""
+
+    def test_calls_share_background_pool(self, server, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        first = api.generate("a cat")
+        second = api.generate("a dog")
+        assert first.data == second.data == mock_server.synthetic_image("1K")
+        assert len(api._pools[api._background_loop()].clients) == 1
+        assert Path(first.save(tmp_path / "cat.jpg")) == tmp_path / "cat.png"
+        assert (tmp_path / "cat.png").read_bytes() == first.data
@@ -2,7 +2,7 @@
 
 import pytest
 
-from nanobanana.mime import extension_from_mime, mime_from_extension
+from nanobanana.mime import extension_from_mime, mime_from_bytes, mime_from_extension
 
 
 @pytest.mark.parametrize(
@@ -11,6 +11,7 @@ from nanobanana.mime import extension_from_mime, mime_from_extension
         ("image/png", ".png"),
         ("image/jpeg", ".jpg"),
         ("image/webp", ".webp"),
+        ("image/avif", ".avif"),
         ("image/gif", ".png"),     # unsupported, defaults to .png
         ("unknown/type", ".png"),  # unknown, defaults to .png
         ("", ".png"),              # empty, defaults to .png
@@ -29,6 +30,7 @@ def test_extension_from_mime(mime_type: str, expected: str) -> None:
         ("image.jpeg", "image/jpeg"),
         ("image.JPEG", "image/jpeg"),
         ("image.webp", "image/webp"),
+        ("image.avif", "image/avif"),
         ("image.gif", "image/gif"),
         ("image.bmp", "image/png"),           # unsupported, defaults to image/png
         ("image", "image/png"),               # no extension, defaults to image/png
@@ -37,3 +39,18 @@ def test_extension_from_mime(mime_type: str, expected: str) -> None:
 )
 def test_mime_from_extension(path: str, expected: str) -> None:
     assert mime_from_extension(path) == expected
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        (b"\x89PNG\r\n\x1a\n....", "image/png"),
+        (b"\xff\xd8\xff\xe0....", "image/jpeg"),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+        (b"\x00\x00\x00\x1cftypavif\x00\x00", "image/avif"),
+        (b"GIF89a....", "image/gif"),
+        (b"", "image/png"),        # unknown, defaults to PNG
+    ],
+)
+def test_mime_from_bytes(data: bytes, expected: str) -> None:
+    assert mime_from_bytes(data) == expected
@@ -0,0 +1,63 @@
+"""Tests for the benchmark stand-in server against the real backend clients."""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+from nanobanana import gemini, openrouter
+from nanobanana.retry import APIError, RetryPolicy
+
+_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "mock_server.py"
+_spec = importlib.util.spec_from_file_location("mock_server", _PATH)
+mock_server = importlib.util.module_from_spec(_spec)
+sys.modules["mock_server"] = mock_server
+_spec.loader.exec_module(mock_server)
+
+_NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with mock_server.serve() as server:
+        for name, value in server.env().items():
+            monkeypatch.setenv(name, value)
+        yield server
+
+
+def _openrouter(tmp_path: Path, size: str = "1K", retry: RetryPolicy | None = None) -> Path:
+    path, _ = openrouter.generate_image_to_file(
+        api_key="k", model="m", prompt="p", input_images=[], aspect_ratio="1:1",
+        image_size=size, output_for_mime=lambda mime: str(tmp_path / "out.png"), retry=retry,
+    )
+    return Path(path)
+
+
+class TestMockServer:
+    """Tests for the synthetic OpenRouter and Gemini endpoints."""
+
+    def test_openrouter_size_follows_request(self, server, tmp_path: Path) -> None:
+        assert _openrouter(tmp_path, "2K").read_bytes() == mock_server.synthetic_image("2K")
+        assert server.counts["requests"] == 1
+
+    def test_gemini(self, server) -> None:
+        data, mime_type = gemini.generate_image(
+            api_key="k", prompt="p", input_images=[], aspect_ratio="1:1",
+            image_size="1K", uploads=None,
+        )
+        assert mime_type == "image/png"
+        assert data == mock_server.synthetic_image("1K")
+
+    def test_injected_errors_are_retryable(self, server, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setattr("nanobanana.retry.time.sleep", lambda s: None)
+        server.error_rate = 1.0
+        server.error_status = 429
+        with pytest.raises(APIError) as excinfo:
+            _openrouter(tmp_path, retry=_NO_RETRY)
+        assert excinfo.value.status_code == 429
+        assert excinfo.value.retry_after == 0
+
+        server.error_rate = 0.5
+        _openrouter(tmp_path, retry=RetryPolicy(max_attempts=20))
+        assert server.counts["errors"] >= 1
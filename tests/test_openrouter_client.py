@@ -0,0 +1,132 @@
+"""Tests for the pooled OpenRouter client: timeouts, limits, connection reuse."""
+
+import asyncio
+import importlib.util
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+from nanobanana import openrouter, timings
+from nanobanana.batch import BatchJob, _run_jobs
+from nanobanana.config import APIConfig, FileConfig
+
+_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "mock_server.py"
+_spec = importlib.util.spec_from_file_location("mock_server", _PATH)
+mock_server = importlib.util.module_from_spec(_spec)
+sys.modules.setdefault("mock_server", mock_server)
+_spec.loader.exec_module(mock_server)
+
+
+class TestClientOptions:
+    """Tests for the httpx arguments derived from the config file."""
+
+    def test_defaults(self) -> None:
+        options = openrouter.client_options()
+        timeout = options["timeout"]
+        assert (timeout.connect, timeout.read, timeout.write, timeout.pool) == (10.0, 120.0, 60.0, None)
+        assert options["limits"].max_connections == openrouter.DEFAULT_MAX_CONNECTIONS
+        assert options["limits"].max_keepalive_connections == openrouter.DEFAULT_MAX_CONNECTIONS
+        assert options["http2"] is False
+
+    def test_config_overrides(self) -> None:
+        config = FileConfig(connect_timeout=3, read_timeout=300, write_timeout=30.5, max_connections=2)
+        options = openrouter.client_options(config, max_connections=16)
+        timeout = options["timeout"]
+        assert (timeout.connect, timeout.read, timeout.write) == (3, 300, 30.5)
+        assert options["limits"].max_connections == 2
+        assert openrouter.client_options(None, max_connections=16)["limits"].max_connections == 16
+
+    @pytest.mark.parametrize("setting", [
+        {"connect_timeout": -1}, {"read_timeout": "slow"}, {"max_connections": True},
+    ])
+    def test_invalid_settings(self, setting: dict) -> None:
+        name = next(iter(setting))
+        with pytest.raises(RuntimeError, match=f"invalid {name}"):
+            openrouter.client_options(FileConfig(**setting))
+
+    def test_http2_without_h2_falls_back(self, monkeypatch, capsys) -> None:
+        monkeypatch.setitem(sys.modules, "h2", None)
+        assert openrouter.client_options(FileConfig(http2=True))["http2"] is False
+        assert "http2 requires the h2 package" in capsys.readouterr().err
+
+
+class TestConnectionReuse:
+    """Tests that concurrent jobs share a few kept-alive connections."""
+
+    def test_batch_reuses_connections(self, tmp_path: Path, monkeypatch) -> None:
+        with mock_server.serve(latency=0.01) as server:
+            monkeypatch.setenv("NANOBANANA_OPENROUTER_URL", server.env()["NANOBANANA_OPENROUTER_URL"])
+            jobs = [
+                BatchJob(line=i, prompt=f"p{i}", aspect="1:1", size="1K", output=str(tmp_path / f"out{i}"))
+                for i in range(12)
+            ]
+            api = APIConfig(use_openrouter=True, api_key="k", model="m")
+            assert asyncio.run(_run_jobs(jobs, api, concurrency=3)) == 0
+        assert server.counts["requests"] == 12
+        assert server.counts["connections"] <= 3
+
+
+class TestCompression:
+    """Tests for compressed transfers and the wire byte counters."""
+
+    def _input(self, tmp_path: Path) -> str:
+        # A JPEG-like incompressible input, as base64 in the request body
+        path = tmp_path / "in.jpg"
+        path.write_bytes(b"\xff\xd8\xff" + random.Random(1).randbytes(300_000))
+        return str(path)
+
+    def test_response_is_compressed(self, monkeypatch) -> None:
+        with mock_server.serve() as server, timings.collect() as report:
+            monkeypatch.setenv("NANOBANANA_OPENROUTER_URL", server.env()["NANOBANANA_OPENROUTER_URL"])
+            with openrouter.create_client() as client:
+                data, _ = openrouter.generate_image("k", "m", "p", [], "1:1", "1K", client=client)
+        assert data == mock_server.synthetic_image("1K")
+        counters = report.report()["bytes"]
+        assert counters["response_wire_bytes"] < 0.8 * counters["response_bytes"]
+        assert "request_wire_bytes" in counters
+        assert server.counts.get("gzip_requests", 0) == 0
+
+    def test_streamed_response_is_decoded(self, tmp_path: Path, monkeypatch) -> None:
+        with mock_server.serve() as server, timings.collect() as report:
+            monkeypatch.setenv("NANOBANANA_OPENROUTER_URL", server.env()["NANOBANANA_OPENROUTER_URL"])
+
+            async def run() -> tuple[str, str]:
+                async with openrouter.create_async_client() as client:
+                    return await openrouter.agenerate_image_to_file(
+                        client, "k", "m", "p", [], "1:1", "1K", lambda mime: str(tmp_path / "out.png"),
+                    )
+
+            path, _ = asyncio.run(run())
+        assert Path(path).read_bytes() == mock_server.synthetic_image("1K")
+        counters = report.report()["bytes"]
+        assert counters["response_wire_bytes"] < 0.8 * counters["response_bytes"]
+
+    def test_compressed_request(self, tmp_path: Path, monkeypatch) -> None:
+        image = self._input(tmp_path)
+        config = FileConfig(compress_requests=True)
+        with mock_server.serve() as server, timings.collect() as report:
+            monkeypatch.setenv("NANOBANANA_OPENROUTER_URL", server.env()["NANOBANANA_OPENROUTER_URL"])
+            with openrouter.create_client(config) as client:
+                openrouter.generate_image("k", "m", "p", [image], "1:1", "2K", client=client)
+
+            async def run() -> None:
+                async with openrouter.create_async_client(config) as client:
+                    await openrouter.agenerate_image(client, "k", "m", "p", [image], "1:1", "2K")
+
+            asyncio.run(run())
+        assert server.counts["gzip_requests"] == 2
+        counters = report.report()["bytes"]
+        assert counters["request_wire_bytes"] < 0.8 * counters["request_bytes"]
+        # The mock read imageSize from the decompressed JSON body
+        assert counters["image_bytes"] == 2 * len(mock_server.synthetic_image("2K"))
+
+    def test_uncompressed_request_wire_bytes_match(self, tmp_path: Path, monkeypatch) -> None:
+        image = self._input(tmp_path)
+        with mock_server.serve() as server, timings.collect() as report:
+            monkeypatch.setenv("NANOBANANA_OPENROUTER_URL", server.env()["NANOBANANA_OPENROUTER_URL"])
+            with openrouter.create_client() as client:
+                openrouter.generate_image("k", "m", "p", [image], "1:1", "1K", client=client)
+        counters = report.report()["bytes"]
+        assert counters["request_wire_bytes"] == counters["request_bytes"]
@@ -0,0 +1,200 @@
+"""Tests for streaming OpenRouter responses straight to disk — no network calls."""
+
+import asyncio
+import base64
+import json
+import tracemalloc
+from pathlib import Path
+
+import httpx
+import pytest
+
+from nanobanana.openrouter import (
+    _IMAGE_URL_PATH,
+    _JSONPathStream,
+    agenerate_image_to_file,
+    generate_image_to_file,
+)
+
+
+def _response_body(image: bytes, mime_type: str = "image/png", escape_slashes: bool = True) -> bytes:
+    b64 = base64.b64encode(image).decode()
+    body = json.dumps({
+        "id": "gen-1",
+        "choices": [{
+            "index": 0,
+            "message": {
+                "role": "assistant",
+                "content": "here you go \"quoted\" \\ text",
+                "images": [{
+                    "type": "image_url",
+                    "image_url": {"url": f"data:{mime_type};base64,{b64}"},
+                }],
+            },
+        }],
+        "usage": {"total_tokens": 1290},
+    })
+    if escape_slashes:
+        # Some encoders escape "/" — present in both MIME types and base64
+        body = body.replace("/", "\\/")
+    return body.encode()
+
+
+def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _client(body: bytes, status: int = 200, chunk_size: int = 65536) -> httpx.Client:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status, content=_chunks(body, chunk_size))
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def _generate(client: httpx.Client, output: Path) -> tuple[str, str]:
+    return generate_image_to_file(
+        api_key="k", model="m", prompt="p", input_images=[],
+        aspect_ratio="1:1", image_size="1K",
+        output_for_mime=lambda mime: str(output.with_suffix(".jpg" if mime == "image/jpeg" else ".png")),
+        client=client,
+    )
+
+
+class TestJSONPathStream:
+    """Tests for the incremental JSON scanner."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 4096])
+    def test_value_found_across_chunk_boundaries(self, chunk_size: int) -> None:
+        image = bytes(range(256)) * 3
+        body = _response_body(image)
+        out = bytearray()
+        scanner = _JSONPathStream(_IMAGE_URL_PATH, out.extend)
+        for chunk in _chunks(body, chunk_size):
+            scanner.feed(chunk)
+        assert scanner.done
+        expected = f"data:image/png;base64,{base64.b64encode(image).decode()}"
+        assert out.decode() == expected
+
+    def test_unicode_escape_in_key(self) -> None:
+        body = b'{"ch\\u006fices": [{"message": {"images": [{"image_url": {"url": "x"}}]}}]}'
+        out = bytearray()
+        scanner = _JSONPathStream(_IMAGE_URL_PATH, out.extend)
+        scanner.feed(body)
+        assert bytes(out) == b"x"
+
+    def test_other_paths_ignored(self) -> None:
+        body = b'{"choices": [{"message": {"images": []}}, {"message": {"images": [{"image_url": {"url": "x"}}]}}]}'
+        scanner = _JSONPathStream(_IMAGE_URL_PATH, lambda chunk: None)
+        scanner.feed(body)
+        assert not scanner.found
+
+
+class TestGenerateImageToFile:
+    """Tests for generate_image_to_file with a mock transport."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 65536])
+    def test_writes_decoded_image(self, tmp_path: Path, chunk_size: int) -> None:
+        image = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+        client = _client(_response_body(image), chunk_size=chunk_size)
+        path, mime_type = _generate(client, tmp_path / "out")
+        assert mime_type == "image/png"
+        assert Path(path).read_bytes() == image
+        assert [p.name for p in tmp_path.iterdir()] == ["out.png"]
+
+    def test_extension_follows_mime(self, tmp_path: Path) -> None:
+        client = _client(_response_body(b"\xff\xd8\xff", "image/jpeg", escape_slashes=False))
+        path, mime_type = _generate(client, tmp_path / "out")
+        assert mime_type == "image/jpeg"
+        assert path == str(tmp_path / "out.jpg")
+
+    def test_http_error_status(self, tmp_path: Path) -> None:
+        client = _client(b'{"error": "nope"}', status=401)
+        with pytest.raises(RuntimeError, match="HTTP error: 401"):
+            _generate(client, tmp_path / "out")
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.parametrize(
+        "body, match",
+        [
+            ({"error": {"message": "quota exceeded"}}, "API error: quota exceeded"),
+            ({"choices": []}, "no choices"),
+            ({"choices": [{"message": {"content": "sorry"}}]}, "no images"),
+            ({"choices": [{"message": {"images": [{"image_url": {"url": "https://x/y.png"}}]}}]},
+             "unexpected image URL format"),
+        ],
+    )
+    def test_error_bodies(self, tmp_path: Path, body: dict, match: str) -> None:
+        client = _client(json.dumps(body).encode(), chunk_size=5)
+        with pytest.raises(RuntimeError, match=match):
+            _generate(client, tmp_path / "out")
+        assert list(tmp_path.iterdir()) == []
+
+    def test_truncated_response_leaves_no_file(self, tmp_path: Path) -> None:
+        body = _response_body(b"x" * 4000)
+        client = _client(body[:len(body) // 2], chunk_size=100)
+        with pytest.raises(RuntimeError, match="ended inside image data"):
+            _generate(client, tmp_path / "out")
+        assert list(tmp_path.iterdir()) == []
+
+    def test_transport_error(self, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setattr("nanobanana.retry.time.sleep", lambda s: None)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("boom")
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        with pytest.raises(RuntimeError, match="request failed: boom"):
+            _generate(client, tmp_path / "out")
+
+    def test_retry_restarts_stream(self, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setattr("nanobanana.retry.time.sleep", lambda s: None)
+        image = bytes(range(256)) * 16
+        body = _response_body(image)
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(503, text="overloaded")
+            return httpx.Response(200, content=_chunks(body, 100))
+
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        path, _ = _generate(client, tmp_path / "out")
+        assert len(calls) == 2
+        assert Path(path).read_bytes() == image
+        assert [p.name for p in tmp_path.iterdir()] == ["out.png"]
+
+    def test_peak_memory_below_image_size(self, tmp_path: Path) -> None:
+        image = bytes(range(256)) * (8 * 1024 * 4)  # 8 MiB
+        body = _response_body(image, escape_slashes=False)
+        client = _client(body)
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            path, _ = _generate(client, tmp_path / "out")
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert Path(path).stat().st_size == len(image)
+        assert peak < len(image) // 4, f"peak {peak} bytes"
+
+    def test_async_variant(self, tmp_path: Path) -> None:
+        image = bytes(range(256)) * 4
+        body = _response_body(image)
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            async def stream():
+                for chunk in _chunks(body, 7):
+                    yield chunk
+            return httpx.Response(200, content=stream())
+
+        async def go() -> tuple[str, str]:
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await agenerate_image_to_file(
+                    client, api_key="k", model="m", prompt="p", input_images=[],
+                    aspect_ratio="1:1", image_size="1K",
+                    output_for_mime=lambda mime: str(tmp_path / "out.png"),
+                )
+
+        path, mime_type = asyncio.run(go())
+        assert mime_type == "image/png"
+        assert Path(path).read_bytes() == image
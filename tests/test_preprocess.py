@@ -0,0 +1,152 @@
+"""Tests for input downscaling before upload — no network calls."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from nanobanana.config import FileConfig
+from nanobanana.preprocess import prepare_inputs
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _noisy_image(path: Path, size: tuple[int, int], mode: str = "RGB") -> Path:
+    # Random pixels so the original doesn't compress to almost nothing
+    img = Image.frombytes(mode, size, os.urandom(size[0] * size[1] * len(mode)))
+    img.save(path)
+    return path
+
+
+@pytest.fixture
+def root(tmp_path: Path) -> Path:
+    return tmp_path / "inputs-cache"
+
+
+class TestPrepareInputs:
+    """Tests for resize, re-encode, and caching of prepared inputs."""
+
+    def test_large_input_downscaled_to_bound(self, tmp_path: Path, root: Path) -> None:
+        src = _noisy_image(tmp_path / "photo.png", (1200, 600))
+        prepared = prepare_inputs([str(src)], "1K", root=root)
+        [path] = prepared.paths
+        assert path.endswith(".webp")
+        with Image.open(path) as img:
+            assert img.size == (1024, 512)
+        assert prepared.original_bytes == src.stat().st_size
+        assert prepared.prepared_bytes == Path(path).stat().st_size
+        assert prepared.saved_bytes > 0
+
+    def test_bound_follows_size(self, tmp_path: Path, root: Path) -> None:
+        src = _noisy_image(tmp_path / "photo.png", (1200, 600))
+        # Fits within the 2K bound, so it is sent untouched
+        assert prepare_inputs([str(src)], "2K", root=root).paths == [str(src)]
+
+    def test_jpeg_format_and_quality(self, tmp_path: Path, root: Path) -> None:
+        src = _noisy_image(tmp_path / "photo.png", (1100, 1100))
+        config = FileConfig(input_format="jpeg", input_quality=50)
+        [path] = prepare_inputs([str(src)], "1K", config, root=root).paths
+        assert path.endswith(".jpg")
+
+    def test_transparent_input_kept_for_jpeg(self, tmp_path: Path, root: Path) -> None:
+        src = _noisy_image(tmp_path / "logo.png", (1100, 1100), mode="RGBA")
+        config = FileConfig(input_format="jpeg")
+        assert prepare_inputs([str(src)], "1K", config, root=root).paths == [str(src)]
+
+    def test_small_input_kept(self, tmp_path: Path, root: Path) -> None:
+        src = tmp_path / "tiny.png"
+        Image.new("RGB", (64, 64), "red").save(src)
+        prepared = prepare_inputs([str(src)], "1K", root=root)
+        assert prepared.paths == [str(src)]
+        assert prepared.saved_bytes == 0
+
+    def test_unreadable_inputs_pass_through(self, tmp_path: Path, root: Path) -> None:
+        not_image = tmp_path / "notes.png"
+        not_image.write_text("not an image")
+        missing = str(tmp_path / "missing.png")
+        prepared = prepare_inputs([str(not_image), missing], "1K", root=root)
+        assert prepared.paths == [str(not_image), missing]
+
+    def test_cached_by_path_and_mtime(self, tmp_path: Path, root: Path, monkeypatch) -> None:
+        src = _noisy_image(tmp_path / "photo.png", (1100, 1100))
+        first = prepare_inputs([str(src)], "1K", root=root).paths
+
+        calls: list[str] = []
+        monkeypatch.setattr("nanobanana.preprocess._shrink", lambda *a: calls.append(a[0]))
+        assert prepare_inputs([str(src)], "1K", root=root).paths == first
+        assert calls == []
+
+        # A modified file is prepared again
+        os.utime(src, ns=(0, 1_000_000_000))
+        prepare_inputs([str(src)], "1K", root=root)
+        assert calls == [str(src)]
+
+    def test_keep_decision_cached(self, tmp_path: Path, root: Path, monkeypatch) -> None:
+        src = tmp_path / "tiny.png"
+        Image.new("RGB", (64, 64), "red").save(src)
+        prepare_inputs([str(src)], "1K", root=root)
+
+        calls: list[str] = []
+        monkeypatch.setattr("nanobanana.preprocess._shrink", lambda *a: calls.append(a[0]))
+        assert prepare_inputs([str(src)], "1K", root=root).paths == [str(src)]
+        assert calls == []
+
+    def test_several_inputs_use_executor(self, tmp_path: Path, root: Path) -> None:
+        sources = [str(_noisy_image(tmp_path / f"in{i}.png", (1200, 800))) for i in range(3)]
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            prepared = prepare_inputs(sources, "1K", root=root, executor=pool)
+        assert all(p.endswith(".webp") for p in prepared.paths)
+        assert len(set(prepared.paths)) == 3
+
+    def test_process_pool(self, tmp_path: Path, root: Path) -> None:
+        sources = [str(_noisy_image(tmp_path / f"in{i}.png", (1200, 800))) for i in range(2)]
+        prepared = prepare_inputs(sources, "1K", root=root)
+        assert all(p.endswith(".webp") for p in prepared.paths)
+
+    @pytest.mark.parametrize(
+        "config, match",
+        [
+            (FileConfig(input_format="gif"), "invalid input_format"),
+            (FileConfig(input_quality=101), "invalid input_quality"),
+        ],
+    )
+    def test_invalid_options(self, config: FileConfig, match: str) -> None:
+        with pytest.raises(RuntimeError, match=match):
+            prepare_inputs(["x.png"], "1K", config)
+
+
+class TestCLIIntegration:
+    """Tests for -raw-inputs and the upload savings line."""
+
+    @pytest.fixture
+    def sent(self, tmp_path: Path, monkeypatch) -> list[list[str]]:
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setenv("GEMINI_API_KEY", "k")
+        monkeypatch.setenv("NANOBANANA_NO_DAEMON", "1")
+        monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+        calls: list[list[str]] = []
+
+        def fake_generate(**kwargs):
+            calls.append(kwargs["input_images"])
+            return b"img", "image/png"
+
+        monkeypatch.setattr("nanobanana.gemini.generate_image", fake_generate)
+        return calls
+
+    def test_inputs_downscaled(self, tmp_path: Path, sent, capsys) -> None:
+        from nanobanana.cli import run
+
+        src = _noisy_image(tmp_path / "photo.png", (1200, 800))
+        run(["-no-cache", "-i", str(src), "-o", str(tmp_path / "out.png"), "edit this"])
+        assert sent[0][0].endswith(".webp")
+        assert "Upload:" in capsys.readouterr().out
+
+    def test_raw_inputs(self, tmp_path: Path, sent, capsys) -> None:
+        from nanobanana.cli import run
+
+        src = _noisy_image(tmp_path / "photo.png", (1200, 800))
+        run(["-no-cache", "-raw-inputs", "-i", str(src), "-o", str(tmp_path / "out.png"), "x"])
+        assert sent == [[str(src)]]
+        assert "Upload:" not in capsys.readouterr().out
@@ -0,0 +1,152 @@
+"""Tests for the cross-process rate limiter — no network calls."""
+
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from nanobanana.config import APIConfig, FileConfig
+from nanobanana.ratelimit import STATE_FILENAME, RateLimiter, open_rate_limiter
+from nanobanana.retry import APIError, RetryPolicy, call_with_retry
+
+SRC = str(Path(__file__).resolve().parent.parent / "src")
+
+
+@pytest.fixture
+def config_home(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    return tmp_path / "config" / "nanobanana"
+
+
+class TestOpenRateLimiter:
+    """Tests for building a limiter from the config file settings."""
+
+    def test_disabled_by_default(self, config_home: Path) -> None:
+        assert open_rate_limiter(None, APIConfig(api_key="k")) is None
+        assert open_rate_limiter(FileConfig(), APIConfig(api_key="k")) is None
+
+    def test_state_next_to_config(self, config_home: Path) -> None:
+        limiter = open_rate_limiter(FileConfig(rate_limit_rpm=60), APIConfig(api_key="secret-key"))
+        assert limiter.path == config_home / STATE_FILENAME
+        with limiter.slot():
+            pass
+        state = json.loads(limiter.path.read_text())
+        assert "secret-key" not in json.dumps(state)  # key only appears hashed
+
+    def test_scoped_by_backend_and_key(self, config_home: Path) -> None:
+        config = FileConfig(max_inflight=1)
+        scopes = {
+            open_rate_limiter(config, APIConfig(api_key="a")).scope,
+            open_rate_limiter(config, APIConfig(api_key="b")).scope,
+            open_rate_limiter(config, APIConfig(use_openrouter=True, api_key="a")).scope,
+        }
+        assert len(scopes) == 3
+
+    @pytest.mark.parametrize(
+        "config, match",
+        [
+            (FileConfig(rate_limit_rpm=-1), "invalid rate_limit_rpm"),
+            (FileConfig(max_inflight="4"), "invalid max_inflight"),
+        ],
+    )
+    def test_invalid_settings(self, config_home: Path, config: FileConfig, match: str) -> None:
+        with pytest.raises(RuntimeError, match=match):
+            open_rate_limiter(config, APIConfig(api_key="k"))
+
+
+class TestRateLimiter:
+    """Tests for the token bucket and in-flight cap."""
+
+    def test_bucket_allows_burst_then_waits(self, tmp_path: Path) -> None:
+        limiter = RateLimiter(tmp_path / STATE_FILENAME, "s", rpm=60)
+        assert limiter.burst == 6
+        assert [limiter._try_acquire(str(i)) for i in range(6)] == [0.0] * 6
+        assert limiter._try_acquire("late") == pytest.approx(1.0, abs=0.05)
+
+    def test_tokens_shared_between_instances(self, tmp_path: Path) -> None:
+        path = tmp_path / STATE_FILENAME
+        for i in range(6):
+            assert RateLimiter(path, "s", rpm=60)._try_acquire(str(i)) == 0.0
+        assert RateLimiter(path, "s", rpm=60)._try_acquire("x") > 0
+        assert RateLimiter(path, "other", rpm=60)._try_acquire("x") == 0.0
+
+    def test_inflight_cap(self, tmp_path: Path) -> None:
+        limiter = RateLimiter(tmp_path / STATE_FILENAME, "s", max_inflight=2)
+        assert limiter._try_acquire("a") == 0.0
+        assert limiter._try_acquire("b") == 0.0
+        assert limiter._try_acquire("c") > 0
+        limiter._release("a")
+        assert limiter._try_acquire("c") == 0.0
+
+    def test_slot_released_on_error(self, tmp_path: Path) -> None:
+        limiter = RateLimiter(tmp_path / STATE_FILENAME, "s", max_inflight=1)
+        with pytest.raises(ValueError):
+            with limiter.slot():
+                raise ValueError("boom")
+        assert limiter._try_acquire("next") == 0.0
+
+    def test_dead_process_slot_reclaimed(self, tmp_path: Path) -> None:
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        path = tmp_path / STATE_FILENAME
+        path.write_text(json.dumps({"s": {
+            "tokens": 1, "updated": 0, "inflight": {"old": [dead.pid, 1e12]},
+        }}))
+        assert RateLimiter(path, "s", max_inflight=1)._try_acquire("new") == 0.0
+
+    def test_corrupt_state_reset(self, tmp_path: Path) -> None:
+        path = tmp_path / STATE_FILENAME
+        path.write_text("{not json")
+        assert RateLimiter(path, "s", rpm=60)._try_acquire("a") == 0.0
+
+    def test_unusable_state_file_does_not_block(self, tmp_path: Path) -> None:
+        limiter = RateLimiter(tmp_path / "missing-dir" / STATE_FILENAME, "s", max_inflight=1)
+        with limiter.slot():
+            with limiter.slot():
+                pass
+
+    def test_processes_queue(self, tmp_path: Path) -> None:
+        script = textwrap.dedent(f"""
+            import sys, time
+            sys.path.insert(0, {SRC!r})
+            from pathlib import Path
+            from nanobanana.ratelimit import RateLimiter
+            limiter = RateLimiter(Path({str(tmp_path / STATE_FILENAME)!r}), "s", max_inflight=1)
+            with limiter.slot():
+                start = time.time()
+                time.sleep(0.2)
+                print(start, time.time())
+        """)
+        procs = [
+            subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True)
+            for _ in range(3)
+        ]
+        spans = sorted(tuple(map(float, p.communicate()[0].split())) for p in procs)
+        assert all(p.returncode == 0 for p in procs)
+        for (_, end), (start, _) in zip(spans, spans[1:]):
+            assert start >= end
+
+
+class TestRetryIntegration:
+    """Tests for attempts taking limiter slots."""
+
+    def test_each_attempt_takes_a_slot(self, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setattr("nanobanana.retry.time.sleep", lambda s: None)
+        limiter = RateLimiter(tmp_path / STATE_FILENAME, "s", rpm=600, max_inflight=1)
+        calls = []
+
+        def fn() -> str:
+            state = json.loads(limiter.path.read_text())
+            calls.append(len(state["s"]["inflight"]))
+            if len(calls) < 3:
+                raise APIError("busy", status_code=429)
+            return "ok"
+
+        assert call_with_retry(fn, RetryPolicy(limiter=limiter)) == "ok"
+        assert calls == [1, 1, 1]
+        state = json.loads(limiter.path.read_text())
+        assert state["s"]["inflight"] == {}
+        assert state["s"]["tokens"] == pytest.approx(57, abs=0.5)
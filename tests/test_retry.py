@@ -0,0 +1,194 @@
+"""Tests for the shared retry policy and backend error classification."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from nanobanana.retry import (
+    APIError,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+    parse_retry_after,
+    transport_error,
+)
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list[float]:
+    waited: list[float] = []
+    monkeypatch.setattr("nanobanana.retry.time.sleep", waited.append)
+
+    async def fake_sleep(delay: float) -> None:
+        waited.append(delay)
+
+    monkeypatch.setattr("nanobanana.retry.asyncio.sleep", fake_sleep)
+    return waited
+
+
+def _failing(errors: list[Exception], result: str = "ok"):
+    calls = []
+
+    def fn() -> str:
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return fn, calls
+
+
+class TestClassification:
+    """Tests for which failures are worth retrying."""
+
+    @pytest.mark.parametrize("status", [408, 429, 500, 502, 503, 504])
+    def test_retryable_status(self, status: int) -> None:
+        assert APIError("x", status_code=status).retryable
+
+    @pytest.mark.parametrize("status", [400, 401, 403, 404, None])
+    def test_fatal_status(self, status: int | None) -> None:
+        assert not APIError("x", status_code=status).retryable
+
+    @pytest.mark.parametrize(
+        "error, retryable",
+        [
+            (httpx.ConnectError("reset"), True),
+            (httpx.ReadTimeout("slow"), True),
+            (httpx.RemoteProtocolError("eof"), True),
+            (httpx.UnsupportedProtocol("ftp"), False),
+        ],
+    )
+    def test_transport_errors(self, error: httpx.HTTPError, retryable: bool) -> None:
+        result = transport_error(error)
+        assert result.retryable is retryable
+        assert str(result).startswith("request failed: ")
+
+    def test_retry_after_seconds(self) -> None:
+        assert parse_retry_after("7") == 7.0
+
+    def test_retry_after_http_date(self) -> None:
+        when = datetime.now(UTC) + timedelta(seconds=30)
+        assert 25 < parse_retry_after(format_datetime(when, usegmt=True)) <= 30
+
+    @pytest.mark.parametrize("value", [None, "", "soon"])
+    def test_retry_after_invalid(self, value: str | None) -> None:
+        assert parse_retry_after(value) is None
+
+
+class TestRetryPolicy:
+    """Tests for backoff, jitter, and giving up."""
+
+    def test_backoff_is_capped_with_jitter(self) -> None:
+        policy = RetryPolicy(max_attempts=10, base_delay=1.0, max_delay=5.0)
+        error = APIError("x", status_code=503)
+        delays = [policy.delay(attempt, error) for attempt in range(1, 10) for _ in range(20)]
+        assert all(0 <= d <= 5.0 for d in delays)
+        assert max(policy.delay(1, error) for _ in range(50)) <= 1.0
+        assert len(set(delays)) > 1
+
+    def test_retry_after_honored(self) -> None:
+        assert RetryPolicy().delay(1, APIError("x", status_code=429, retry_after=12)) == 12
+
+    def test_long_retry_after_gives_up(self) -> None:
+        policy = RetryPolicy(max_retry_after=60)
+        assert policy.delay(1, APIError("x", status_code=429, retry_after=3600)) is None
+
+    def test_retries_then_succeeds(self, sleeps: list[float]) -> None:
+        reported = []
+        policy = RetryPolicy(on_retry=lambda attempt, error, delay: reported.append(attempt))
+        fn, calls = _failing([
+            APIError("busy", status_code=429, retry_after=2),
+            APIError("down", status_code=503),
+        ])
+        assert call_with_retry(fn, policy) == "ok"
+        assert len(calls) == 3
+        assert reported == [1, 2]
+        assert sleeps[0] == 2
+
+    def test_fatal_error_not_retried(self, sleeps: list[float]) -> None:
+        fn, calls = _failing([APIError("HTTP error: 401", status_code=401)])
+        with pytest.raises(APIError, match="401"):
+            call_with_retry(fn)
+        assert len(calls) == 1
+        assert sleeps == []
+
+    def test_gives_up_after_max_attempts(self, sleeps: list[float]) -> None:
+        fn, calls = _failing([APIError("down", status_code=503) for _ in range(5)])
+        with pytest.raises(APIError, match="down"):
+            call_with_retry(fn, RetryPolicy(max_attempts=3))
+        assert len(calls) == 3
+
+    def test_plain_runtime_error_not_retried(self) -> None:
+        fn, calls = _failing([RuntimeError("no images in response")])
+        with pytest.raises(RuntimeError, match="no images"):
+            call_with_retry(fn)
+        assert len(calls) == 1
+
+    def test_async(self, sleeps: list[float]) -> None:
+        fn, calls = _failing([APIError("busy", status_code=429)])
+
+        async def afn() -> str:
+            return fn()
+
+        assert asyncio.run(acall_with_retry(afn)) == "ok"
+        assert len(calls) == 2
+        assert len(sleeps) == 1
+
+    def test_describe(self) -> None:
+        policy = RetryPolicy(max_attempts=4)
+        message = policy.describe(1, APIError("x", status_code=429), 2.0)
+        assert message == "retry 1/3 after HTTP 429, waiting 2.0s"
+
+
+class TestBackends:
+    """Tests for backend errors surfacing as classified APIError."""
+
+    def test_openrouter_honors_retry_after(self, sleeps: list[float]) -> None:
+        from nanobanana.openrouter import generate_image
+
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "3"}, text="slow down"),
+            httpx.Response(200, json={"choices": [{"message": {"images": [
+                {"image_url": {"url": "data:image/png;base64,AAAA"}},
+            ]}}]}),
+        ]
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+        result = generate_image("k", "m", "p", [], "1:1", "1K", client=client)
+        assert result == (b"\0\0\0", "image/png")
+        assert sleeps == [3.0]
+
+    def test_openrouter_unauthorized_is_fatal(self, sleeps: list[float]) -> None:
+        from nanobanana.openrouter import generate_image
+
+        client = httpx.Client(transport=httpx.MockTransport(
+            lambda request: httpx.Response(401, text="bad key"),
+        ))
+        with pytest.raises(APIError, match="HTTP error: 401") as exc:
+            generate_image("k", "m", "p", [], "1:1", "1K", client=client)
+        assert exc.value.status_code == 401
+        assert sleeps == []
+
+    def test_openrouter_error_body_code(self) -> None:
+        from nanobanana.openrouter import _extract_data_url
+
+        with pytest.raises(APIError, match="API error: Rate limit") as exc:
+            _extract_data_url({"error": {"code": 429, "message": "Rate limit exceeded"}})
+        assert exc.value.retryable
+
+    def test_gemini_sdk_errors(self) -> None:
+        from google.genai import errors
+
+        from nanobanana.gemini import _request_error
+
+        response = httpx.Response(429, headers={"Retry-After": "5"})
+        error = _request_error(errors.ClientError(429, {"error": {"message": "quota"}}, response))
+        assert isinstance(error, APIError)
+        assert error.retryable
+        assert error.retry_after == 5.0
+
+        fatal = _request_error(errors.ClientError(400, {"error": {"message": "bad"}}))
+        assert not fatal.retryable
+        assert str(fatal).startswith("request failed: ")
@@ -0,0 +1,142 @@
+"""Import-time regression tests for CLI cold start.
+
+Budgets are deliberately generous (several times the measured cost) so they
+catch structural regressions — an eager heavy import, template bodies loaded
+at start-up — rather than machine noise. Scale them on slow runners with
+NANOBANANA_IMPORT_BUDGET_SCALE.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+_SRC = str(Path(__file__).resolve().parent.parent / "src")
+_SCALE = float(os.environ.get("NANOBANANA_IMPORT_BUDGET_SCALE", "1"))
+
+# Cumulative import time budgets in milliseconds (python -X importtime)
+CLI_IMPORT_BUDGET_MS = 150 * _SCALE
+OPENROUTER_PATH_BUDGET_MS = 500 * _SCALE
+GEMINI_PATH_BUDGET_MS = 3000 * _SCALE
+# Wall-clock budget for a whole `nanobanana version` process
+VERSION_WALL_BUDGET_S = 1.0 * _SCALE
+
+
+def _python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": _SRC, "NANOBANANA_NO_DAEMON": "1"}
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=60,
+        check=True,
+    )
+
+
+def _cumulative_import_ms(modules: list[str]) -> float:
+    """Return the summed cumulative import time of the given top-level imports."""
+    code = "; ".join(f"import {m}" for m in modules)
+    result = _python(code, "-X", "importtime")
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() in modules and not parts[2].startswith("  "):
+            total_us += int(parts[1])
+    assert total_us, f"no import timings found for {modules}"
+    return total_us / 1000
+
+
+def test_cli_import_skips_backends_and_template_bodies() -> None:
+    result = _python(
+        "import sys, nanobanana.cli\n"
+        "from nanobanana.templates import load_template\n"
+        "heavy = ['google.genai', 'httpx', 'importlib.metadata',\n"
+        "         'nanobanana.gemini', 'nanobanana.openrouter', 'nanobanana.telemetry']\n"
+        "print([m for m in heavy if m in sys.modules])\n"
+        "print(load_template.cache_info().currsize)"
+    )
+    loaded, templates_read = result.stdout.split("\n")[:2]
+    assert loaded == "[]"
+    assert templates_read == "0"
+
+
+def test_generation_skips_unused_features(tmp_path: Path) -> None:
+    """Without hedging configured or a daemon allowed, neither module is imported."""
+    result = _python(
+        "import os, sys, io, contextlib\n"
+        f"os.environ.update(XDG_CONFIG_HOME={str(tmp_path)!r}, XDG_CACHE_HOME={str(tmp_path)!r},\n"
+        "                  OPENROUTER_API_KEY='k')\n"
+        "os.environ.pop('GEMINI_API_KEY', None)\n"
+        "import nanobanana.openrouter as openrouter\n"
+        "def fake(**kwargs):\n"
+        "    path = kwargs['output_for_mime']('image/png')\n"
+        "    open(path, 'wb').write(b'img')\n"
+        "    return path, 'image/png'\n"
+        "openrouter.generate_image_to_file = fake\n"
+        "from nanobanana.cli import run\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        f"    run(['-no-cache', '-o', {str(tmp_path / 'out.png')!r}, 'a cat'])\n"
+        "print([m for m in ('nanobanana.daemon', 'nanobanana.hedge') if m in sys.modules])"
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_help_reads_no_template_bodies() -> None:
+    result = _python(
+        "import io, contextlib\n"
+        "from nanobanana.cli import run\n"
+        "from nanobanana.templates import load_template\n"
+        "with contextlib.redirect_stderr(io.StringIO()):\n"
+        "    run(['help'])\n"
+        "    run(['help', 'slide', 'templates'])\n"
+        "print(load_template.cache_info().currsize)"
+    )
+    assert result.stdout.strip() == "0"
+
+
+def test_template_body_loaded_on_use() -> None:
+    from nanobanana.slide_templates import get_slide_template
+    from nanobanana.templates import get_command
+
+    assert "SOURCE MATERIAL" in get_command("icon").template
+    assert "{user_prompt}" in get_slide_template("voc").template
+
+
+def test_cli_import_budget() -> None:
+    elapsed = _cumulative_import_ms(["nanobanana.cli"])
+    assert elapsed < CLI_IMPORT_BUDGET_MS, f"import nanobanana.cli took {elapsed:.0f} ms"
+
+
+@pytest.mark.parametrize(
+    "backend, budget",
+    [
+        ("nanobanana.openrouter", OPENROUTER_PATH_BUDGET_MS),
+        ("nanobanana.gemini", GEMINI_PATH_BUDGET_MS),
+    ],
+)
+def test_generation_path_import_budget(backend: str, budget: float) -> None:
+    elapsed = _cumulative_import_ms(["nanobanana.cli", backend])
+    assert elapsed < budget, f"generation path via {backend} took {elapsed:.0f} ms"
+
+
+def test_version_wall_clock_budget(tmp_path: Path) -> None:
+    env = {
+        **os.environ,
+        "PYTHONPATH": _SRC,
+        "XDG_CONFIG_HOME": str(tmp_path),
+        "NANOBANANA_NO_DAEMON": "1",
+    }
+    start = time.monotonic()
+    result = subprocess.run(
+        [sys.executable, "-m", "nanobanana", "version"],
+        capture_output=True, text=True, env=env, timeout=60,
+    )
+    elapsed = time.monotonic() - start
+    assert result.returncode == 0
+    assert result.stdout.startswith("nanobanana ")
+    assert elapsed < VERSION_WALL_BUDGET_S, f"nanobanana version took {elapsed:.2f} s"
@@ -0,0 +1,205 @@
+"""Tests for trace and Prometheus export — no network calls."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from nanobanana import timings
+from nanobanana.retry import APIError
+from nanobanana.telemetry import (
+    build_trace,
+    error_class,
+    export,
+    post_otlp,
+    render_prometheus,
+    update_prometheus,
+)
+
+
+def _run(error: BaseException | None = None, **attributes) -> timings.Timings:
+    with timings.collect() as report:
+        timings.annotate(backend="gemini", model="m", command="slide", size="2K", **attributes)
+        with timings.phase("backend"):
+            with timings.phase("request"):
+                time.sleep(0.01)
+            timings.count("image_bytes", 1000)
+        with timings.phase("write"):
+            pass
+        if error is not None:
+            report.fail(error)
+    return report
+
+
+def _spans(trace: dict) -> dict[str, dict]:
+    spans = trace["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    return {span["name"]: span for span in spans}
+
+
+class TestErrorClass:
+    """Tests for outcome classification."""
+
+    @pytest.mark.parametrize(
+        "error, expected",
+        [
+            (None, "ok"),
+            (APIError("x", status_code=429), "rate_limited"),
+            (APIError("x", status_code=503), "server_error"),
+            (APIError("x", status_code=401), "client_error"),
+            (APIError("request failed: reset", retryable=True), "transport_error"),
+            (RuntimeError("no images in response"), "error"),
+            (KeyboardInterrupt(), "interrupted"),
+        ],
+    )
+    def test_classes(self, error, expected: str) -> None:
+        assert error_class(error) == expected
+
+
+class TestTrace:
+    """Tests for OTLP/JSON span export."""
+
+    def test_spans_nest_under_root(self) -> None:
+        spans = _spans(build_trace(_run()))
+        root = spans["nanobanana.generate"]
+        assert spans["backend"]["parentSpanId"] == root["spanId"]
+        assert spans["request"]["parentSpanId"] == spans["backend"]["spanId"]
+        assert spans["write"]["parentSpanId"] == root["spanId"]
+        assert {s["traceId"] for s in spans.values()} == {root["traceId"]}
+        assert root["status"] == {"code": 1}
+        assert int(root["endTimeUnixNano"]) - int(root["startTimeUnixNano"]) >= 10_000_000
+        attributes = {a["key"]: a["value"] for a in root["attributes"]}
+        assert attributes["nanobanana.command"] == {"stringValue": "slide"}
+        assert attributes["nanobanana.image_bytes"] == {"intValue": "1000"}
+
+    def test_error_status(self) -> None:
+        root = _spans(build_trace(_run(APIError("busy", status_code=429))))["nanobanana.generate"]
+        assert root["status"] == {"code": 2, "message": "busy"}
+
+    def test_post_to_collector(self) -> None:
+        received: list[tuple[str, dict]] = []
+
+        class Collector(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                received.append((self.path, json.loads(body)))
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Collector)
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        try:
+            post_otlp(build_trace(_run()), f"http://127.0.0.1:{server.server_port}")
+        finally:
+            server.shutdown()
+            server.server_close()
+        [(path, body)] = received
+        assert path == "/v1/traces"
+        assert "nanobanana.generate" in _spans(body)
+
+
+class TestPrometheus:
+    """Tests for textfile counters and histograms."""
+
+    def test_runs_accumulate(self, tmp_path: Path) -> None:
+        prom = tmp_path / "nanobanana.prom"
+        state = tmp_path / "state.json"
+        update_prometheus(_run(), str(prom), state)
+        update_prometheus(_run(), str(prom), state)
+        update_prometheus(_run(APIError("busy", status_code=429)), str(prom), state)
+        text = prom.read_text()
+        labels = 'backend="gemini",command="slide",model="m",size="2K"'
+        status = 'backend="gemini",cache="miss",command="slide",model="m",size="2K",status='
+        assert f'nanobanana_generations_total{{{status}"ok"}} 2' in text
+        assert f'nanobanana_generations_total{{{status}"rate_limited"}} 1' in text
+        assert f'nanobanana_generation_duration_seconds_bucket{{{labels},le="1"}} 2' in text
+        assert f'nanobanana_generation_duration_seconds_count{{{labels}}} 2' in text
+        assert 'nanobanana_bytes_total{backend="gemini",command="slide",direction="image",' in text
+        assert "# TYPE nanobanana_generation_duration_seconds histogram" in text
+
+    def test_label_escaping(self) -> None:
+        metrics = {"counters": {"nanobanana_generations_total": {
+            json.dumps([["model", 'a"b\\c']]): 1,
+        }}}
+        assert 'model="a\\"b\\\\c"' in render_prometheus(metrics)
+
+    def test_export_failure_is_a_warning(self, tmp_path: Path, capsys) -> None:
+        export(_run(), {"trace_file": str(tmp_path / "missing" / "traces.jsonl")})
+        assert "telemetry export" in capsys.readouterr().err
+
+
+class TestCLI:
+    """Tests for telemetry wired into the CLI."""
+
+    def test_env_vars_enable_export(self, tmp_path: Path, monkeypatch) -> None:
+        from nanobanana.cli import run
+
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setenv("GEMINI_API_KEY", "k")
+        monkeypatch.setenv("NANOBANANA_NO_DAEMON", "1")
+        monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+        monkeypatch.setenv("NANOBANANA_TRACE_FILE", str(tmp_path / "traces.jsonl"))
+        monkeypatch.setenv("NANOBANANA_PROMETHEUS_FILE", str(tmp_path / "nanobanana.prom"))
+        monkeypatch.setattr(
+            "nanobanana.gemini.generate_image", lambda **kwargs: (b"img", "image/png"),
+        )
+
+        run(["-no-cache", "-o", str(tmp_path / "out.png"), "dashboard", "MRR"])
+        [line] = (tmp_path / "traces.jsonl").read_text().splitlines()
+        spans = _spans(json.loads(line))
+        assert {"nanobanana.generate", "config", "resolve", "backend", "write"} <= set(spans)
+        text = (tmp_path / "nanobanana.prom").read_text()
+        assert 'command="dashboard"' in text
+        assert 'status="ok"' in text
+
+    def test_batch_exports_each_job(self, tmp_path: Path, monkeypatch) -> None:
+        import asyncio
+
+        from nanobanana.batch import run_batch
+
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setenv("OPENROUTER_API_KEY", "k")
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        monkeypatch.setenv("NANOBANANA_TRACE_FILE", str(tmp_path / "traces.jsonl"))
+        monkeypatch.setenv("NANOBANANA_PROMETHEUS_FILE", str(tmp_path / "nanobanana.prom"))
+
+        async def fake_generate(client, *, prompt, output_for_mime, **kwargs):
+            await asyncio.sleep(0.01)
+            if prompt == "fails":
+                raise RuntimeError("HTTP error: 500")
+            output_path = output_for_mime("image/png")
+            Path(output_path).write_bytes(b"img")
+            return output_path, "image/png"
+
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", fake_generate)
+        manifest = tmp_path / "jobs.jsonl"
+        manifest.write_text(
+            '{"prompt": "ok", "command": "dashboard"}\n{"prompt": "fails"}\n'
+        )
+        with pytest.raises(RuntimeError, match="1 of 2 jobs failed"):
+            run_batch(str(manifest), use_cache=False)
+
+        traces = [json.loads(line) for line in (tmp_path / "traces.jsonl").read_text().splitlines()]
+        assert len(traces) == 2
+        assert all("queue" in _spans(trace) for trace in traces)
+        text = (tmp_path / "nanobanana.prom").read_text()
+        assert 'command="dashboard"' in text
+        assert 'command="generate"' in text
+        assert 'status="ok"' in text
+        assert 'status="error"' in text
+
+        # Jobs skipped as up to date generate nothing, so export nothing
+        (tmp_path / "traces.jsonl").unlink()
+        manifest.write_text('{"prompt": "ok", "command": "dashboard"}\n')
+        run_batch(str(manifest), use_cache=False)
+        assert not (tmp_path / "traces.jsonl").exists()
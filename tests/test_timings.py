@@ -0,0 +1,165 @@
+"""Tests for per-phase timing and the -timings report — no network calls."""
+
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from nanobanana import timings
+
+IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+
+class TestPhases:
+    """Tests for phase accounting."""
+
+    def test_noop_when_not_collecting(self) -> None:
+        assert not timings.enabled()
+        with timings.phase("x"):
+            timings.count("request_bytes", 10)
+        assert timings.phase("x") is timings.phase("y")
+
+    def test_nested_phases_charged_once(self) -> None:
+        with timings.collect() as report:
+            with timings.phase("outer"):
+                time.sleep(0.02)
+                with timings.phase("inner"):
+                    time.sleep(0.05)
+        assert report.phases["inner"] >= 0.05
+        assert 0.02 <= report.phases["outer"] < 0.05
+
+    def test_repeated_phase_accumulates(self) -> None:
+        with timings.collect() as report:
+            for _ in range(3):
+                with timings.phase("decode"):
+                    pass
+                timings.count("response_bytes", 5)
+        assert list(report.phases) == ["decode"]
+        assert report.counters == {"response_bytes": 15}
+
+    def test_report_adds_up(self) -> None:
+        with timings.collect() as report:
+            with timings.phase("config"):
+                time.sleep(0.01)
+            time.sleep(0.01)
+        data = report.report()
+        assert set(data["phases_ms"]) == {"config", "other"}
+        assert data["phases_ms"]["other"] >= 5
+        assert sum(data["phases_ms"].values()) == pytest.approx(data["total_ms"], abs=1)
+
+
+class _ChatCompletions(BaseHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        url = f"data:image/png;base64,{base64.b64encode(IMAGE).decode()}"
+        body = json.dumps({"choices": [{"message": {"images": [{"image_url": {"url": url}}]}}]})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+
+@pytest.fixture
+def endpoint(monkeypatch) -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatCompletions)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}/api/v1/chat/completions"
+    monkeypatch.setattr("nanobanana.openrouter.OPENROUTER_ENDPOINT", url)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+class TestBackendPhases:
+    """Tests for connection phases traced from httpx."""
+
+    def test_openrouter_stream_phases(self, endpoint: str, tmp_path: Path) -> None:
+        from nanobanana.openrouter import generate_image_to_file
+
+        src = tmp_path / "in.png"
+        src.write_bytes(b"\x89PNG" + b"\0" * 3000)
+        with timings.collect() as report:
+            path, _ = generate_image_to_file(
+                api_key="k", model="m", prompt="p", input_images=[str(src)],
+                aspect_ratio="1:1", image_size="1K",
+                output_for_mime=lambda mime: str(tmp_path / "out.png"),
+            )
+        assert Path(path).read_bytes() == IMAGE
+        assert {"prepare", "connect", "send", "wait", "download", "decode", "write"} <= set(report.phases)
+        assert report.counters["request_bytes"] > 4000
+        assert report.counters["response_bytes"] > len(IMAGE)
+        assert report.counters["image_bytes"] == len(IMAGE)
+
+    def test_openrouter_buffered(self, endpoint: str) -> None:
+        from nanobanana.openrouter import generate_image
+
+        with timings.collect() as report:
+            data, _ = generate_image("k", "m", "p", [], "1:1", "1K")
+        assert data == IMAGE
+        assert {"connect", "send", "wait", "download", "decode"} <= set(report.phases)
+
+
+class TestCLI:
+    """Tests for the -timings flag and NANOBANANA_TIMINGS."""
+
+    @pytest.fixture(autouse=True)
+    def env(self, tmp_path: Path, monkeypatch) -> None:
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setenv("GEMINI_API_KEY", "k")
+        monkeypatch.setenv("NANOBANANA_NO_DAEMON", "1")
+        monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+        monkeypatch.delenv(timings.ENV_VAR, raising=False)
+
+        def fake_generate(**kwargs):
+            with timings.phase("request"):
+                pass
+            return b"img", "image/png"
+
+        monkeypatch.setattr("nanobanana.gemini.generate_image", fake_generate)
+
+    def test_flag_prints_report(self, tmp_path: Path, capsys) -> None:
+        from nanobanana.cli import run
+
+        run(["-timings", "-no-cache", "-o", str(tmp_path / "out.png"), "a cat"])
+        err = capsys.readouterr().err
+        report = json.loads(err[err.index("{"):])
+        assert {"config", "resolve", "prompt", "backend", "request", "write"} <= set(report["phases_ms"])
+        assert report["total_ms"] > 0
+
+    def test_env_var_appends_json_lines(self, tmp_path: Path, monkeypatch, capsys) -> None:
+        from nanobanana.cli import run
+
+        log = tmp_path / "timings.jsonl"
+        monkeypatch.setenv(timings.ENV_VAR, str(log))
+        for _ in range(2):
+            run(["-no-cache", "-o", str(tmp_path / "out.png"), "a cat"])
+        lines = log.read_text().splitlines()
+        assert len(lines) == 2
+        assert "write" in json.loads(lines[0])["phases_ms"]
+        assert "total_ms" not in capsys.readouterr().err
+
+    def test_error_recorded(self, tmp_path: Path, monkeypatch) -> None:
+        from nanobanana.cli import run
+
+        log = tmp_path / "timings.jsonl"
+        monkeypatch.setenv(timings.ENV_VAR, str(log))
+        with pytest.raises(RuntimeError, match="invalid size"):
+            run(["-size", "8K", "a cat"])
+        assert "invalid size" in json.loads(log.read_text())["error"]
+
+    def test_off_by_default(self, tmp_path: Path, capsys) -> None:
+        from nanobanana.cli import run
+
+        run(["-no-cache", "-o", str(tmp_path / "out.png"), "a cat"])
+        assert "phases_ms" not in capsys.readouterr().err
@@ -0,0 +1,135 @@
+"""Tests for local output transcoding (-format) — no network calls."""
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from nanobanana.batch import BatchJob, _run_jobs
+from nanobanana.cli import run
+from nanobanana.config import APIConfig
+from nanobanana.transcode import (
+    OutputFormat,
+    check_output_format,
+    transcode_file,
+    transcode_files,
+)
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(path: Path, mode: str = "RGB", size: tuple[int, int] = (256, 192)) -> Path:
+    # A smooth gradient, like a generated slide background
+    img = Image.linear_gradient("L").resize(size).convert(mode)
+    img.save(path)
+    return path
+
+
+class TestCheckOutputFormat:
+    """Tests for up-front validation of -format and -quality."""
+
+    def test_defaults(self) -> None:
+        assert check_output_format("webp") == OutputFormat("webp", 85, False)
+        assert check_output_format("jpeg", 60, True) == OutputFormat("jpeg", 60, True)
+
+    @pytest.mark.parametrize("fmt, quality, match", [
+        ("gif", 0, "invalid -format: gif"),
+        ("webp", 101, "invalid -quality: 101"),
+        ("webp", -5, "invalid -quality"),
+    ])
+    def test_invalid(self, fmt: str, quality: int, match: str) -> None:
+        with pytest.raises(RuntimeError, match=match):
+            check_output_format(fmt, quality)
+
+    def test_requires_pillow(self, monkeypatch) -> None:
+        monkeypatch.setitem(sys.modules, "PIL", None)
+        with pytest.raises(RuntimeError, match="requires Pillow"):
+            check_output_format("webp")
+
+
+class TestTranscodeFile:
+    """Tests for re-encoding one image next to the original."""
+
+    def test_webp_replaces_original(self, tmp_path: Path) -> None:
+        src = _png(tmp_path / "slide.png")
+        dest = transcode_file(str(src), "webp", 80)
+        assert dest == str(tmp_path / "slide.webp")
+        assert not src.exists()
+        with Image.open(dest) as img:
+            assert (img.format, img.size) == ("WEBP", (256, 192))
+
+    def test_keep_original(self, tmp_path: Path) -> None:
+        src = _png(tmp_path / "slide.png")
+        dest = transcode_file(str(src), "jpeg", 80, keep_original=True)
+        assert dest.endswith("slide.jpg")
+        assert src.exists()
+
+    def test_jpeg_flattens_transparency(self, tmp_path: Path) -> None:
+        src = tmp_path / "logo.png"
+        Image.new("RGBA", (32, 32), (0, 0, 0, 0)).save(src)
+        with Image.open(transcode_file(str(src), "jpeg", 90)) as img:
+            assert img.mode == "RGB"
+            assert img.getpixel((16, 16)) == (255, 255, 255)
+
+    def test_same_format_untouched(self, tmp_path: Path) -> None:
+        src = tmp_path / "photo.jpg"
+        Image.new("RGB", (8, 8)).save(src)
+        before = src.read_bytes()
+        assert transcode_file(str(src), "jpeg", 10) == str(src)
+        assert src.read_bytes() == before
+
+    def test_unreadable_image(self, tmp_path: Path) -> None:
+        src = tmp_path / "broken.png"
+        src.write_bytes(b"\x89PNG\r\n\x1a\nnot really")
+        with pytest.raises(RuntimeError, match="failed to convert"):
+            transcode_file(str(src), "webp", 80)
+        assert src.exists()
+
+    def test_many_report_errors_per_image(self, tmp_path: Path) -> None:
+        good = _png(tmp_path / "a.png")
+        bad = tmp_path / "b.png"
+        bad.write_bytes(b"nope")
+        with ThreadPoolExecutor(2) as pool:
+            results = transcode_files([str(good), str(bad)], OutputFormat("webp"), executor=pool)
+        assert results[0] == str(tmp_path / "a.webp")
+        assert isinstance(results[1], RuntimeError)
+
+
+class TestWorkloads:
+    """Tests for transcoding in batch runs and on the command line."""
+
+    def test_batch_transcodes_and_chains(self, tmp_path: Path, monkeypatch) -> None:
+        seen: dict[str, list[str]] = {}
+
+        async def fake_generate(client, *, prompt, input_images, output_for_mime, **kwargs):
+            seen[prompt] = input_images
+            output_path = output_for_mime("image/png")
+            _png(Path(output_path))
+            return output_path, "image/png"
+
+        monkeypatch.setattr("nanobanana.openrouter.agenerate_image_to_file", fake_generate)
+        jobs = [
+            BatchJob(line=1, prompt="slide", inputs=[str(tmp_path / "template.png")],
+                     output=str(tmp_path / "slide.png")),
+            BatchJob(line=2, prompt="template", output=str(tmp_path / "template.png")),
+        ]
+        api = APIConfig(use_openrouter=True, api_key="k", model="m")
+        failures = asyncio.run(_run_jobs(
+            jobs, api, concurrency=2, output_format=OutputFormat("webp", keep_original=True),
+        ))
+        assert failures == 0
+        assert (tmp_path / "slide.webp").exists()
+        assert (tmp_path / "slide.png").exists()
+        # The dependent slide got the transcoded template
+        assert seen["slide"] == [str(tmp_path / "template.webp")]
+
+    def test_quality_requires_format(self) -> None:
+        with pytest.raises(RuntimeError, match="require -format"):
+            run(["-quality", "50", "a cat"])
+
+    def test_invalid_format_fails_before_generating(self, monkeypatch) -> None:
+        monkeypatch.setattr("nanobanana.cli.resolve_config", pytest.fail)
+        with pytest.raises(RuntimeError, match="invalid -format: bmp"):
+            run(["-format", "bmp", "a cat"])
@@ -10,6 +10,7 @@ from nanobanana.update_check import (
     _read_cache,
     _write_cache,
     check_for_update,
+    refresh,
 )
 
 
@@ -37,20 +38,32 @@ class TestUpdateCheckCache:
 class TestCheckForUpdate:
     """Tests for the update check logic."""
 
-    def test_dev_version_skips_check(self) -> None:
+    @pytest.fixture(autouse=True)
+    def spawned(self, tmp_path, monkeypatch) -> list[str]:
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+        spawned: list[str] = []
+        monkeypatch.setattr("nanobanana.update_check._spawn_refresh", spawned.append)
+
+        def no_network() -> None:
+            raise AssertionError("the CLI must not fetch in the foreground")
+
+        monkeypatch.setattr("nanobanana.update_check._fetch_latest_version", no_network)
+        return spawned
+
+    def test_dev_version_skips_check(self, spawned: list[str]) -> None:
         assert check_for_update("dev") is None
+        assert spawned == []
 
-    def test_same_version_returns_none(self, tmp_path, monkeypatch) -> None:
-        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    def test_same_version_returns_none(self, spawned: list[str]) -> None:
         # Seed cache with same version
         _write_cache({
             "last_check": time.time(),
             "latest_version": "20260221.120000",
         })
         assert check_for_update("20260221.120000") is None
+        assert spawned == []
 
-    def test_newer_version_returns_hint(self, tmp_path, monkeypatch) -> None:
-        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    def test_newer_version_returns_hint(self) -> None:
         # Seed cache with newer version
         _write_cache({
             "last_check": time.time(),
@@ -61,61 +74,95 @@ class TestCheckForUpdate:
         assert "20260222.120000" in hint
         assert "uv tool install" in hint
 
-    def test_stale_cache_triggers_fetch(self, tmp_path, monkeypatch) -> None:
-        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    def test_stale_cache_spawns_refresher_once(self, spawned: list[str]) -> None:
         # Seed cache with old timestamp
         _write_cache({
             "last_check": time.time() - 100000,
             "latest_version": "20260220.120000",
         })
-        # Mock the fetch to return a known version
-        monkeypatch.setattr(
-            "nanobanana.update_check._fetch_latest_version",
-            lambda: "20260222.120000",
-        )
-        hint = check_for_update("20260221.120000")
-        assert hint is not None
-        assert "20260222.120000" in hint
-
-    def test_fetch_failure_returns_none(self, tmp_path, monkeypatch) -> None:
-        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
-        # Stale cache so it tries to fetch
-        _write_cache({"last_check": 0})
-        monkeypatch.setattr(
-            "nanobanana.update_check._fetch_latest_version",
-            lambda: None,
-        )
-        assert check_for_update("20260221.120000") is None
+        assert check_for_update("20260221.120000") is not None  # stale result still shown
+        assert check_for_update("20260221.120000") is not None
+        assert spawned == ["20260221.120000"]
 
-    def test_auto_update_success(self, tmp_path, monkeypatch) -> None:
-        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    def test_auto_update_success(self) -> None:
         _write_cache({
             "last_check": time.time(),
             "latest_version": "20260222.120000",
+            "installed_version": "20260222.120000",
         })
-        monkeypatch.setattr(
-            "nanobanana.update_check._run_upgrade",
-            lambda: True,
-        )
-        hint = check_for_update("20260221.120000", auto_update=True)
+        hint = check_for_update("20260221.120000")
         assert hint is not None
         assert "Updated to" in hint
+        # Once the new version runs, nothing to report
+        assert check_for_update("20260222.120000") is None
 
-    def test_auto_update_failure(self, tmp_path, monkeypatch) -> None:
-        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    def test_auto_update_failure(self) -> None:
         _write_cache({
             "last_check": time.time(),
             "latest_version": "20260222.120000",
+            "upgrade_failed": "20260222.120000",
         })
-        monkeypatch.setattr(
-            "nanobanana.update_check._run_upgrade",
-            lambda: False,
-        )
-        hint = check_for_update("20260221.120000", auto_update=True)
+        hint = check_for_update("20260221.120000")
         assert hint is not None
         assert "Auto-update failed" in hint
 
 
+class TestRefresh:
+    """Tests for the background refresher."""
+
+    @pytest.fixture
+    def config_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+        monkeypatch.setattr(
+            "nanobanana.update_check._fetch_latest_version",
+            lambda: "20260222.120000",
+        )
+        config_dir = tmp_path / "nanobanana"
+        config_dir.mkdir()
+        return config_dir
+
+    def test_records_latest_version(self, config_dir, monkeypatch) -> None:
+        monkeypatch.setattr("nanobanana.update_check._run_upgrade", lambda: pytest.fail("upgraded"))
+        refresh("20260221.120000")
+        cache = _read_cache()
+        assert cache["latest_version"] == "20260222.120000"
+        assert time.time() - cache["last_check"] < 60
+
+    def test_fetch_failure_returns_none(self, config_dir, monkeypatch) -> None:
+        monkeypatch.setattr("nanobanana.update_check._fetch_latest_version", lambda: None)
+        refresh("20260221.120000")
+        monkeypatch.setattr("nanobanana.update_check._spawn_refresh", lambda v: None)
+        assert check_for_update("20260221.120000") is None
+
+    @pytest.mark.parametrize("succeeded, key", [(True, "installed_version"), (False, "upgrade_failed")])
+    def test_auto_update(self, config_dir, monkeypatch, succeeded: bool, key: str) -> None:
+        (config_dir / "config.json").write_text(json.dumps({"auto_update": True}))
+        monkeypatch.setattr("nanobanana.update_check._run_upgrade", lambda: succeeded)
+        refresh("20260221.120000")
+        assert _read_cache()[key] == "20260222.120000"
+
+
+class TestUpdateHintModes:
+    """Tests that only interactive one-shot runs check for updates."""
+
+    @pytest.mark.parametrize(
+        "argv, tty, expected",
+        [
+            (["slide", "x"], True, True),
+            (["slide", "x"], False, False),
+            (["batch", "jobs.jsonl"], True, False),
+            (["daemon", "start"], True, False),
+        ],
+    )
+    def test_modes(self, monkeypatch, argv: list[str], tty: bool, expected: bool) -> None:
+        import sys
+
+        from nanobanana.cli import _wants_update_hint
+
+        monkeypatch.setattr(sys.stderr, "isatty", lambda: tty)
+        assert _wants_update_hint(argv) is expected
+
+
 class TestAutoUpdateConfig:
     """Tests that auto_update is loaded from config."""
 